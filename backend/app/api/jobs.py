@@ -0,0 +1,158 @@
+"""
+非同步工作 API 路由：提交後立即回傳工作 ID，之後輪詢狀態並下載結果
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.api.watermark import watermark_service
+from app.config import settings
+from app.models import JobItemResponse, JobResponse, OutputFormat, WatermarkMode
+from app.services import JobQueue, JobRecord, JobStore, ServiceBusyError
+
+router = APIRouter()
+job_queue = JobQueue(
+    watermark_service,
+    JobStore(Path(settings.job_store_dir or Path(tempfile.gettempdir()) / "watermark-jobs")),
+    workers=settings.job_workers,
+    max_pending=settings.job_max_pending,
+    retention=settings.job_retention,
+    retry_after=settings.retry_after,
+    purge_interval=settings.job_purge_interval,
+)
+
+
+def _job_response(record: JobRecord) -> JobResponse:
+    return JobResponse(
+        job_id=record.id,
+        status=record.status.value,
+        total=record.total,
+        completed=record.completed,
+        error=record.error,
+        created_at=record.created_at,
+        updated_at=record.updated_at,
+        items=[
+            JobItemResponse(
+                index=item.index,
+                filename=item.filename,
+                success=item.success,
+                error=item.error,
+                watermark_length=item.watermark_length,
+                watermark_shape=item.watermark_shape,
+                output_format=item.output_format,
+                result_url=f"/api/jobs/{record.id}/results/{item.index}" if item.success else None,
+            )
+            for item in record.items
+        ],
+    )
+
+
+def _load(job_id: str) -> JobRecord:
+    record = job_queue.store.load(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="找不到工作")
+    return record
+
+
+def _save_inputs(record: JobRecord, images: List[UploadFile]) -> None:
+    # 上傳檔於回應後即關閉，先逐一複製到工作目錄
+    for index, upload in enumerate(images):
+        with job_queue.store.input_path(record.id, index).open("wb") as target:
+            shutil.copyfileobj(upload.file, target)
+
+
+@router.post("/embed", response_model=JobResponse, status_code=202)
+async def submit_embed_job(
+    images: List[UploadFile] = File(..., description="原始圖片檔案（可多個）"),
+    mode: WatermarkMode = Form(..., description="浮水印模式"),
+    password_img: int = Form(1, description="圖片密碼"),
+    password_wm: int = Form(1, description="浮水印密碼"),
+    watermark_text: Optional[str] = Form(None, description="文字浮水印內容"),
+    watermark_image: Optional[UploadFile] = File(None, description="圖片浮水印檔案"),
+    watermark_length: Optional[int] = Form(None, description="位元浮水印長度"),
+    output_format: OutputFormat = Form(OutputFormat.PNG, description="輸出格式"),
+    png_compression: Optional[int] = Form(None, description="PNG 壓縮等級 0-9"),
+    quality: Optional[int] = Form(None, description="JPEG/WebP 品質 1-100"),
+    lossless: bool = Form(False, description="WebP 是否無損"),
+):
+    """
+    提交嵌入工作
+
+    參數與 /api/watermark/embed/batch 相同。上傳檔寫入工作目錄後立即回應 202 與工作 ID，
+    由背景工作者處理；以 GET /api/jobs/{job_id} 輪詢進度，完成的圖片可由 result_url 下載。
+    排隊中的工作已達上限時回應 503。
+    """
+    if len(images) > settings.batch_max_images:
+        raise HTTPException(status_code=400, detail=f"單次最多 {settings.batch_max_images} 張圖片")
+    try:
+        encoder = watermark_service.encoder.updated(
+            output_format=output_format.value,
+            png_compression=png_compression,
+            quality=quality,
+            lossless=lossless,
+        )
+        watermark_image_bytes = await watermark_image.read() if watermark_image else None
+        watermark_service.check_payload(mode.value, watermark_text, watermark_image_bytes, watermark_length)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # 先預留名額再複製上傳檔，佇列已滿時不做任何磁碟寫入
+        job_queue.reserve()
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    record = None
+    try:
+        record = await run_in_threadpool(job_queue.store.create, [upload.filename for upload in images])
+        await run_in_threadpool(_save_inputs, record, images)
+        await run_in_threadpool(
+            job_queue.submit,
+            record,
+            mode=mode.value,
+            password_img=password_img,
+            password_wm=password_wm,
+            watermark_text=watermark_text,
+            watermark_image_bytes=watermark_image_bytes,
+            watermark_length=watermark_length,
+            encoder=encoder,
+        )
+    except Exception as e:
+        job_queue.release()
+        if record is not None:
+            job_queue.store.delete(record.id)
+        raise HTTPException(status_code=500, detail=f"提交工作時發生錯誤: {str(e)}")
+    return _job_response(record)
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """查詢工作狀態與各張圖片的處理結果"""
+    return _job_response(_load(job_id))
+
+
+@router.get("/{job_id}/results/{index}", response_class=FileResponse)
+async def get_job_result(job_id: str, index: int):
+    """下載工作中第 index 張嵌入後的圖片"""
+    record = _load(job_id)
+    if not 0 <= index < record.total:
+        raise HTTPException(status_code=404, detail="找不到結果")
+    item = record.items[index]
+    if not item.success:
+        pending = item.success is None and not record.finished
+        raise HTTPException(status_code=409 if pending else 404, detail=item.error or record.error or "結果尚未完成")
+    return FileResponse(job_queue.store.result_path(job_id, index), media_type=item.media_type)
+
+
+@router.delete("/{job_id}", status_code=204)
+async def delete_job(job_id: str):
+    """刪除已結束的工作及其結果"""
+    record = _load(job_id)
+    if not record.finished:
+        raise HTTPException(status_code=409, detail="工作尚未結束")
+    job_queue.store.delete(job_id)
@@ -2,20 +2,96 @@
 浮水印 API 路由
 """
 import json
-from typing import Optional, Tuple
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
 
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 
+from app.config import settings
+from app.core.watermark import shared_pool
 from app.models import (
+    BatchEmbedItemResponse,
     EmbedResponse,
     ErrorResponse,
     ExtractResponse,
+    OutputFormat,
     WatermarkMode,
 )
-from app.services import WatermarkService
+from app.services import (
+    BatchEmbedItem,
+    BoundedExecutor,
+    EmbedResult,
+    EncoderSettings,
+    ServiceBusyError,
+    WatermarkService,
+)
 
 router = APIRouter()
-watermark_service = WatermarkService()
+# 二進位回應每次送出的位元組數
+STREAM_CHUNK_SIZE = 1024 * 1024
+watermark_service = WatermarkService(
+    shared_pool(settings.pool_mode, settings.pool_processes),
+    EncoderSettings(
+        png_compression=settings.output_png_compression,
+        quality=settings.output_quality,
+        verify=settings.output_verify,
+    ),
+    settings.batch_workers,
+)
+# CPU 密集的嵌入/提取交給有上限的執行緒池，事件迴圈只負責 I/O
+executor = BoundedExecutor(settings.executor_workers, settings.executor_queue, settings.retry_after)
+
+
+def _busy(exc: ServiceBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=503, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+async def _embed(
+    image: UploadFile,
+    mode: WatermarkMode,
+    password_img: int,
+    password_wm: int,
+    watermark_text: Optional[str],
+    watermark_image: Optional[UploadFile],
+    watermark_length: Optional[int],
+    **encoder_options,
+) -> EmbedResult:
+    """讀取上傳檔案並在執行層嵌入浮水印，錯誤轉為對應的 HTTP 狀態碼
+
+    encoder_options 覆寫服務預設的 EncoderSettings 欄位，值為 None 者沿用預設
+    """
+    try:
+        encoder = watermark_service.encoder.updated(**encoder_options)
+
+        # 讀取原始圖片
+        image_bytes = await image.read()
+
+        # 讀取浮水印圖片（如果有）
+        watermark_image_bytes = None
+        if watermark_image:
+            watermark_image_bytes = await watermark_image.read()
+
+        # 呼叫服務層嵌入浮水印
+        return await executor.run(
+            watermark_service.embed,
+            image_bytes=image_bytes,
+            mode=mode.value,
+            password_img=password_img,
+            password_wm=password_wm,
+            watermark_text=watermark_text,
+            watermark_image_bytes=watermark_image_bytes,
+            watermark_length=watermark_length,
+            encoder=encoder,
+        )
+
+    except ServiceBusyError as e:
+        raise _busy(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"嵌入浮水印時發生錯誤: {str(e)}")
 
 
 @router.post("/embed", response_model=EmbedResponse)
@@ -38,41 +114,174 @@ async def embed_watermark(
     - **watermark_image**: mode=img 時必填
     - **watermark_length**: mode=bit 時必填
     """
-    try:
-        # 讀取原始圖片
-        image_bytes = await image.read()
+    result = await _embed(
+        image,
+        mode,
+        password_img,
+        password_wm,
+        watermark_text,
+        watermark_image,
+        watermark_length,
+        output_format="png",
+    )
 
-        # 讀取浮水印圖片（如果有）
-        watermark_image_bytes = None
-        if watermark_image:
-            watermark_image_bytes = await watermark_image.read()
+    return EmbedResponse(
+        success=True,
+        message="浮水印嵌入成功",
+        watermark_length=result.watermark_length,
+        watermark_shape=list(result.watermark_shape) if result.watermark_shape else None,
+        image_data=watermark_service.bytes_to_base64(result.data),
+    )
 
-        # 呼叫服務層嵌入浮水印
-        output_bytes, wm_length, wm_shape = watermark_service.embed_watermark(
-            image_bytes=image_bytes,
+
+@router.post("/embed/binary", response_class=StreamingResponse)
+async def embed_watermark_binary(
+    image: UploadFile = File(..., description="原始圖片檔案"),
+    mode: WatermarkMode = Form(..., description="浮水印模式"),
+    password_img: int = Form(1, description="圖片密碼"),
+    password_wm: int = Form(1, description="浮水印密碼"),
+    watermark_text: Optional[str] = Form(None, description="文字浮水印內容"),
+    watermark_image: Optional[UploadFile] = File(None, description="圖片浮水印檔案"),
+    watermark_length: Optional[int] = Form(None, description="位元浮水印長度"),
+    output_format: OutputFormat = Form(OutputFormat.PNG, description="輸出格式"),
+    png_compression: Optional[int] = Form(None, description="PNG 壓縮等級 0-9"),
+    quality: Optional[int] = Form(None, description="JPEG/WebP 品質 1-100"),
+    lossless: bool = Form(False, description="WebP 是否無損"),
+):
+    """
+    嵌入浮水印端點（二進位回應）
+
+    參數與 /embed 相同，回應主體直接是圖片位元組（image/png、image/jpeg 或 image/webp），
+    不經 Base64 與 JSON；浮水印資訊放在回應標頭：
+
+    - **output_format**: png、jpeg、webp；有損輸出會先驗證浮水印可提取，失敗時改回 PNG
+    - **png_compression** / **quality** / **lossless**: 覆寫服務預設的編碼參數
+    - **X-Watermark-Length**: 實際嵌入的浮水印位元長度
+    - **X-Watermark-Shape**: 浮水印原始形狀（圖片模式，JSON array）
+    - **X-Watermark-Verified**: 有損輸出的提取驗證結果（true/false）
+    - **Server-Timing**: 嵌入、編碼與驗證各階段耗時
+    """
+    result = await _embed(
+        image,
+        mode,
+        password_img,
+        password_wm,
+        watermark_text,
+        watermark_image,
+        watermark_length,
+        output_format=output_format.value,
+        png_compression=png_compression,
+        quality=quality,
+        lossless=lossless,
+    )
+
+    headers = {
+        "Content-Length": str(len(result.data)),
+        "X-Watermark-Length": str(result.watermark_length),
+        "Server-Timing": ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in result.timings.items()
+        ),
+    }
+    if result.watermark_shape:
+        headers["X-Watermark-Shape"] = json.dumps(list(result.watermark_shape))
+    if result.verified is not None:
+        headers["X-Watermark-Verified"] = "true" if result.verified else "false"
+    return StreamingResponse(
+        _iter_chunks(result.data),
+        media_type=result.media_type,
+        headers=headers,
+    )
+
+
+def _iter_chunks(data: bytes) -> Iterator[memoryview]:
+    # 以 memoryview 切片分段送出，不再複製圖片位元組
+    view = memoryview(data)
+    for start in range(0, len(view), STREAM_CHUNK_SIZE):
+        yield view[start:start + STREAM_CHUNK_SIZE]
+
+
+@router.post("/embed/batch", response_class=StreamingResponse)
+async def embed_watermark_batch(
+    images: List[UploadFile] = File(..., description="原始圖片檔案（可多個）"),
+    mode: WatermarkMode = Form(..., description="浮水印模式"),
+    password_img: int = Form(1, description="圖片密碼"),
+    password_wm: int = Form(1, description="浮水印密碼"),
+    watermark_text: Optional[str] = Form(None, description="文字浮水印內容"),
+    watermark_image: Optional[UploadFile] = File(None, description="圖片浮水印檔案"),
+    watermark_length: Optional[int] = Form(None, description="位元浮水印長度"),
+    output_format: OutputFormat = Form(OutputFormat.PNG, description="輸出格式"),
+    png_compression: Optional[int] = Form(None, description="PNG 壓縮等級 0-9"),
+    quality: Optional[int] = Form(None, description="JPEG/WebP 品質 1-100"),
+    lossless: bool = Form(False, description="WebP 是否無損"),
+):
+    """
+    批次嵌入浮水印端點
+
+    以同一份浮水印與密碼嵌入多張 **images**，其餘參數與 /embed/binary 相同。
+    回應為 NDJSON（application/x-ndjson），每完成一張圖片送出一行 BatchEmbedItemResponse；
+    圖片平行處理，各行依完成順序送出，請以 index 對應上傳順序。
+    單張圖片失敗只會在該行標示 success=false，不影響其他圖片。
+    整批只佔用執行層的一個名額，滿載時回應 503。
+    """
+    if len(images) > settings.batch_max_images:
+        raise HTTPException(status_code=400, detail=f"單次最多 {settings.batch_max_images} 張圖片")
+    try:
+        encoder = watermark_service.encoder.updated(
+            output_format=output_format.value,
+            png_compression=png_compression,
+            quality=quality,
+            lossless=lossless,
+        )
+        watermark_image_bytes = await watermark_image.read() if watermark_image else None
+        lines = executor.stream(
+            _batch_lines,
+            images,
             mode=mode.value,
             password_img=password_img,
             password_wm=password_wm,
             watermark_text=watermark_text,
             watermark_image_bytes=watermark_image_bytes,
             watermark_length=watermark_length,
+            encoder=encoder,
         )
+        # 先取得第一行：佔用名額與浮水印參數檢查都在此完成，錯誤仍能以狀態碼回應
+        first = await anext(lines)
+    except ServiceBusyError as e:
+        raise _busy(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批次嵌入浮水印時發生錯誤: {str(e)}")
+
+    async def body() -> AsyncIterator[str]:
+        yield first
+        async for line in lines:
+            yield line
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _batch_lines(images: List[UploadFile], **options) -> Iterator[str]:
+    # 於執行層的執行緒中逐張讀取上傳檔並編碼成 NDJSON，事件迴圈不處理大型位元組
+    items = watermark_service.embed_batch((upload.file.read() for upload in images), **options)
+    return (_batch_line(item, images[item.index].filename) for item in items)
 
-        # 轉換為 Base64
-        image_base64 = watermark_service.bytes_to_base64(output_bytes)
 
-        return EmbedResponse(
+def _batch_line(item: BatchEmbedItem, filename: Optional[str]) -> str:
+    result = item.result
+    if result is None:
+        response = BatchEmbedItemResponse(index=item.index, filename=filename, success=False, error=item.error)
+    else:
+        response = BatchEmbedItemResponse(
+            index=item.index,
+            filename=filename,
             success=True,
-            message="浮水印嵌入成功",
-            watermark_length=wm_length,
-            watermark_shape=list(wm_shape) if wm_shape else None,
-            image_data=image_base64,
+            watermark_length=result.watermark_length,
+            watermark_shape=list(result.watermark_shape) if result.watermark_shape else None,
+            output_format=result.output_format,
+            image_data=watermark_service.bytes_to_base64(result.data),
         )
-
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"嵌入浮水印時發生錯誤: {str(e)}")
+    return response.model_dump_json(exclude_none=True) + "\n"
 
 
 @router.post("/extract", response_model=ExtractResponse)
@@ -112,7 +321,8 @@ async def extract_watermark(
                 raise HTTPException(status_code=400, detail="watermark_shape 格式錯誤") from exc
 
         # 呼叫服務層提取浮水印
-        text_result, image_result = watermark_service.extract_watermark(
+        text_result, image_result = await executor.run(
+            watermark_service.extract_watermark,
             image_bytes=image_bytes,
             mode=mode.value,
             password_img=password_img,
@@ -134,6 +344,8 @@ async def extract_watermark(
 
         return ExtractResponse(**response_data)
 
+    except ServiceBusyError as e:
+        raise _busy(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -0,0 +1,43 @@
+"""
+後端服務設定
+
+可由 WATERMARK_ 前綴的環境變數覆寫，例如 WATERMARK_POOL_MODE=multiprocessing
+"""
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """服務設定"""
+
+    model_config = SettingsConfigDict(env_prefix="WATERMARK_")
+
+    # 浮水印核心的平行模式與工作者數量；常駐 pool 於服務啟動時預熱
+    pool_mode: str = "common"
+    pool_processes: Optional[int] = None
+
+    # API 執行層：同時執行的運算數與排隊上限，滿載時回應 503 並附 Retry-After（秒）
+    executor_workers: int = 2
+    executor_queue: int = 8
+    retry_after: int = 5
+    # /embed/batch 與批次工作單次請求的圖片數上限
+    batch_max_images: int = 1000
+    # 批次嵌入時同時處理的圖片數（預設為 CPU 核心數）
+    batch_workers: Optional[int] = None
+
+    # 非同步工作：結果存放目錄（預設為系統暫存目錄下的 watermark-jobs）、工作者數、
+    # 排隊上限、結束後保留結果的秒數，以及清除過期工作的間隔秒數
+    job_store_dir: Optional[str] = None
+    job_workers: int = 1
+    job_max_pending: int = 100
+    job_retention: int = 24 * 3600
+    job_purge_interval: int = 600
+
+    # 輸出編碼：PNG 壓縮等級（0-9）、JPEG/WebP 品質（1-100），以及有損輸出是否先驗證可提取
+    output_png_compression: int = 1
+    output_quality: int = 95
+    output_verify: bool = True
+
+
+settings = Settings()
@@ -0,0 +1,35 @@
+"""
+盲水印核心套件
+
+基於 DWT-DCT-SVD 的盲水印嵌入與提取
+"""
+from .version import __version__, bw_notes
+from .core import WaterMark, WaterMarkCore
+from .attacks import (
+    crop_attack,
+    resize_attack,
+    rotation_attack,
+    salt_pepper_attack,
+    shelter_attack,
+    brightness_attack
+)
+from .recovery import estimate_crop_parameters, recover_crop
+from .utils import AutoPool, shared_pool, shutdown_pools
+
+__all__ = [
+    '__version__',
+    'bw_notes',
+    'WaterMark',
+    'WaterMarkCore',
+    'AutoPool',
+    'shared_pool',
+    'shutdown_pools',
+    'crop_attack',
+    'resize_attack',
+    'rotation_attack',
+    'salt_pepper_attack',
+    'shelter_attack',
+    'brightness_attack',
+    'estimate_crop_parameters',
+    'recover_crop',
+]
@@ -3,7 +3,7 @@ DWT-DCT-SVD 演算法模組
 
 實作水印嵌入與提取的核心演算法
 """
-from typing import Tuple
+from typing import Optional
 import numpy as np
 import numpy.typing as npt
 from numpy.linalg import svd
@@ -25,7 +25,8 @@ def embed_watermark_in_block_slow(
     watermark_bit: bool,
     d1: int,
     d2: int,
-    block_shape: BlockShape
+    block_shape: BlockShape,
+    unshuffler: Optional[ShuffleIndexArray] = None
 ) -> npt.NDArray[np.float32]:
     """
     在單個分塊中嵌入水印（慢速模式，使用兩個奇異值）
@@ -39,6 +40,7 @@ def embed_watermark_in_block_slow(
         d1: 主要奇異值的量化步長
         d2: 次要奇異值的量化步長
         block_shape: 分塊形狀
+        unshuffler: 預先計算的還原索引，None 時由 shuffler 推得
         
     Returns:
         嵌入水印後的分塊
@@ -47,7 +49,7 @@ def embed_watermark_in_block_slow(
     block_dct = dct(block)
     
     # 打亂順序（加密）
-    block_dct_shuffled = block_dct.flatten()[shuffler].reshape(
+    block_dct_shuffled = block_dct.reshape(-1)[shuffler].reshape(
         block_shape.to_array()
     )
     
@@ -64,10 +66,10 @@ def embed_watermark_in_block_slow(
     # 逆 SVD
     block_dct_modified = np.dot(u, np.dot(np.diag(s), v))
     
-    # 還原順序（解密）
-    block_dct_flatten = block_dct_modified.flatten()
-    block_dct_restored = block_dct_flatten.copy()
-    block_dct_restored[shuffler] = block_dct_flatten
+    # 還原順序（解密）：以反置換索引一次取回，不需複製後 scatter
+    if unshuffler is None:
+        unshuffler = np.argsort(shuffler)
+    block_dct_restored = block_dct_modified.reshape(-1)[unshuffler]
     
     # 逆 DCT
     return idct(block_dct_restored.reshape(block_shape.to_array()))
@@ -131,8 +133,8 @@ def extract_watermark_from_block_slow(
         block_shape.to_array()
     )
     
-    # SVD 分解
-    u, s, v = svd(block_dct_shuffled)
+    # 僅計算奇異值（U、V 不參與提取）
+    s = svd(block_dct_shuffled, compute_uv=False)
     
     # 從主奇異值提取
     wm_primary = float((s[0] % d1) > (d1 / 2))
@@ -166,8 +168,8 @@ def extract_watermark_from_block_fast(
     # DCT 變換
     block_dct = dct(block)
     
-    # SVD 分解
-    u, s, v = svd(block_dct)
+    # 僅計算奇異值（U、V 不參與提取）
+    s = svd(block_dct, compute_uv=False)
     
     # 從主奇異值提取
     return float((s[0] % d1) > (d1 / 2))
@@ -1,29 +1,28 @@
 """水印核心引擎模組"""
-from typing import Tuple
+from typing import ContextManager, Optional, Tuple
 import numpy as np
 import numpy.typing as npt
 import cv2
-from pywt import idwt2
 
-from ..types import WatermarkBitArray, BlockShape, PoolMode
+from ..types import WatermarkBitArray, BlockShape, PoolMode, Precision
 from ..constants import (
     DEFAULT_ROBUSTNESS_PRIMARY,
     DEFAULT_ROBUSTNESS_SECONDARY,
     YUV_CHANNELS,
-    WAVELET_BASIS,
     PIXEL_MAX_VALUE,
     PIXEL_MIN_VALUE
 )
 from ..exceptions import WatermarkCapacityError
-from ..utils import AutoPool, generate_shuffle_indices
+from ..kernels import average_block_bits, embed_blocks_slabs, extract_blocks_slabs, haar_synthesis
+from ..kernels import CyclicBits, ShuffleTable, progressive_block_bits
+from ..utils import AutoPool, generate_shuffle_indices, generate_block_permutation
 from .algorithms import (
-    embed_watermark_in_block_slow,
-    embed_watermark_in_block_fast,
-    extract_watermark_from_block_slow,
-    extract_watermark_from_block_fast
+    embed_watermark_in_block_slow, embed_watermark_in_block_fast,
+    extract_watermark_from_block_slow, extract_watermark_from_block_fast
 )
-from .kmeans import one_dim_kmeans
+from .kmeans import kmeans_threshold, one_dim_kmeans
 from .image_processor import ImageProcessor
+from .region import embed_region
 
 
 class WaterMarkCore:
@@ -36,9 +35,11 @@ class WaterMarkCore:
         processes: int = None,
         robustness_primary: int = DEFAULT_ROBUSTNESS_PRIMARY,
         robustness_secondary: int = DEFAULT_ROBUSTNESS_SECONDARY,
-        fast_mode: bool = False
+        fast_mode: bool = False,
+        pool: Optional[AutoPool] = None,
+        precision: Precision = 'float32'
     ):
-        """初始化核心引擎"""
+        """初始化核心引擎；傳入 pool（例如 shared_pool 的實例）時與其他實例共用工作者"""
         self.block_shape = BlockShape()
         self.password_img = password_img
         self.d1 = robustness_primary
@@ -46,17 +47,24 @@ class WaterMarkCore:
         self.fast_mode = fast_mode
 
         # 圖片處理器
-        self.processor = ImageProcessor(self.block_shape)
+        self.processor = ImageProcessor(self.block_shape, precision)
 
         # 水印資料
         self.wm_bit: WatermarkBitArray = None
         self.wm_size: int = 0
         self.block_num: int = 0
         self.idx_shuffle: npt.NDArray = None
+        self.idx_unshuffle: npt.NDArray = None
 
-        # 並行處理池
-        self.pool = AutoPool(mode=mode, processes=processes)
+        # 並行處理池（延遲啟動）
+        self._owns_pool = pool is None
+        self.pool = AutoPool(mode=mode, processes=processes) if pool is None else pool
     
+    def close(self) -> None:
+        """關閉自行建立的處理池；共用的處理池由其擁有者管理"""
+        if self._owns_pool:
+            self.pool.close()
+
     def read_img_arr(self, img: npt.NDArray) -> None:
         """讀取圖片陣列並進行預處理"""
         self.processor.process_image(img)
@@ -80,119 +88,113 @@ class WaterMarkCore:
     def embed(self) -> npt.NDArray:
         """嵌入水印"""
         self.init_block_index()
-        self.idx_shuffle = generate_shuffle_indices(
+        self.idx_shuffle, self.idx_unshuffle = generate_block_permutation(
             self.password_img, self.block_num, self.block_shape.size()
         )
 
-        embed_ca = [ca.copy() for ca in self.processor.ca]
-        embed_YUV = [np.array([])] * YUV_CHANNELS
-
-        for channel in range(YUV_CHANNELS):
-            if self.fast_mode:
-                embed_func = lambda args: embed_watermark_in_block_fast(
-                    args[0], self.wm_bit[args[2] % self.wm_size], self.d1
-                )
-            else:
-                embed_func = lambda args: embed_watermark_in_block_slow(
-                    args[0], args[1], self.wm_bit[args[2] % self.wm_size],
-                    self.d1, self.d2, self.block_shape
-                )
-
-            args_list = [
-                (self.processor.ca_block[channel][self.processor.block_index[i]], self.idx_shuffle[i], i)
-                for i in range(self.block_num)
-            ]
-            embedded_blocks = self.pool.map(embed_func, args_list)
-
-            for i in range(self.block_num):
-                self.processor.ca_block[channel][self.processor.block_index[i]] = embedded_blocks[i]
-
-            self.processor.ca_part[channel] = np.concatenate(
-                np.concatenate(self.processor.ca_block[channel], 1), 1
-            )
-            embed_ca[channel][:self.processor.part_shape[0], :self.processor.part_shape[1]] = \
-                self.processor.ca_part[channel]
-            embed_YUV[channel] = idwt2(
-                (embed_ca[channel], self.processor.hvd[channel]), WAVELET_BASIS
-            )
+        with self._blocks_buffer() as blocks:
+            embed_ca = self.processor.write_blocks(self._embed_blocks(self._stack_blocks(blocks)))
 
-        embed_img_YUV = np.stack(embed_YUV, axis=2)
+        # 只以修改後的 cA 重建，細節頻帶隱含在原 YUV 平面中
+        embed_img_YUV = haar_synthesis(self.processor.img_YUV.copy(), embed_ca)
         embed_img_YUV = embed_img_YUV[:self.processor.img_shape[0], :self.processor.img_shape[1]]
-        embed_img = cv2.cvtColor(embed_img_YUV, cv2.COLOR_YUV2BGR)
+        embed_img = cv2.cvtColor(embed_img_YUV.astype(np.float32, copy=False), cv2.COLOR_YUV2BGR)
         embed_img = np.clip(embed_img, PIXEL_MIN_VALUE, PIXEL_MAX_VALUE)
 
         if self.processor.alpha is not None:
             embed_img = cv2.merge([embed_img.astype(np.uint8), self.processor.alpha])
         return embed_img
 
-    def extract_raw(self, img: npt.NDArray) -> npt.NDArray[np.float64]:
-        """提取原始水印位元"""
+    def embed_region(self, img: npt.NDArray, rect: Tuple[int, int, int, int]) -> npt.NDArray:
+        """在已嵌入的圖片上只補嵌像素矩形 rect = (x, y, width, height) 涵蓋的分塊"""
+        return embed_region(self, img, rect)
+
+    def _blocks_buffer(self) -> ContextManager[npt.NDArray]:
+        """以 pool.allocate 配置 (3, N, h, w) 分塊張量，multiprocessing 模式下工作者直接讀寫"""
+        shape = (YUV_CHANNELS, self.block_num, self.block_shape.height, self.block_shape.width)
+        return self.pool.allocate(shape, self.processor.dtype)
+
+    def _stack_blocks(self, out: npt.NDArray) -> npt.NDArray:
+        """將三個通道的分塊堆疊進 (3, N, h, w) 張量 out"""
+        return np.stack([ca.reshape(out.shape[1:]) for ca in self.processor.ca_block], out=out)
+
+    def _batch_shufflers(self) -> tuple:
+        """批次核心的 (打亂索引, 還原索引, d2)；平行模式改傳 ShuffleTable，由工作者依 slab 取值"""
+        if self.fast_mode:
+            return None, None, 0
+        if self.pool.parallel:
+            table = (self.password_img, self.block_num, self.block_shape.size())
+            return ShuffleTable(*table), ShuffleTable(*table, inverse=True), self.d2
+        return self.idx_shuffle, self.idx_unshuffle, self.d2
+
+    def _embed_blocks(self, blocks: npt.NDArray) -> npt.NDArray:
+        """嵌入 (3, N, h, w) 分塊張量，批次與平行模式一次處理三個通道"""
+        wm_bits = CyclicBits(self.wm_bit)
+        if self.pool.batched:
+            shuffler, unshuffler, d2 = self._batch_shufflers()
+            return embed_blocks_slabs(self.pool, blocks, shuffler, unshuffler, wm_bits, self.d1, d2)
+
+        if self.fast_mode:
+            embed_func = lambda args: embed_watermark_in_block_fast(args[0], args[2], self.d1)
+        else:
+            embed_func = lambda args: embed_watermark_in_block_slow(
+                args[0], args[1], args[2], self.d1, self.d2, self.block_shape, args[3]
+            )
+        return np.array([
+            self.pool.map(embed_func, list(zip(channel, self.idx_shuffle, wm_bits[0:self.block_num], self.idx_unshuffle)))
+            for channel in blocks
+        ])
+
+    def _read_extract_img(self, img: npt.NDArray) -> None:
+        """讀取待提取圖片並初始化分塊與打亂索引"""
         self.read_img_arr(img=img)
         self.init_block_index()
-        self.idx_shuffle = generate_shuffle_indices(
-            self.password_img, self.block_num, self.block_shape.size()
-        )
-
-        wm_block_bit = np.zeros(shape=(YUV_CHANNELS, self.block_num))
-
-        for channel in range(YUV_CHANNELS):
-            if self.fast_mode:
-                extract_func = lambda args: extract_watermark_from_block_fast(
-                    args[0], self.d1
-                )
-            else:
-                extract_func = lambda args: extract_watermark_from_block_slow(
-                    args[0], args[1], self.d1, self.d2, self.block_shape
-                )
-
-            args_list = [
-                (self.processor.ca_block[channel][self.processor.block_index[i]], self.idx_shuffle[i])
-                for i in range(self.block_num)
-            ]
-            wm_block_bit[channel, :] = self.pool.map(extract_func, args_list)
-
-        return wm_block_bit
+        self.idx_shuffle = generate_shuffle_indices(self.password_img, self.block_num, self.block_shape.size())
 
-    def extract_avg(self, wm_block_bit: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
-        """
-        對循環嵌入和 3 個通道求平均（向量化優化版本）
-
-        原始版本使用迴圈，時間複雜度 O(wm_size × block_num)
-        優化版本使用 reshape + mean，時間複雜度 O(block_num)
-        """
-        # 計算可以完整循環的部分
-        num_complete_cycles = self.block_num // self.wm_size
-
-        if num_complete_cycles > 0:
-            # 截取完整循環部分
-            complete_part = wm_block_bit[:, :num_complete_cycles * self.wm_size]
-            # Reshape 並求平均：(3, num_cycles, wm_size) -> (wm_size,)
-            reshaped = complete_part.reshape(YUV_CHANNELS, num_complete_cycles, self.wm_size)
-            wm_avg = reshaped.mean(axis=(0, 1))
-
-            # 處理剩餘部分
-            remainder = self.block_num % self.wm_size
-            if remainder > 0:
-                remainder_part = wm_block_bit[:, -remainder:]
-                # 將剩餘部分加權平均
-                for i in range(remainder):
-                    wm_avg[i] = (wm_avg[i] * num_complete_cycles + remainder_part[:, i].mean()) / (num_complete_cycles + 1)
+    def extract_raw(self, img: npt.NDArray) -> npt.NDArray[np.float64]:
+        """提取原始水印位元"""
+        if self.fast_mode:
+            extract_func = lambda args: extract_watermark_from_block_fast(args[0], self.d1)
         else:
-            # 如果 block_num < wm_size，直接對每個位置求平均
-            wm_avg = wm_block_bit.mean(axis=0)
+            extract_func = lambda args: extract_watermark_from_block_slow(
+                args[0], args[1], self.d1, self.d2, self.block_shape
+            )
+        self._read_extract_img(img)
+        with self._blocks_buffer() as blocks:
+            self._stack_blocks(blocks)
+            if self.pool.batched:
+                shuffler, _, d2 = self._batch_shufflers()
+                return extract_blocks_slabs(self.pool, blocks, shuffler, self.d1, d2)
+            return np.array([
+                self.pool.map(extract_func, list(zip(channel, self.idx_shuffle))) for channel in blocks
+            ], dtype=np.float64)
 
-        return wm_avg
+    def extract_avg(self, wm_block_bit: npt.NDArray[np.float64]) -> npt.NDArray[np.float64]:
+        """對循環嵌入和 3 個通道求平均"""
+        return average_block_bits(wm_block_bit, self.wm_size)
 
     def extract(self, img: npt.NDArray, wm_shape: Tuple[int, ...]) -> npt.NDArray[np.float64]:
         """提取水印"""
         self.wm_size = int(np.prod(wm_shape))
-        wm_block_bit = self.extract_raw(img=img)
-        return self.extract_avg(wm_block_bit)
+        return self.extract_avg(self.extract_raw(img=img))
 
-    def extract_with_kmeans(
-        self, img: npt.NDArray, wm_shape: Tuple[int, ...]
-    ) -> WatermarkBitArray:
+    def extract_with_kmeans(self, img: npt.NDArray, wm_shape: Tuple[int, ...]) -> WatermarkBitArray:
         """提取水印並使用 K-means 二值化"""
         wm_avg = self.extract(img=img, wm_shape=wm_shape)
         return one_dim_kmeans(wm_avg)
 
+    def extract_progressive(
+        self, img: npt.NDArray, wm_shape: Tuple[int, ...], confidence: float = 3.0, min_cycles: int = 1
+    ) -> Tuple[WatermarkBitArray, int, bool]:
+        """
+        漸進提取並以 K-means 二值化，回傳 (水印位元, 使用的分塊數, 是否提前收斂)
+
+        色彩轉換與 Haar 分解仍對整張圖做一次，原因與實測加速見 examples/benchmark_progressive.py
+        """
+        self.wm_size = int(np.prod(wm_shape))
+        self._read_extract_img(img)
+        shuffler, d2 = (None, 0) if self.fast_mode else (self.idx_shuffle, self.d2)
+        wm_avg, blocks_used, converged = progressive_block_bits(
+            self.processor.ca_block, shuffler, self.d1, d2, self.wm_size, kmeans_threshold, confidence, min_cycles
+        )
+        return wm_avg > kmeans_threshold(wm_avg), blocks_used, converged
@@ -7,12 +7,11 @@ from typing import Tuple, List
 import numpy as np
 import numpy.typing as npt
 import cv2
-from pywt import dwt2
 
-from ..types import BlockShape
+from ..kernels.haar import haar_analysis
+from ..types import BlockShape, Precision
 from ..constants import (
     YUV_CHANNELS,
-    WAVELET_BASIS,
     BORDER_VALUE_Y,
     BORDER_VALUE_U,
     BORDER_VALUE_V,
@@ -23,14 +22,16 @@ from ..constants import (
 class ImageProcessor:
     """圖片預處理器"""
     
-    def __init__(self, block_shape: BlockShape):
+    def __init__(self, block_shape: BlockShape, precision: Precision = 'float32'):
         """
         初始化
         
         Args:
             block_shape: 分塊形狀
+            precision: DWT 係數與分塊的浮點型別
         """
         self.block_shape = block_shape
+        self.dtype = np.dtype(precision)
         
         # 圖片資料
         self.img: npt.NDArray = None
@@ -38,9 +39,8 @@ class ImageProcessor:
         self.img_shape: Tuple[int, int] = None
         self.alpha: npt.NDArray = None
         
-        # DWT 分解結果
-        self.ca: List[npt.NDArray] = [np.array([])] * YUV_CHANNELS
-        self.hvd: List[Tuple] = [None] * YUV_CHANNELS
+        # DWT 分解結果：(3, H/2, W/2) 的 cA，細節頻帶不保存（重建時由 img_YUV 推得）
+        self.ca: npt.NDArray = np.empty((YUV_CHANNELS, 0, 0))
         
         # 分塊資料
         self.ca_block: List[npt.NDArray] = [np.array([])] * YUV_CHANNELS
@@ -58,7 +58,7 @@ class ImageProcessor:
         1. 處理透明通道
         2. 轉換為 YUV
         3. 填充邊界
-        4. DWT 分解
+        4. Haar DWT 分解（只計算 cA）
         5. 分塊
         
         Args:
@@ -75,14 +75,14 @@ class ImageProcessor:
         self.img = img.astype(np.float32)
         self.img_shape = self.img.shape[:2]
         
-        # 轉換為 YUV 並填充邊界
+        # 轉換為 YUV 並填充邊界（OpenCV 色彩轉換只支援 float32，之後改用 self.dtype）
         self.img_YUV = cv2.copyMakeBorder(
             cv2.cvtColor(self.img, cv2.COLOR_BGR2YUV),
             0, self.img.shape[0] % 2,
             0, self.img.shape[1] % 2,
             cv2.BORDER_CONSTANT,
             value=(BORDER_VALUE_Y, BORDER_VALUE_U, BORDER_VALUE_V)
-        )
+        ).astype(self.dtype, copy=False)
         
         # 計算 DWT 後的尺寸
         self.ca_shape = tuple((i + 1) // 2 for i in self.img_shape)
@@ -96,23 +96,20 @@ class ImageProcessor:
         )
         
         # 計算 stride
-        strides = 4 * np.array([
+        strides = self.dtype.itemsize * np.array([
             self.ca_shape[1] * self.block_shape.height,
             self.block_shape.width,
             self.ca_shape[1],
             1
         ])
         
-        # 對每個通道進行 DWT 分解和分塊
+        # 三個通道一次進行 Haar 分解
+        self.ca = haar_analysis(self.img_YUV)
+
         for channel in range(YUV_CHANNELS):
-            self.ca[channel], self.hvd[channel] = dwt2(
-                self.img_YUV[:, :, channel],
-                WAVELET_BASIS
-            )
-            
             # 使用 stride tricks 進行分塊
             self.ca_block[channel] = np.lib.stride_tricks.as_strided(
-                self.ca[channel].astype(np.float32),
+                self.ca[channel].astype(self.dtype),
                 self.ca_block_shape,
                 strides
             )
@@ -141,6 +138,21 @@ class ImageProcessor:
         
         return block_num
     
+    def write_blocks(self, embedded: npt.NDArray) -> npt.NDArray:
+        """
+        將嵌入後的 (3, N, h, w) 分塊寫回各通道
+
+        Returns:
+            有效區域換成嵌入後分塊的 cA 複本
+        """
+        embed_ca = self.ca.copy()
+        for channel in range(YUV_CHANNELS):
+            blocks = self.ca_block[channel]
+            blocks[...] = embedded[channel].reshape(blocks.shape)
+            self.ca_part[channel] = np.concatenate(np.concatenate(blocks, 1), 1)
+            embed_ca[channel][:self.part_shape[0], :self.part_shape[1]] = self.ca_part[channel]
+        return embed_ca
+
     def get_block_num(self) -> int:
         """獲取分塊數量"""
         return self.ca_block_shape[0] * self.ca_block_shape[1]
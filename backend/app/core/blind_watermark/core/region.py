@@ -0,0 +1,96 @@
+"""
+局部補嵌模組
+
+已嵌入水印的圖片經局部編輯（疊加 logo、裁切邊框）後，只重新嵌入
+髒矩形涵蓋的 LL 分塊；每個分塊的位元只取決於分塊編號（i % wm_size），
+因此只需處理對應的像素範圍，其餘像素原樣保留
+"""
+from typing import Tuple
+import numpy as np
+import numpy.typing as npt
+import cv2
+
+from ..constants import YUV_CHANNELS, PIXEL_MAX_VALUE, PIXEL_MIN_VALUE
+from ..exceptions import WatermarkCapacityError
+from ..kernels import embed_watermark_batch, haar_synthesis
+from ..utils import generate_block_permutation
+from .image_processor import ImageProcessor
+
+
+def covering_blocks(
+    img_shape: Tuple[int, int],
+    block_shape: Tuple[int, int],
+    rect: Tuple[int, int, int, int]
+) -> Tuple[slice, slice, int]:
+    """
+    計算像素矩形涵蓋的分塊範圍
+
+    Args:
+        img_shape: 圖片 (height, width)
+        block_shape: 分塊 (height, width)
+        rect: 像素矩形 (x, y, width, height)
+
+    Returns:
+        (分塊列範圍, 分塊行範圍, 整張圖每列的分塊數)
+    """
+    x, y, width, height = rect
+    if width <= 0 or height <= 0:
+        raise ValueError("rect width and height must be positive")
+    bh, bw = block_shape
+    rows = ((img_shape[0] + 1) // 2) // bh
+    cols = ((img_shape[1] + 1) // 2) // bw
+    # 一個 LL 分塊對應 2h x 2w 的像素
+    row_range = slice(max(y, 0) // (2 * bh), min(rows, max(-(-(y + height) // (2 * bh)), 0)))
+    col_range = slice(max(x, 0) // (2 * bw), min(cols, max(-(-(x + width) // (2 * bw)), 0)))
+    return row_range, col_range, cols
+
+
+def embed_region(core, img: npt.NDArray, rect: Tuple[int, int, int, int]) -> npt.NDArray:
+    """
+    只重新嵌入 rect 涵蓋的分塊，參數（密碼、強度、精度、快速模式）取自 core
+
+    Args:
+        core: 已讀取水印的 WaterMarkCore
+        img: 已嵌入水印並經局部修改的圖片
+        rect: 髒矩形 (x, y, width, height)
+
+    Returns:
+        與 embed 相同型別（float32，已裁切至像素範圍）的圖片
+    """
+    block_size = tuple(int(v) for v in core.block_shape.to_array())
+    rows, cols, total_cols = covering_blocks(img.shape[:2], block_size, rect)
+    block_num = (((img.shape[0] + 1) // 2) // block_size[0]) * total_cols
+    if core.wm_size > block_num:
+        raise WatermarkCapacityError(required_bits=core.wm_size, available_bits=block_num)
+
+    result = img.astype(np.float32)
+    if rows.start >= rows.stop or cols.start >= cols.stop:
+        return result
+
+    bh, bw = block_size
+    top, left = rows.start * 2 * bh, cols.start * 2 * bw
+    region = img[top:rows.stop * 2 * bh, left:cols.stop * 2 * bw, :3]
+    processor = ImageProcessor(core.block_shape, core.processor.dtype.name)
+    processor.process_image(region)
+
+    count = (rows.stop - rows.start, cols.stop - cols.start)
+    index = (np.arange(rows.start, rows.stop)[:, None] * total_cols + np.arange(cols.start, cols.stop)).ravel()
+    blocks = np.stack([ca.reshape(index.size, bh, bw) for ca in processor.ca_block])
+    wm_bits = core.wm_bit[index % core.wm_size]
+    if core.fast_mode:
+        embedded = embed_watermark_batch(blocks, None, wm_bits, core.d1, 0)
+    else:
+        shuffler, unshuffler = generate_block_permutation(core.password_img, block_num, bh * bw)
+        embedded = embed_watermark_batch(blocks, shuffler[index], wm_bits, core.d1, core.d2, unshuffler[index])
+
+    ca = processor.ca.copy()
+    ca[:, :count[0] * bh, :count[1] * bw] = (
+        embedded.reshape(YUV_CHANNELS, count[0], count[1], bh, bw).swapaxes(2, 3)
+        .reshape(YUV_CHANNELS, count[0] * bh, count[1] * bw)
+    )
+    yuv = haar_synthesis(processor.img_YUV, ca)[:region.shape[0], :region.shape[1]]
+    bgr = cv2.cvtColor(yuv.astype(np.float32, copy=False), cv2.COLOR_YUV2BGR)
+    result[top:top + region.shape[0], left:left + region.shape[1], :3] = np.clip(
+        bgr, PIXEL_MIN_VALUE, PIXEL_MAX_VALUE
+    )
+    return result
@@ -3,10 +3,10 @@ from typing import Optional, Union, Tuple
 import numpy as np
 import numpy.typing as npt
 
-from ..types import WatermarkMode, WatermarkBitArray, PoolMode
+from ..types import WatermarkMode, WatermarkBitArray, PoolMode, Precision
 from ..exceptions import InvalidModeError, WatermarkShapeError
 from ..utils import (
-    load_image, load_grayscale_image, save_image,
+    AutoPool, load_image, load_grayscale_image, save_image,
     shuffle_watermark, unshuffle_watermark
 )
 from ..version import bw_notes
@@ -37,7 +37,9 @@ class WaterMark:
         processes: Optional[int] = None,
         robustness_primary: int = 36,
         robustness_secondary: int = 20,
-        fast_mode: bool = False
+        fast_mode: bool = False,
+        pool: Optional[AutoPool] = None,
+        precision: Precision = 'float32'
     ):
         """
         初始化水印物件
@@ -50,6 +52,8 @@ class WaterMark:
             robustness_primary: 主要魯棒性參數（越大越強但失真越大）
             robustness_secondary: 次要魯棒性參數
             fast_mode: 快速模式（僅使用主奇異值）
+            pool: 共用的處理池（例如 shared_pool 的實例），None 表示自行建立
+            precision: 運算精度，'float32' 或 'float64'
         """
         bw_notes.print_notes()
         
@@ -59,13 +63,19 @@ class WaterMark:
             processes=processes,
             robustness_primary=robustness_primary,
             robustness_secondary=robustness_secondary,
-            fast_mode=fast_mode
+            fast_mode=fast_mode,
+            pool=pool,
+            precision=precision
         )
         
         self.password_wm = password_wm
         self.wm_bit: Optional[WatermarkBitArray] = None
         self.wm_size: int = 0
     
+    def close(self) -> None:
+        """釋放自行建立的處理池"""
+        self.bwm_core.close()
+
     def read_img(
         self,
         filename: Optional[str] = None,
@@ -109,6 +119,27 @@ class WaterMark:
             save_image(filename, embed_img, compression_ratio)
         return embed_img
 
+    def embed_region(
+        self,
+        img: npt.NDArray,
+        rect: Tuple[int, int, int, int],
+        filename: Optional[str] = None,
+        compression_ratio: Optional[int] = None
+    ) -> npt.NDArray:
+        """
+        圖片局部修改後只補嵌受影響的分塊，需先呼叫 read_wm
+
+        Args:
+            img: 已嵌入水印並經局部修改的圖片
+            rect: 髒矩形 (x, y, width, height)
+            filename: 輸出檔案路徑
+            compression_ratio: 壓縮比例
+        """
+        embed_img = self.bwm_core.embed_region(img, rect)
+        if filename is not None:
+            save_image(filename, embed_img, compression_ratio)
+        return embed_img
+
     def extract(
         self,
         filename: Optional[str] = None,
@@ -0,0 +1,25 @@
+"""批次運算核心模組"""
+from .batched import embed_watermark_batch, extract_watermark_batch
+from .haar import haar_analysis, haar_synthesis
+from .payload import average_block_bits, progressive_block_bits
+from .tasks import (
+    CyclicBits, ShuffleTable, embed_blocks_slabs, extract_blocks_slabs, embed_slab, extract_slab,
+    embed_slab_inplace, extract_slab_into
+)
+
+__all__ = [
+    'embed_watermark_batch',
+    'extract_watermark_batch',
+    'haar_analysis',
+    'haar_synthesis',
+    'average_block_bits',
+    'progressive_block_bits',
+    'embed_blocks_slabs',
+    'extract_blocks_slabs',
+    'embed_slab',
+    'extract_slab',
+    'embed_slab_inplace',
+    'extract_slab_into',
+    'CyclicBits',
+    'ShuffleTable',
+]
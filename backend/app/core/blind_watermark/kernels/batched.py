@@ -0,0 +1,179 @@
+"""
+批次 DWT-DCT-SVD 演算法模組
+
+以 (N, h, w) 區塊堆疊為單位，一次完成整個通道的 DCT、SVD 與量化，
+取代逐區塊呼叫 embed_watermark_in_block_slow / fast 的 Python 迴圈
+"""
+from functools import lru_cache
+from typing import Literal, Optional
+import numpy as np
+import numpy.typing as npt
+
+from ..constants import (
+    SVD_QUANTIZATION_OFFSET,
+    SVD_WATERMARK_WEIGHT,
+    PRIMARY_SINGULAR_VALUE_WEIGHT,
+    SECONDARY_SINGULAR_VALUE_WEIGHT,
+    TOTAL_WEIGHT
+)
+from ..types import ShuffleIndexArray
+from ..utils.encryption import inverse_indices
+
+
+@lru_cache(maxsize=8)
+def dct_matrix(size: int) -> npt.NDArray[np.float64]:
+    """
+    生成正交 DCT-II 矩陣（與 cv2.dct 縮放一致）
+
+    Args:
+        size: 矩陣邊長
+
+    Returns:
+        (size, size) 的 DCT 矩陣
+    """
+    k = np.arange(size)[:, None]
+    j = np.arange(size)[None, :]
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * j + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def batch_dct(blocks: npt.NDArray) -> npt.NDArray:
+    """對 (..., h, w) 區塊堆疊做 2D DCT"""
+    h, w = blocks.shape[-2:]
+    left = dct_matrix(h).astype(blocks.dtype)
+    right = dct_matrix(w).astype(blocks.dtype)
+    return left @ blocks @ right.T
+
+
+def batch_idct(coeffs: npt.NDArray) -> npt.NDArray:
+    """對 (..., h, w) 係數堆疊做 2D 逆 DCT"""
+    h, w = coeffs.shape[-2:]
+    left = dct_matrix(h).astype(coeffs.dtype)
+    right = dct_matrix(w).astype(coeffs.dtype)
+    return left.T @ coeffs @ right
+
+
+def singular_values(
+    matrices: npt.NDArray,
+    method: Literal['svd', 'gram'] = 'svd'
+) -> npt.NDArray:
+    """
+    只計算 (..., h, w) 矩陣堆疊的奇異值（遞減排序），不產生 U 與 V
+
+    Args:
+        matrices: 矩陣堆疊
+        method: 'svd' 使用 compute_uv=False 的 SVD；
+            'gram' 以 float64 計算 B^T B 特徵值後開根號，小區塊時更快，
+            僅在奇異值貼近量化邊界時可能與 'svd' 判斷不同
+
+    Returns:
+        (..., min(h, w)) 奇異值
+    """
+    if method == 'gram':
+        h, w = matrices.shape[-2:]
+        gram = matrices.astype(np.float64)
+        gram = np.swapaxes(gram, -1, -2) @ gram if w <= h else gram @ np.swapaxes(gram, -1, -2)
+        eigen = np.linalg.eigvalsh(gram)[..., ::-1]
+        return np.sqrt(np.clip(eigen, 0.0, None))
+    return np.linalg.svd(matrices, compute_uv=False)
+
+
+def quantize(values: npt.NDArray, wm_bits: npt.NDArray, step: int) -> npt.NDArray:
+    """
+    向量化量化奇異值
+
+    等同於逐區塊的 (s // d + 1/4 + 1/2 * wm_bit) * d；位元先轉成 values 的 dtype，
+    避免布林/整數位元把 float32 運算提升為 float64
+    """
+    offset = SVD_QUANTIZATION_OFFSET + SVD_WATERMARK_WEIGHT * np.asarray(wm_bits).astype(values.dtype, copy=False)
+    return (values // step + offset) * step
+
+
+def shuffle_blocks(coeffs: npt.NDArray, shuffler: ShuffleIndexArray) -> npt.NDArray:
+    """依每列的打亂索引重排 (..., N, h, w) 係數，前置維度（通道）共用索引"""
+    h, w = coeffs.shape[-2:]
+    flat = coeffs.reshape(*coeffs.shape[:-2], h * w)
+    index = shuffler.reshape((1,) * (flat.ndim - 2) + shuffler.shape)
+    return np.take_along_axis(flat, index, axis=-1).reshape(coeffs.shape)
+
+
+def unshuffle_blocks(coeffs: npt.NDArray, unshuffler: ShuffleIndexArray) -> npt.NDArray:
+    """以預先計算的還原索引（inverse_indices）還原 shuffle_blocks 的重排"""
+    return shuffle_blocks(coeffs, unshuffler)
+
+
+def embed_watermark_batch(
+    blocks: npt.NDArray[np.float32],
+    shuffler: Optional[ShuffleIndexArray],
+    wm_bits: npt.NDArray,
+    d1: int,
+    d2: int,
+    unshuffler: Optional[ShuffleIndexArray] = None
+) -> npt.NDArray[np.float32]:
+    """
+    一次在整個通道的所有分塊中嵌入水印
+
+    流程與 embed_watermark_in_block_slow 相同；shuffler 為 None 且 d2 為 0 時
+    等同於 embed_watermark_in_block_fast
+
+    Args:
+        blocks: (..., N, h, w) 分塊堆疊，前置維度（如 YUV 通道）共用打亂索引
+        shuffler: (N, h*w) 打亂索引，None 表示不打亂
+        wm_bits: (N,) 每個分塊要嵌入的水印位元
+        d1: 主要奇異值的量化步長
+        d2: 次要奇異值的量化步長（0 表示不使用）
+        unshuffler: 預先計算的還原索引，None 時由 shuffler 推得
+
+    Returns:
+        嵌入水印後的 (..., N, h, w) 分塊堆疊
+    """
+    coeffs = batch_dct(blocks)
+    if shuffler is not None:
+        coeffs = shuffle_blocks(coeffs, shuffler)
+
+    u, s, v = np.linalg.svd(coeffs, full_matrices=False)
+    s[..., 0] = quantize(s[..., 0], wm_bits, d1)
+    if d2:
+        s[..., 1] = quantize(s[..., 1], wm_bits, d2)
+    coeffs = (u * s[..., None, :]) @ v
+
+    if shuffler is not None:
+        if unshuffler is None:
+            unshuffler = inverse_indices(shuffler)
+        coeffs = unshuffle_blocks(coeffs, unshuffler)
+    return batch_idct(coeffs)
+
+
+def extract_watermark_batch(
+    blocks: npt.NDArray[np.float32],
+    shuffler: Optional[ShuffleIndexArray],
+    d1: int,
+    d2: int,
+    sv_method: Literal['svd', 'gram'] = 'svd'
+) -> npt.NDArray[np.float64]:
+    """
+    一次從所有通道的所有分塊中提取水印
+
+    Args:
+        blocks: (3, N, h, w) 分塊張量（YUV 三通道堆疊）
+        shuffler: (N, h*w) 打亂索引，三個通道共用；None 表示不打亂
+        d1: 主要奇異值的量化步長
+        d2: 次要奇異值的量化步長（0 表示不使用）
+        sv_method: 奇異值計算方式，見 singular_values
+
+    Returns:
+        (3, N) 的軟位元矩陣，數值與 extract_watermark_from_block_slow 一致
+    """
+    coeffs = batch_dct(blocks)
+    if shuffler is not None:
+        coeffs = shuffle_blocks(coeffs, shuffler)
+
+    s = singular_values(coeffs, sv_method)
+    wm = ((s[..., 0] % d1) > (d1 / 2)).astype(np.float64)
+    if d2:
+        wm_secondary = ((s[..., 1] % d2) > (d2 / 2)).astype(np.float64)
+        wm = (wm * PRIMARY_SINGULAR_VALUE_WEIGHT +
+              wm_secondary * SECONDARY_SINGULAR_VALUE_WEIGHT) / TOTAL_WEIGHT
+    return wm
@@ -0,0 +1,109 @@
+"""
+分塊去重模組
+
+cached 模式的批次核心：內容相同的分塊只做一次 DCT，打亂後相同的係數
+只做一次 SVD，並透過 BlockMemo 跨呼叫記住結果
+"""
+from typing import Literal, Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+
+from ..constants import PRIMARY_SINGULAR_VALUE_WEIGHT, SECONDARY_SINGULAR_VALUE_WEIGHT, TOTAL_WEIGHT
+from ..types import ShuffleIndexArray
+from ..utils.encryption import inverse_indices
+from ..utils.memo import BlockMemo
+from .batched import batch_dct, batch_idct, quantize, shuffle_blocks, singular_values
+
+
+def unique_rows(rows: npt.NDArray) -> Tuple[npt.NDArray, npt.NDArray]:
+    """
+    回傳 (M, K) 陣列中不重複的列與還原索引，使 rows 與 unique[inverse] 逐位元組相同
+    """
+    rows = np.ascontiguousarray(rows)
+    view = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).reshape(-1)
+    _, index, inverse = np.unique(view, return_index=True, return_inverse=True)
+    return rows[index], inverse.reshape(-1)
+
+
+def dct_unique(blocks: npt.NDArray) -> npt.NDArray:
+    """
+    對 (..., h, w) 分塊做 DCT，內容相同的分塊只轉換一次，並把只剩浮點誤差的係數歸零
+
+    平坦分塊的 DCT 只有直流項非零，但矩陣運算會在交流項留下極小的雜訊；
+    雜訊隨打亂排列後每個分塊都不同，歸零後打亂結果只剩 h*w 種，才能去重
+    """
+    h, w = blocks.shape[-2:]
+    unique, inverse = unique_rows(blocks.reshape(-1, h * w))
+    coeffs = batch_dct(unique.reshape(-1, h, w))[inverse].reshape(blocks.shape)
+    tolerance = np.abs(coeffs).max(axis=(-2, -1), keepdims=True) * (4 * np.finfo(coeffs.dtype).eps)
+    return np.where(np.abs(coeffs) <= tolerance, 0, coeffs)
+
+
+def embed_watermark_cached(
+    blocks: npt.NDArray,
+    shuffler: Optional[ShuffleIndexArray],
+    wm_bits: npt.NDArray,
+    d1: int,
+    d2: int,
+    memo: BlockMemo,
+    unshuffler: Optional[ShuffleIndexArray] = None
+) -> npt.NDArray:
+    """
+    embed_watermark_batch 的去重版本，參數意義相同
+
+    提取結果與 embed_watermark_batch 相同；像素只在秩不足（平坦）分塊可能不同，
+    這類分塊的奇異向量本來就不唯一
+    """
+    h, w = blocks.shape[-2:]
+    coeffs = dct_unique(blocks)
+    if shuffler is not None:
+        coeffs = shuffle_blocks(coeffs, shuffler)
+    flat = coeffs.reshape(-1, h * w)
+    bits = np.broadcast_to(wm_bits, coeffs.shape[:-2]).reshape(-1, 1).astype(flat.dtype)
+    unique, index = unique_rows(np.concatenate([flat, bits], axis=1))
+
+    def compute(rows: npt.NDArray) -> npt.NDArray:
+        u, s, v = np.linalg.svd(rows[:, :-1].reshape(-1, h, w), full_matrices=False)
+        s[..., 0] = quantize(s[..., 0], rows[:, -1], d1)
+        if d2:
+            s[..., 1] = quantize(s[..., 1], rows[:, -1], d2)
+        return (u * s[..., None, :]) @ v
+
+    namespace = ('embed', d1, d2, flat.dtype.str)
+    coeffs = memo.resolve(namespace, unique, compute, flat.shape[0])[index].reshape(coeffs.shape)
+    if shuffler is not None:
+        coeffs = shuffle_blocks(coeffs, inverse_indices(shuffler) if unshuffler is None else unshuffler)
+    return batch_idct(coeffs)
+
+
+def extract_watermark_cached(
+    blocks: npt.NDArray,
+    shuffler: Optional[ShuffleIndexArray],
+    d1: int,
+    d2: int,
+    memo: BlockMemo,
+    sv_method: Literal['svd', 'gram'] = 'svd'
+) -> npt.NDArray[np.float64]:
+    """
+    extract_watermark_batch 的去重版本，打亂後相同的係數只計算一次奇異值
+
+    Returns:
+        (3, N) 的軟位元矩陣
+    """
+    h, w = blocks.shape[-2:]
+    coeffs = dct_unique(blocks)
+    if shuffler is not None:
+        coeffs = shuffle_blocks(coeffs, shuffler)
+    unique, index = unique_rows(coeffs.reshape(-1, h * w))
+
+    def compute(rows: npt.NDArray) -> npt.NDArray:
+        s = singular_values(rows.reshape(-1, h, w), sv_method)
+        wm = ((s[..., 0] % d1) > (d1 / 2)).astype(np.float64)
+        if d2:
+            wm_secondary = ((s[..., 1] % d2) > (d2 / 2)).astype(np.float64)
+            wm = (wm * PRIMARY_SINGULAR_VALUE_WEIGHT +
+                  wm_secondary * SECONDARY_SINGULAR_VALUE_WEIGHT) / TOTAL_WEIGHT
+        return wm
+
+    namespace = ('extract', d1, d2, sv_method, coeffs.dtype.str)
+    return memo.resolve(namespace, unique, compute, index.size)[index].reshape(coeffs.shape[:-2])
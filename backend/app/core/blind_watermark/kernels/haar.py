@@ -0,0 +1,60 @@
+"""
+Haar 小波模組
+
+直接在 (H, W, 3) YUV 陣列的跨步視圖上完成單層 Haar 分解與重建，
+三個通道一次處理，且不配置從未修改的 cH/cV/cD 細節頻帶
+"""
+from typing import Optional, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+def _quadrants(planes: npt.NDArray) -> Tuple[npt.NDArray, npt.NDArray, npt.NDArray, npt.NDArray]:
+    """回傳每個 2x2 區塊左上、右上、左下、右下像素的跨步視圖"""
+    h, w = planes.shape[:2]
+    if h % 2 or w % 2:
+        raise ValueError("haar transform requires even height and width")
+    return planes[0::2, 0::2], planes[0::2, 1::2], planes[1::2, 0::2], planes[1::2, 1::2]
+
+
+def haar_analysis(planes: npt.NDArray, out: Optional[npt.NDArray] = None) -> npt.NDArray:
+    """
+    計算所有通道的 LL 頻帶，與 pywt.dwt2(..., 'haar') 的 cA 相同
+
+    Args:
+        planes: (H, W, C) 平面，H 與 W 必須為偶數
+        out: 預先配置的 (C, H/2, W/2) 輸出，None 時自行配置
+
+    Returns:
+        (C, H/2, W/2) 的 cA
+    """
+    top_left, top_right, bottom_left, bottom_right = _quadrants(planes)
+    if out is None:
+        out = np.empty((planes.shape[2], *top_left.shape[:2]), dtype=planes.dtype)
+    target = out.transpose(1, 2, 0)
+    np.add(top_left, top_right, out=target)
+    target += bottom_left
+    target += bottom_right
+    target *= 0.5
+    return out
+
+
+def haar_synthesis(planes: npt.NDArray, ca: npt.NDArray) -> npt.NDArray:
+    """
+    以修改後的 cA 就地重建平面，等同 pywt.idwt2((ca, 原細節頻帶), 'haar')
+
+    細節頻帶不變，每個 2x2 區塊只需加上 (新 cA - 原 cA) / 2，原 cA 由 planes 求得
+
+    Args:
+        planes: 分解前的 (H, W, C) 平面，會被就地改寫
+        ca: 修改後的 (C, H/2, W/2) cA
+
+    Returns:
+        重建後的 planes
+    """
+    delta = haar_analysis(planes).transpose(1, 2, 0)
+    np.subtract(ca.transpose(1, 2, 0), delta, out=delta)
+    delta *= 0.5
+    for quadrant in _quadrants(planes):
+        quadrant += delta
+    return planes
@@ -0,0 +1,118 @@
+"""水印位元彙整模組"""
+from typing import Callable, Optional, Sequence, Tuple
+import numpy as np
+import numpy.typing as npt
+
+from ..constants import YUV_CHANNELS
+from ..types import ShuffleIndexArray
+from .batched import extract_watermark_batch
+
+
+def average_block_bits(wm_block_bit: npt.NDArray[np.float64], wm_size: int) -> npt.NDArray[np.float64]:
+    """
+    對循環嵌入和 3 個通道求平均（向量化優化版本）
+
+    原始版本使用迴圈，時間複雜度 O(wm_size × block_num)
+    優化版本使用 reshape + mean，時間複雜度 O(block_num)
+
+    Args:
+        wm_block_bit: (3, block_num) 每個分塊的軟位元
+        wm_size: 水印位元數
+
+    Returns:
+        (wm_size,) 平均後的軟位元
+    """
+    block_num = wm_block_bit.shape[1]
+    # 計算可以完整循環的部分
+    num_complete_cycles = block_num // wm_size
+
+    if num_complete_cycles > 0:
+        # 截取完整循環部分
+        complete_part = wm_block_bit[:, :num_complete_cycles * wm_size]
+        # Reshape 並求平均：(3, num_cycles, wm_size) -> (wm_size,)
+        reshaped = complete_part.reshape(YUV_CHANNELS, num_complete_cycles, wm_size)
+        wm_avg = reshaped.mean(axis=(0, 1))
+
+        # 處理剩餘部分
+        remainder = block_num % wm_size
+        if remainder > 0:
+            remainder_part = wm_block_bit[:, -remainder:]
+            # 將剩餘部分加權平均
+            for i in range(remainder):
+                wm_avg[i] = (wm_avg[i] * num_complete_cycles + remainder_part[:, i].mean()) / (num_complete_cycles + 1)
+    else:
+        # 如果 block_num < wm_size，直接對每個位置求平均
+        wm_avg = wm_block_bit.mean(axis=0)
+
+    return wm_avg
+
+
+def cycle_blocks(cycles: npt.NDArray, wm_size: int, block_num: int) -> npt.NDArray:
+    """依 cycles 順序串接各循環涵蓋的分塊編號，最後一個循環可能不完整"""
+    index = (np.asarray(cycles)[:, None] * wm_size + np.arange(wm_size)).reshape(-1)
+    return index[index < block_num]
+
+
+def progressive_block_bits(
+    ca_blocks: Sequence[npt.NDArray],
+    shuffler: Optional[ShuffleIndexArray],
+    d1: int,
+    d2: int,
+    wm_size: int,
+    threshold: Callable[[npt.NDArray[np.float64]], float],
+    confidence: float = 3.0,
+    min_cycles: int = 1
+) -> Tuple[npt.NDArray[np.float64], int, bool]:
+    """
+    以循環為單位漸進提取，所有位元判定穩定後提前結束
+
+    循環以固定亂數順序走訪，使前幾段樣本分散在整張圖；每段處理的循環數加倍，
+    段落結束時若位元判定與上一段相同，且每個位元平均值離閾值至少 confidence 個標準誤，即停止。
+    每段只從分塊視圖收集該段的分塊，並以一次批次核心呼叫處理。
+    分塊視圖來自對整張圖一次完成的色彩轉換與 Haar 分解：循環刻意分散在整張圖，
+    若改為逐段只分解涵蓋的分塊列，前一兩段之後幾乎仍會涵蓋所有列，因此不做延遲分解
+
+    Args:
+        ca_blocks: 三個通道的 (rows, cols, h, w) 分塊視圖
+        shuffler: (N, h*w) 打亂索引，None 表示不打亂
+        d1: 主要奇異值的量化步長
+        d2: 次要奇異值的量化步長（0 表示不使用）
+        wm_size: 水印位元數
+        threshold: 由目前平均值求出判定閾值的函數（如 K-means 閾值）
+        confidence: 需要的標準誤倍數
+        min_cycles: 第一段的循環數，每個位元至少需要 3 * min_cycles 個樣本
+
+    Returns:
+        (平均後的軟位元, 使用的分塊數, 是否提前收斂)
+    """
+    if confidence <= 0 or min_cycles <= 0:
+        raise ValueError("confidence and min_cycles must be positive")
+    rows, cols = ca_blocks[0].shape[:2]
+    block_num = rows * cols
+    cycles = np.random.RandomState(0).permutation(-(-block_num // wm_size))
+    counts, sums, squares = np.zeros(wm_size), np.zeros(wm_size), np.zeros(wm_size)
+    done, chunk, previous, converged = 0, min_cycles, None, False
+    while done < cycles.size and not converged:
+        stop = min(cycles.size, done + chunk)
+        index = cycle_blocks(cycles[done:stop], wm_size, block_num)
+        block_rows, block_cols = np.divmod(index, cols)
+        blocks = np.stack([channel[block_rows, block_cols] for channel in ca_blocks])
+        part_shuffler = None if shuffler is None else shuffler[index]
+        values = extract_watermark_batch(blocks, part_shuffler, d1, d2)
+        bits = np.tile(index % wm_size, values.shape[0])
+        counts += np.bincount(bits, minlength=wm_size)
+        sums += np.bincount(bits, weights=values.reshape(-1), minlength=wm_size)
+        squares += np.bincount(bits, weights=values.reshape(-1) ** 2, minlength=wm_size)
+        mean = sums / np.maximum(counts, 1)
+        stderr = np.sqrt(np.clip(squares / np.maximum(counts, 1) - mean ** 2, 0, None) / np.maximum(counts, 1))
+        level = threshold(mean)
+        decisions = mean > level
+        # 標準誤為 0（樣本完全一致）時只要不在閾值上即視為確定
+        confident = np.abs(mean - level) >= confidence * stderr
+        confident &= (stderr > 0) | (mean != level)
+        converged = (
+            previous is not None and np.array_equal(decisions, previous)
+            and bool(np.all(counts >= 3 * min_cycles) and np.all(confident))
+        )
+        previous, chunk, done = decisions, max(chunk, stop), stop
+    return mean, int(counts.sum()) // YUV_CHANNELS, converged
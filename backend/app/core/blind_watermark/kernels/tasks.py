@@ -0,0 +1,150 @@
+"""
+slab 任務模組
+
+提供可被 pickle 的頂層任務函數：所有任務共用同一份 (3, N, h, w) 分塊張量，
+每個任務只攜帶自己的 slab 範圍。平行模式下分塊與輸出張量由呼叫端以 pool.allocate 配置，
+進程工作者只收到共享記憶體名稱並就地讀寫；打亂索引與水印位元以描述傳遞，由工作者依 slab 取值
+"""
+from dataclasses import dataclass
+from typing import Optional, Union
+import numpy as np
+import numpy.typing as npt
+
+from ..types import ShuffleIndexArray
+from ..utils.encryption import generate_block_permutation
+from ..utils.memo import block_memo
+from .batched import embed_watermark_batch, extract_watermark_batch
+from .dedup import embed_watermark_cached, extract_watermark_cached
+
+
+@dataclass(frozen=True)
+class ShuffleTable:
+    """可被 pickle 的打亂索引描述，工作者依 slab 範圍自 shuffle_index_cache 取值"""
+    password: int
+    size: int
+    block_shape: int
+    inverse: bool = False
+
+    def __getitem__(self, slab: slice) -> ShuffleIndexArray:
+        return generate_block_permutation(self.password, self.size, self.block_shape)[int(self.inverse)][slab]
+
+
+@dataclass(frozen=True, eq=False)
+class CyclicBits:
+    """分塊 i 的水印位元為 wm_bit[i % wm_size]，只 pickle 水印本身"""
+    wm_bit: npt.NDArray
+
+    def __getitem__(self, slab: slice) -> npt.NDArray:
+        return self.wm_bit[np.arange(slab.start, slab.stop) % self.wm_bit.size]
+
+
+Shuffler = Union[ShuffleIndexArray, ShuffleTable]
+
+
+def embed_slab(
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    unshuffler: Optional[Shuffler],
+    wm_bits: Union[npt.NDArray, CyclicBits],
+    d1: int,
+    d2: int,
+    slab: slice
+) -> npt.NDArray:
+    """嵌入 slab 範圍內三個通道的分塊，回傳 (3, n, h, w)"""
+    if shuffler is None:
+        return embed_watermark_batch(blocks[:, slab], None, wm_bits[slab], d1, d2)
+    return embed_watermark_batch(blocks[:, slab], shuffler[slab], wm_bits[slab], d1, d2, unshuffler[slab])
+
+
+def extract_slab(
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    d1: int,
+    d2: int,
+    slab: slice
+) -> npt.NDArray[np.float64]:
+    """提取 slab 範圍內三個通道的軟位元，回傳 (3, n)"""
+    part_shuffler = None if shuffler is None else shuffler[slab]
+    return extract_watermark_batch(blocks[:, slab], part_shuffler, d1, d2)
+
+
+def embed_slab_inplace(
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    unshuffler: Optional[Shuffler],
+    wm_bits: Union[npt.NDArray, CyclicBits],
+    d1: int,
+    d2: int,
+    slab: slice
+) -> None:
+    """嵌入 slab 範圍的分塊並寫回 blocks（可位於共享記憶體），參數同 embed_slab"""
+    blocks[:, slab] = embed_slab(blocks, shuffler, unshuffler, wm_bits, d1, d2, slab)
+
+
+def extract_slab_into(
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    d1: int,
+    d2: int,
+    out: npt.NDArray[np.float64],
+    slab: slice
+) -> None:
+    """提取 slab 範圍的軟位元並寫入 (3, N) 的 out 對應欄位，參數同 extract_slab"""
+    out[:, slab] = extract_slab(blocks, shuffler, d1, d2, slab)
+
+
+def embed_blocks_slabs(
+    pool,
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    unshuffler: Optional[Shuffler],
+    wm_bits: Union[npt.NDArray, CyclicBits],
+    d1: int,
+    d2: int
+) -> npt.NDArray:
+    """
+    以批次核心嵌入 (3, N, h, w) 分塊張量
+
+    向量化模式一次處理全部分塊；cached 模式先去除重複分塊並查詢記憶表；
+    平行模式則依 pool.map_slabs 切成連續 slab 分給工作者，就地寫回 blocks
+
+    Args:
+        pool: AutoPool
+        blocks: (3, N, h, w) 分塊張量，平行模式下須以 pool.allocate 配置
+        shuffler: (N, h*w) 打亂索引或 ShuffleTable，None 表示不打亂
+        unshuffler: 對應的還原索引
+        wm_bits: (N,) 每個分塊的水印位元或 CyclicBits
+        d1: 主要奇異值的量化步長
+        d2: 次要奇異值的量化步長
+
+    Returns:
+        嵌入後的 (3, N, h, w) 分塊張量（平行模式下即 blocks 本身）
+    """
+    if pool.vectorized:
+        return embed_watermark_batch(blocks, shuffler, wm_bits[0:blocks.shape[1]], d1, d2, unshuffler)
+    if pool.cached:
+        return embed_watermark_cached(blocks, shuffler, wm_bits[0:blocks.shape[1]], d1, d2, block_memo(), unshuffler)
+    pool.map_slabs(embed_slab_inplace, blocks.shape[1], (blocks, shuffler, unshuffler, wm_bits, d1, d2))
+    return blocks
+
+
+def extract_blocks_slabs(
+    pool,
+    blocks: npt.NDArray,
+    shuffler: Optional[Shuffler],
+    d1: int,
+    d2: int
+) -> npt.NDArray[np.float64]:
+    """
+    以批次核心提取 (3, N, h, w) 分塊張量，排程方式同 embed_blocks_slabs
+
+    Returns:
+        (3, N) 軟位元矩陣
+    """
+    if pool.vectorized:
+        return extract_watermark_batch(blocks, shuffler, d1, d2)
+    if pool.cached:
+        return extract_watermark_cached(blocks, shuffler, d1, d2, block_memo())
+    with pool.allocate(blocks.shape[:2], np.float64) as out:
+        pool.map_slabs(extract_slab_into, blocks.shape[1], (blocks, shuffler, d1, d2, out))
+        return out.copy()
@@ -19,6 +19,9 @@ WatermarkMode = Literal['img', 'str', 'bit']
 # 並行處理模式
 PoolMode = Literal['common', 'multithreading', 'multiprocessing', 'vectorization', 'cached']
 
+# 數值精度（DWT→DCT→SVD→IDWT 使用的浮點型別）
+Precision = Literal['float32', 'float64']
+
 
 @dataclass(frozen=True)
 class ImageShape:
@@ -117,6 +120,9 @@ class WatermarkConfig:
     # 快速模式（僅使用主要奇異值）
     fast_mode: bool = False
 
+    # 運算精度（float32 頻寬減半，float64 作為數值參考）
+    precision: Precision = 'float32'
+
 
 @dataclass
 class WatermarkData:
@@ -1,15 +1,25 @@
 """工具模組"""
-from .image_io import load_image, save_image
+from .image_io import load_image, load_grayscale_image, save_image
+from .memo import BlockMemo, block_memo
 from .pool import AutoPool, CommonPool
-from .encryption import shuffle_watermark, unshuffle_watermark, generate_shuffle_indices
+from .registry import shared_pool, shutdown_pools
+from .encryption import (
+    shuffle_watermark, unshuffle_watermark, generate_shuffle_indices, generate_block_permutation
+)
 
 __all__ = [
     'load_image',
+    'load_grayscale_image',
     'save_image',
+    'BlockMemo',
+    'block_memo',
     'AutoPool',
     'CommonPool',
+    'shared_pool',
+    'shutdown_pools',
     'shuffle_watermark',
     'unshuffle_watermark',
     'generate_shuffle_indices',
+    'generate_block_permutation',
 ]
 
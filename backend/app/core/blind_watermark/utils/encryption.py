@@ -3,11 +3,117 @@
 
 提供水印位元的加密與解密功能
 """
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 import numpy as np
 import numpy.typing as npt
 
 from ..types import WatermarkBitArray, ShuffleIndexArray
 
+# 打亂索引快取的預設上限（位元組）
+DEFAULT_SHUFFLE_CACHE_BYTES = 64 << 20
+
+
+def _argsort_rows(rng: np.random.RandomState, size: int, block_shape: int) -> ShuffleIndexArray:
+    """產生 size 列打亂索引，以能容納 block_shape - 1 的最小整數型別儲存"""
+    indices = rng.random(size=(size, block_shape)).argsort(axis=1)
+    return indices.astype(np.min_scalar_type(block_shape - 1))
+
+
+def inverse_indices(shuffler: ShuffleIndexArray) -> ShuffleIndexArray:
+    """
+    計算每列打亂索引的反置換
+
+    flat[shuffler][unshuffler] == flat，因此還原只需一次 take，不必複製後 scatter
+
+    Args:
+        shuffler: (N, block_shape) 打亂索引
+
+    Returns:
+        (N, block_shape) 還原索引
+    """
+    unshuffler = np.empty_like(shuffler)
+    positions = np.broadcast_to(np.arange(shuffler.shape[-1], dtype=shuffler.dtype), shuffler.shape)
+    np.put_along_axis(unshuffler, shuffler, positions, axis=-1)
+    return unshuffler
+
+
+class ShuffleIndexCache:
+    """
+    以 (password, block_shape) 為鍵的打亂索引 LRU 快取
+
+    RandomState.random 依列序產生亂數，較小圖片的索引表恰為較大表的前 size 列：
+    命中時回傳前綴切片，不足時從保存的亂數狀態接續產生新列。
+    還原索引與打亂索引一起快取；總位元組數超過 max_bytes 時淘汰最久未使用的表，
+    回傳的陣列為唯讀
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_SHUFFLE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._tables: 'OrderedDict[Tuple[int, int], Tuple[ShuffleIndexArray, ShuffleIndexArray, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        """目前快取佔用的位元組數"""
+        return sum(forward.nbytes + inverse.nbytes for forward, inverse, _ in self._tables.values())
+
+    def get(self, password: int, size: int, block_shape: int) -> Tuple[ShuffleIndexArray, ShuffleIndexArray]:
+        """取得 (size, block_shape) 的打亂索引與還原索引"""
+        key = (password, block_shape)
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is not None:
+                self._tables.move_to_end(key)
+                if entry[0].shape[0] >= size:
+                    self.hits += 1
+                    return entry[0][:size], entry[1][:size]
+            self.misses += 1
+        forward, inverse, state = self._extend(password, size, block_shape, entry)
+        with self._lock:
+            current = self._tables.get(key)
+            if 2 * forward.nbytes <= self.max_bytes and (current is None or current[0].shape[0] < size):
+                self._tables[key] = (forward, inverse, state)
+                self._tables.move_to_end(key)
+                total = self.nbytes
+                while total > self.max_bytes and len(self._tables) > 1:
+                    _, (evicted, _, _) = self._tables.popitem(last=False)
+                    total -= 2 * evicted.nbytes
+        return forward[:size], inverse[:size]
+
+    def clear(self) -> None:
+        """清空快取與統計"""
+        with self._lock:
+            self._tables.clear()
+            self.hits = self.misses = 0
+
+    @staticmethod
+    def _extend(
+        password: int,
+        size: int,
+        block_shape: int,
+        entry: Optional[Tuple[ShuffleIndexArray, ShuffleIndexArray, Dict]]
+    ) -> Tuple[ShuffleIndexArray, ShuffleIndexArray, Dict]:
+        """產生新表，或接續已快取列之後的亂數序列只為新增的列做 argsort"""
+        rng = np.random.RandomState(password)
+        if entry is None:
+            forward = _argsort_rows(rng, size, block_shape)
+            inverse = inverse_indices(forward)
+        else:
+            rng.set_state(entry[2])
+            extra = _argsort_rows(rng, size - entry[0].shape[0], block_shape)
+            forward = np.concatenate([entry[0], extra])
+            inverse = np.concatenate([entry[1], inverse_indices(extra)])
+        forward.setflags(write=False)
+        inverse.setflags(write=False)
+        return forward, inverse, rng.get_state()
+
+
+shuffle_index_cache = ShuffleIndexCache()
+
 
 def generate_shuffle_indices(
     password: int,
@@ -15,7 +121,7 @@ def generate_shuffle_indices(
     block_shape: int
 ) -> ShuffleIndexArray:
     """
-    生成打亂索引
+    生成打亂索引（經由 shuffle_index_cache 快取）
     
     Args:
         password: 密碼種子
@@ -23,11 +129,23 @@ def generate_shuffle_indices(
         block_shape: 分塊大小
         
     Returns:
-        打亂索引陣列，形狀為 (size, block_shape)
+        唯讀的打亂索引陣列，形狀為 (size, block_shape)
+    """
+    return shuffle_index_cache.get(password, size, block_shape)[0]
+
+
+def generate_block_permutation(
+    password: int,
+    size: int,
+    block_shape: int
+) -> Tuple[ShuffleIndexArray, ShuffleIndexArray]:
+    """
+    生成打亂索引與對應的還原索引（經由 shuffle_index_cache 快取）
+
+    Returns:
+        (shuffler, unshuffler)，皆為唯讀的 (size, block_shape) 陣列
     """
-    return np.random.RandomState(password) \
-        .random(size=(size, block_shape)) \
-        .argsort(axis=1)
+    return shuffle_index_cache.get(password, size, block_shape)
 
 
 def shuffle_watermark(
@@ -1,7 +1,8 @@
 """
 圖片讀寫工具模組
 
-提供統一的圖片讀取、保存介面，並處理錯誤
+提供統一的圖片讀取、保存介面，並處理錯誤；
+.npy 檔以記憶體映射讀取，由作業系統按需分頁載入
 """
 from typing import Optional
 import cv2
@@ -38,6 +39,15 @@ def load_image(
     if filename is None:
         raise ValueError("必須提供 filename 或 img 參數")
     
+    if filename.lower().endswith('.npy'):
+        try:
+            result = np.load(filename, mmap_mode='r')
+        except (OSError, ValueError):
+            raise ImageReadError(filename)
+        if flags == cv2.IMREAD_GRAYSCALE and result.ndim == 3:
+            result = cv2.cvtColor(np.ascontiguousarray(result[:, :, :3]), cv2.COLOR_BGR2GRAY)
+        return result
+    
     result = cv2.imread(filename, flags=flags)
     if result is None:
         raise ImageReadError(filename)
@@ -78,7 +88,10 @@ def save_image(
     # 確保像素值在有效範圍內
     img_clipped = np.clip(img, PIXEL_MIN_VALUE, PIXEL_MAX_VALUE)
     
-    if compression_ratio is None:
+    if filename.lower().endswith('.npy'):
+        # 與 cv2.imwrite 相同，以四捨五入後的 uint8 保存
+        np.save(filename, np.round(img_clipped).astype(np.uint8))
+    elif compression_ratio is None:
         cv2.imwrite(filename, img_clipped)
     elif filename.endswith('.jpg') or filename.endswith('.jpeg'):
         cv2.imwrite(
@@ -0,0 +1,91 @@
+"""
+分塊轉換記憶表模組
+
+cached 模式在同一進程內跨呼叫記住分塊的 SVD 結果，並統計分塊層級的命中率
+"""
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+import numpy as np
+import numpy.typing as npt
+
+DEFAULT_MAX_ENTRIES = 65536
+
+
+class BlockMemo:
+    """
+    以 (命名空間, 分塊位元組) 為鍵的記憶表
+
+    呼叫端先在單張圖內去除重複分塊，再把不重複的列交給 resolve；
+    超過 max_entries 時依加入順序淘汰，單次不重複列多於 max_entries 時不查表
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Hashable, bytes], npt.NDArray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        """未經計算即取得結果的分塊比例（圖內重複與跨呼叫命中皆計入）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def resolve(
+        self,
+        namespace: Hashable,
+        rows: npt.NDArray,
+        compute: Callable[[npt.NDArray], npt.NDArray],
+        total: int
+    ) -> npt.NDArray:
+        """
+        取得不重複列的結果，只計算記憶表中沒有的列
+
+        Args:
+            namespace: 區分嵌入/提取與參數的鍵前綴
+            rows: (U, K) 不重複的列
+            compute: 對 (M, K) 列批次計算結果的函數
+            total: 去重前的分塊數，用於統計命中率
+
+        Returns:
+            (U, ...) 結果，第 i 列對應 rows[i]
+        """
+        if rows.shape[0] > self.max_entries:
+            self._count(total, rows.shape[0])
+            return compute(rows)
+        keys = [(namespace, row.tobytes()) for row in rows]
+        with self._lock:
+            found = [self._entries.get(key) for key in keys]
+        missing = [index for index, value in enumerate(found) if value is None]
+        if missing:
+            computed = compute(rows[missing])
+            with self._lock:
+                for index, value in zip(missing, computed):
+                    found[index] = self._entries[keys[index]] = value.copy()
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+        self._count(total, len(missing))
+        return np.array(found)
+
+    def clear(self) -> None:
+        """清空記憶表與統計"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _count(self, total: int, computed: int) -> None:
+        with self._lock:
+            self.hits += total - computed
+            self.misses += computed
+
+
+_default_memo = BlockMemo()
+
+
+def block_memo() -> BlockMemo:
+    """回傳進程共用的記憶表，可調整上限或查看命中率"""
+    return _default_memo
@@ -4,11 +4,18 @@
 提供多種並行處理模式的統一介面
 """
 import sys
+import threading
 import multiprocessing
+from multiprocessing import resource_tracker
 import warnings
-from typing import Callable, List, Any, TypeVar, Optional
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Any, TypeVar, Optional, Tuple
+import numpy as np
+import numpy.typing as npt
 
 from ..types import PoolMode
+from .shared import SharedBuffers
+from .slabs import item_bytes, plan_slabs, run_slab
 
 if sys.platform != 'win32':
     try:
@@ -38,6 +45,11 @@ class CommonPool:
         return list(map(func, args))
 
 
+def _warm_up_task(_: int) -> None:
+    """預先載入工作者會用到的模組"""
+    from ..kernels import batched  # noqa: F401
+
+
 class AutoPool:
     """
     自動選擇並行處理模式的池
@@ -46,13 +58,16 @@ class AutoPool:
     - common: 串行處理
     - multithreading: 多執行緒
     - multiprocessing: 多進程
-    - vectorization: 向量化（預留）
-    - cached: 快取模式（預留）
+    - vectorization: 向量化（整個通道以批次矩陣運算一次處理）
+    - cached: 去重快取模式（重複分塊只轉換一次，並跨呼叫記住 SVD 結果）
+
+    工作者在第一次使用或呼叫 warm_up 時才啟動，可跨多個 WaterMark 實例重複使用；
+    長期共用的實例請透過 shared_pool 取得
     """
     
     def __init__(self, mode: PoolMode = 'common', processes: Optional[int] = None):
         """
-        初始化處理池
+        初始化處理池（不啟動工作者）
         
         Args:
             mode: 處理模式
@@ -68,32 +83,107 @@ class AutoPool:
         
         self.mode = mode
         self.processes = processes
-        
-        if mode == 'vectorization':
-            self.pool = CommonPool()
-        elif mode == 'cached':
-            self.pool = CommonPool()
-        elif mode == 'multithreading':
-            from multiprocessing.dummy import Pool as ThreadPool
-            self.pool = ThreadPool(processes=processes)
-        elif mode == 'multiprocessing':
-            from multiprocessing import Pool
-            self.pool = Pool(processes=processes)
-        else:  # common
-            self.pool = CommonPool()
+        self.pool = None
+        self._lock = threading.Lock()
+        self._buffers = SharedBuffers()
     
+    @property
+    def vectorized(self) -> bool:
+        """是否以批次核心一次處理整個通道"""
+        return self.mode == 'vectorization'
+
+    @property
+    def cached(self) -> bool:
+        """是否去除重複分塊並跨呼叫記憶，命中率見 block_memo().hit_rate"""
+        return self.mode == 'cached'
+
+    @property
+    def batched(self) -> bool:
+        """是否以 (3, N, h, w) 張量一次交給批次核心，而非逐分塊 map"""
+        return self.vectorized or self.cached or self.parallel
+
+    @property
+    def parallel(self) -> bool:
+        """是否由多個工作者以 slab 為單位分攤分塊"""
+        return self.mode in ('multithreading', 'multiprocessing')
+
+    @property
+    def workers(self) -> int:
+        """工作者數量，串行與向量化模式為 1"""
+        if not self.parallel:
+            return 1
+        return self.processes or multiprocessing.cpu_count()
+
+    @property
+    def started(self) -> bool:
+        """工作者是否已啟動"""
+        return self.pool is not None
+
+    def start(self) -> 'AutoPool':
+        """啟動工作者，已啟動時不做任何事"""
+        with self._lock:
+            if self.pool is None:
+                if self.mode == 'multithreading':
+                    from multiprocessing.dummy import Pool as ThreadPool
+                    self.pool = ThreadPool(processes=self.processes)
+                elif self.mode == 'multiprocessing':
+                    # 先啟動 resource tracker 讓工作者與父進程共用，共享記憶體只由父進程 unlink 一次
+                    resource_tracker.ensure_running()
+                    self.pool = multiprocessing.Pool(processes=self.processes)
+                else:  # common / vectorization / cached
+                    self.pool = CommonPool()
+        return self
+
+    def warm_up(self) -> 'AutoPool':
+        """啟動工作者並讓每個工作者執行一次空任務，把啟動成本移出請求路徑"""
+        self.start()
+        if self.parallel:
+            self.pool.map(_warm_up_task, range(self.workers), chunksize=1)
+        return self
+
     def map(self, func: Callable[[T], R], args: List[T]) -> List[R]:
+        """映射函數到參數列表"""
+        return self.start().pool.map(func, args)
+
+    @contextmanager
+    def allocate(self, shape: Tuple[int, ...], dtype: Any) -> Iterator[npt.NDArray]:
+        """配置單次呼叫使用的工作陣列，離開區塊時釋放；multiprocessing 模式下位於共享記憶體"""
+        if self.mode != 'multiprocessing':
+            yield np.empty(shape, dtype=dtype)
+            return
+        with self._buffers.allocate(shape, dtype) as array:
+            yield array
+
+    def map_slabs(self, func: Callable[..., R], total: int, shared: Tuple[Any, ...]) -> List[R]:
         """
-        映射函數到參數列表
-        
+        將 [0, total) 切成連續 slab，以 func(*shared, slab) 處理每一段
+
+        工作者只接收 slab 範圍：執行緒直接共用 shared 的參照，進程則只收到共享記憶體名稱；
+        shared 中的陣列（輸入與輸出）須以 allocate 配置，工作者直接讀寫，不會逐次複製
+
         Args:
-            func: 要應用的函數
-            args: 參數列表
-            
+            func: 頂層任務函數，最後一個參數為 slab
+            total: 分塊總數
+            shared: 所有 slab 共用的資料（陣列、參數與依 slab 取值的索引描述）
+
         Returns:
-            結果列表
+            各 slab 的結果列表（依 slab 順序）
         """
-        return self.pool.map(func, args)
+        slabs = plan_slabs(total, self.workers, item_bytes(shared, total))
+        pool = self.start().pool
+        if self.mode != 'multiprocessing':
+            return pool.map(lambda slab: func(*shared, slab), slabs)
+        refs = self._buffers.refs(shared)
+        return pool.map(run_slab, [(func, refs, slab) for slab in slabs])
+
+    def close(self) -> None:
+        """關閉並等待工作者結束，之後再次使用時會重新啟動"""
+        with self._lock:
+            pool, self.pool = self.pool, None
+        if hasattr(pool, 'close'):
+            pool.close()
+        if hasattr(pool, 'join'):
+            pool.join()
     
     def __enter__(self):
         """上下文管理器進入"""
@@ -101,8 +191,5 @@ class AutoPool:
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """上下文管理器退出"""
-        if hasattr(self.pool, 'close'):
-            self.pool.close()
-        if hasattr(self.pool, 'join'):
-            self.pool.join()
+        self.close()
 
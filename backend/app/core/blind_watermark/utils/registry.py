@@ -0,0 +1,45 @@
+"""
+常駐處理池註冊表
+
+讓多個 WaterMark 實例共用同一組已啟動的工作者，並於程式結束時統一關閉
+"""
+import atexit
+import threading
+from typing import Dict, Optional, Tuple
+
+from ..types import PoolMode
+from .pool import AutoPool
+
+
+_registry: Dict[Tuple[str, Optional[int]], AutoPool] = {}
+_registry_lock = threading.Lock()
+
+
+def shared_pool(mode: PoolMode = 'common', processes: Optional[int] = None) -> AutoPool:
+    """
+    取得跨 WaterMark 實例共用的常駐處理池，相同設定回傳同一個實例
+
+    Args:
+        mode: 處理模式
+        processes: 進程/執行緒數量
+
+    Returns:
+        常駐 AutoPool
+    """
+    with _registry_lock:
+        pool = _registry.get((mode, processes))
+        if pool is None:
+            pool = _registry[(mode, processes)] = AutoPool(mode, processes)
+        return pool
+
+
+def shutdown_pools() -> None:
+    """關閉所有由 shared_pool 建立的常駐處理池"""
+    with _registry_lock:
+        pools = list(_registry.values())
+        _registry.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown_pools)
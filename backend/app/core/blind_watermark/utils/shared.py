@@ -0,0 +1,109 @@
+"""
+共享記憶體模組
+
+以 multiprocessing.shared_memory 在父進程與常駐工作者之間共用陣列，
+任務只傳遞共享記憶體名稱，不再 pickle 陣列內容
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Tuple
+import numpy as np
+import numpy.typing as npt
+
+
+@dataclass(frozen=True)
+class SharedRef:
+    """可被 pickle 的共享陣列描述"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedArray:
+    """持有一塊共享記憶體與其上的陣列視圖 array，工作者依 ref 映射同一塊記憶體並就地寫入"""
+
+    def __init__(self, array: npt.NDArray):
+        """
+        建立共享記憶體並複製陣列內容
+
+        Args:
+            array: 要共享的陣列
+        """
+        self._allocate(array.shape, array.dtype)
+        self.array[...] = array
+
+    @classmethod
+    def empty(cls, shape: Tuple[int, ...], dtype: Any) -> 'SharedArray':
+        """配置未初始化的共享陣列，不複製任何資料"""
+        shared = cls.__new__(cls)
+        shared._allocate(shape, dtype)
+        return shared
+
+    def _allocate(self, shape: Tuple[int, ...], dtype: Any) -> None:
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self._memory = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._memory.buf)
+        self.ref = SharedRef(self._memory.name, tuple(shape), dtype.str)
+
+    def release(self) -> None:
+        """移除共享記憶體名稱；仍被視圖引用的映射會在視圖釋放後回收"""
+        if self._memory is None:
+            return
+        self.array = None
+        try:
+            self._memory.close()
+        except BufferError:
+            pass
+        self._memory.unlink()
+        self._memory = None
+
+
+class SharedBuffers:
+    """記錄以 allocate 配置的共享陣列，讓 map_slabs 只傳遞名稱"""
+
+    def __init__(self):
+        self._buffers: Dict[int, SharedArray] = {}
+
+    @contextmanager
+    def allocate(self, shape: Tuple[int, ...], dtype: Any) -> Iterator[npt.NDArray]:
+        """配置共享陣列，離開區塊時釋放"""
+        buffer = SharedArray.empty(shape, dtype)
+        key = id(buffer.array)
+        self._buffers[key] = buffer
+        try:
+            yield buffer.array
+        finally:
+            del self._buffers[key]
+            buffer.release()
+
+    def refs(self, shared: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        """將 shared 中的陣列換成 SharedRef；未經 allocate 配置的陣列會拋出 ValueError"""
+        refs = []
+        for item in shared:
+            if isinstance(item, np.ndarray):
+                buffer = self._buffers.get(id(item))
+                if buffer is None:
+                    raise ValueError('arrays passed to map_slabs must be allocated with AutoPool.allocate')
+                item = buffer.ref
+            refs.append(item)
+        return tuple(refs)
+
+
+def attach(item: Any, memories: List[shared_memory.SharedMemory]) -> Any:
+    """
+    工作者端：將 SharedRef 映射回陣列，其餘參數原樣回傳
+
+    Args:
+        item: SharedRef 或一般參數
+        memories: 收集已映射的共享記憶體，任務結束後由呼叫端關閉
+
+    Returns:
+        陣列視圖或原參數
+    """
+    if not isinstance(item, SharedRef):
+        return item
+    memory = shared_memory.SharedMemory(name=item.name)
+    memories.append(memory)
+    return np.ndarray(item.shape, dtype=np.dtype(item.dtype), buffer=memory.buf)
@@ -0,0 +1,73 @@
+"""
+分塊排程模組
+
+將分塊範圍切成連續 slab：大小依 CPU 核心數與 L2 快取容量決定，
+工作者只接收 slab 範圍，陣列則以共享記憶體名稱取得
+"""
+import os
+from functools import lru_cache
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .shared import attach
+
+DEFAULT_CACHE_BYTES = 1 << 20
+
+
+@lru_cache(maxsize=1)
+def cache_bytes() -> int:
+    """每核心 L2 快取大小，無法偵測時回傳 1 MiB"""
+    try:
+        size = os.sysconf('SC_LEVEL2_CACHE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        size = 0
+    return size if size > 0 else DEFAULT_CACHE_BYTES
+
+
+def item_bytes(shared: Sequence[Any], total: int) -> int:
+    """估算每個分塊在共享陣列中佔用的位元組數"""
+    nbytes = sum(getattr(item, 'nbytes', 0) for item in shared)
+    return max(1, nbytes // max(total, 1))
+
+
+def plan_slabs(
+    total: int,
+    workers: int,
+    per_item: int,
+    cache: Optional[int] = None
+) -> List[slice]:
+    """
+    將 [0, total) 切成連續 slab
+
+    Args:
+        total: 分塊總數
+        workers: 工作者數量，slab 數至少為此值以平衡負載
+        per_item: 每個分塊佔用的位元組數
+        cache: 快取大小，預設為偵測到的 L2 快取
+
+    Returns:
+        slice 列表，每段不超過一份快取可容納的分塊數
+    """
+    if total <= 0:
+        return []
+    per_cache = max(1, (cache or cache_bytes()) // max(per_item, 1))
+    per_worker = -(-total // max(workers, 1))
+    size = max(1, min(per_cache, per_worker))
+    return [slice(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def run_slab(task: Tuple[Callable[..., Any], Tuple[Any, ...], slice]) -> Any:
+    """工作者入口：映射共享陣列後以 slab 範圍呼叫任務函數，結束時解除映射"""
+    func, refs, slab = task
+    memories: List[SharedMemory] = []
+    shared = tuple(attach(item, memories) for item in refs)
+    try:
+        return func(*shared, slab)
+    finally:
+        del shared
+        for memory in memories:
+            try:
+                memory.close()
+            except BufferError:
+                # 任務拋出例外時 traceback 仍持有視圖，保留原本的例外，映射隨視圖釋放後回收
+                pass
@@ -0,0 +1,24 @@
+"""版本資訊模組"""
+__version__ = '0.4.4'
+
+
+class Notes:
+    """首次建立 WaterMark 時顯示的版本提示（只顯示一次）"""
+
+    def __init__(self):
+        self.show = True
+
+    def print_notes(self) -> None:
+        """顯示提示後自動關閉"""
+        if self.show:
+            print(f'Welcome to use blind-watermark, version = {__version__}\n'
+                  'Make sure the version is the same when encode and decode\n'
+                  'To close this message: `bw_notes.close()`')
+            self.close()
+
+    def close(self) -> None:
+        """關閉提示"""
+        self.show = False
+
+
+bw_notes = Notes()
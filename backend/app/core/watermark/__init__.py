@@ -7,6 +7,7 @@ from .pool import AutoPool
 from .recover import estimate_crop_parameters, recover_crop
 from .robustness import attacks, recovery
 from .runner import WatermarkPipeline
+from .runtime import shared_pool, shutdown_pools
 
 __all__ = [
     "WatermarkConfig",
@@ -14,6 +15,8 @@ __all__ = [
     "WatermarkPipeline",
     "WaterMark",
     "AutoPool",
+    "shared_pool",
+    "shutdown_pools",
     "attacks",
     "recovery",
     "estimate_crop_parameters",
@@ -5,6 +5,8 @@ from typing import Literal, Optional, Tuple
 
 
 RuntimeMode = Literal["common", "multithreading", "multiprocessing", "vectorization", "cached"]
+SingularValueMethod = Literal["svd", "gram"]
+Precision = Literal["float32", "float64"]
 
 
 @dataclass(frozen=True)
@@ -33,12 +35,20 @@ class AlgorithmTuning:
     d1: float = 36.0
     d2: float = 20.0
     block: BlockConfig = field(default_factory=BlockConfig)
+    # 提取時計算奇異值的方式："svd" 為不計算 U/V 的 SVD，"gram" 為 B^T B 特徵值開根號
+    sv_method: SingularValueMethod = "svd"
+    # DWT→DCT→SVD→IDWT 的運算精度；float32 頻寬減半，float64 作為數值參考
+    precision: Precision = "float32"
 
     def validate(self) -> None:
         if self.d1 <= 0:
             raise ValueError("d1 must be positive")
         if self.d2 < 0:
             raise ValueError("d2 must be non-negative")
+        if self.sv_method not in ("svd", "gram"):
+            raise ValueError("sv_method must be 'svd' or 'gram'")
+        if self.precision not in ("float32", "float64"):
+            raise ValueError("precision must be 'float32' or 'float64'")
         self.block.validate()
 
 
@@ -48,6 +58,8 @@ class RuntimeConfig:
 
     mode: RuntimeMode = "common"
     processes: Optional[int] = None
+    # 以圖片內容雜湊快取分解結果（YUV、cA、區塊 DCT），同一張圖反覆嵌入/提取時只分解一次
+    cache_decomposition: bool = False
 
 
 @dataclass(frozen=True)
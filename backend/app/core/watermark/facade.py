@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import Optional, Sequence, Tuple
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple
 
 import numpy as np
 
 from .runner import WatermarkPipeline
+from .runtime import AutoPool
 
 
 class WaterMark:
@@ -17,6 +18,8 @@ class WaterMark:
         block_shape: Sequence[int] = (4, 4),
         mode: str = "common",
         processes: Optional[int] = None,
+        pool: Optional[AutoPool] = None,
+        cache_decomposition: bool = False,
     ) -> None:
         self._pipeline = WatermarkPipeline(
             password_img=password_img,
@@ -24,6 +27,8 @@ class WaterMark:
             block_shape=tuple(block_shape),
             mode=mode,
             processes=processes,
+            pool=pool,
+            cache_decomposition=cache_decomposition,
         )
         self.wm_bit: Optional[np.ndarray] = None
         self.wm_size: int = 0
@@ -45,6 +50,34 @@ class WaterMark:
         """將浮水印嵌入先前讀取的圖片。"""
         return self._pipeline.embed(filename=filename, compression_ratio=compression_ratio)
 
+    def embed_region(
+        self,
+        img: np.ndarray,
+        rect: Tuple[int, int, int, int],
+        filename: Optional[str] = None,
+        compression_ratio: Optional[int] = None,
+    ) -> np.ndarray:
+        """在已嵌入且局部修改的圖片上，只補嵌 rect = (x, y, width, height) 涵蓋的區塊。"""
+        return self._pipeline.embed_region(img, rect, filename=filename, compression_ratio=compression_ratio)
+
+    def embed_batch(
+        self,
+        images: Iterable[str | np.ndarray],
+        payload: Any = None,
+        *,
+        mode: str = "str",
+        filenames: Optional[Iterable[str]] = None,
+        compression_ratio: Optional[int] = None,
+    ) -> Iterator[np.ndarray]:
+        """以同一份浮水印批次嵌入多張圖片，依輸入順序產生結果。"""
+        return self._pipeline.embed_batch(
+            images, payload, mode=mode, filenames=filenames, compression_ratio=compression_ratio
+        )
+
+    def embed_tiled(self, source: Any, out: Any = None, strip_rows: int = 512) -> Any:
+        """以水平條帶逐段嵌入超大圖片（可為 np.memmap），結果寫入 out 並回傳。"""
+        return self._pipeline.embed_tiled(source, out=out, strip_rows=strip_rows)
+
     def extract_decrypt(self, wm_avg: np.ndarray) -> np.ndarray:
         """對提取出的位元進行解密。"""
         return self._pipeline.extract_decrypt(wm_avg)
@@ -69,3 +102,17 @@ class WaterMark:
             shape = (wm_shape,) if isinstance(wm_shape, int) else tuple(wm_shape)
             self.wm_size = int(np.prod(shape))
         return result
+
+    def score_keys(
+        self,
+        candidates: Iterable[Tuple[int, int]],
+        filename: Optional[str] = None,
+        embed_img: Optional[np.ndarray] = None,
+        wm_shape: Sequence[int] | int | None = None,
+        mode: str = "str",
+        max_cycles: Optional[int] = None,
+    ) -> list:
+        """以多組候選 (password_img, password_wm) 提取同一張圖，回傳每組的內容與分數。"""
+        return self._pipeline.score_keys(
+            candidates, filename=filename, embed_img=embed_img, wm_shape=wm_shape, mode=mode, max_cycles=max_cycles
+        )
@@ -1,6 +1,7 @@
 """核心影像與資料操作模組。"""
 
 from .blocks import BlockGeometry, BlockSequence
+from .decomposition import DecompositionCache, decomposition_cache
 from .transforms import (
     clamp_to_uint8,
     convert_bgr_to_yuv,
@@ -12,6 +13,8 @@ from .transforms import (
 __all__ = [
     "BlockGeometry",
     "BlockSequence",
+    "DecompositionCache",
+    "decomposition_cache",
     "clamp_to_uint8",
     "convert_bgr_to_yuv",
     "convert_yuv_to_bgr",
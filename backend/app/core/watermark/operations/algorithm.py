@@ -1,186 +1,190 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Tuple
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Iterable, Iterator, Tuple
 
-import cv2
 import numpy as np
-from numpy.linalg import svd
-from pywt import dwt2, idwt2
-
-from .blocks import BlockGeometry, BlockSequence
-from .transforms import (
-    clamp_to_uint8,
-    convert_bgr_to_yuv,
-    convert_yuv_to_bgr,
-    pad_to_even,
-    remove_even_padding,
-)
+
+from . import batch_extraction, progressive, tiled
+from .blockwise import embed_task, extract_task
+from .components import WaveletComponents, block_coefficients, load_components, merge_alpha, stack_blocks
+from .kernels import embed_blocks, embed_blocks_cached, extract_coefficients, extract_coefficients_cached
+from .payload import ProgressiveExtraction, _average_payload, one_dim_kmeans
+from .permutation import BlockPermutation
+from .tasks import CyclicBits, embed_rows_inplace, extract_rows
+from .wavelet import haar_synthesis
+from .transforms import clamp_to_uint8, convert_yuv_to_bgr, remove_even_padding
 from ..config import AlgorithmTuning, WatermarkKeys
 from ..runtime import AutoPool
 
 
-@dataclass
-class WaveletComponents:
-    original_shape: Tuple[int, int]
-    alpha: np.ndarray | None
-    ca_channels: Tuple[np.ndarray, np.ndarray, np.ndarray]
-    hvd_channels: Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], ...]
-    sequence: BlockSequence
-
-
-def _split_alpha(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray | None]:
-    if image.shape[2] == 4 and np.any(image[:, :, 3] < 255):
-        return image[:, :, :3], image[:, :, 3]
-    return image, None
-
-
-def _merge_alpha(image: np.ndarray, alpha: np.ndarray | None) -> np.ndarray:
-    if alpha is None:
-        return image
-    return np.dstack([image, alpha])
-
-
-def _init_sequence(keys: WatermarkKeys, ca_shape: Tuple[int, int], block_shape: Tuple[int, int]) -> BlockSequence:
-    geometry = BlockGeometry.from_ca_shape(ca_shape, block_shape)
-    shuffle_width = block_shape[0] * block_shape[1]
-    return BlockSequence(geometry=geometry, shuffle_seed=keys.image, shuffle_width=shuffle_width)
-
-
-def _embed_block(block: np.ndarray, shuffle_idx: np.ndarray, wm_bit: int, tuning: AlgorithmTuning) -> np.ndarray:
-    block_dct = cv2.dct(block)
-    shuffled = block_dct.flatten()[shuffle_idx].reshape(block.shape)
-    u, s, v = svd(shuffled)
-    s0 = (s[0] // tuning.d1 + 0.25 + 0.5 * wm_bit) * tuning.d1
-    s[0] = s0
-    if tuning.d2 > 0:
-        s[1] = (s[1] // tuning.d2 + 0.25 + 0.5 * wm_bit) * tuning.d2
-    recomposed = np.dot(u, np.dot(np.diag(s), v)).flatten()
-    restored = recomposed.copy()
-    restored[shuffle_idx] = recomposed
-    return cv2.idct(restored.reshape(block.shape))
-
-
-def _extract_block(block: np.ndarray, shuffle_idx: np.ndarray, tuning: AlgorithmTuning) -> float:
-    block_dct = cv2.dct(block)
-    shuffled = block_dct.flatten()[shuffle_idx].reshape(block.shape)
-    _, s, _ = svd(shuffled)
-    wm = 1.0 if s[0] % tuning.d1 > tuning.d1 / 2 else 0.0
-    if tuning.d2 > 0:
-        tmp = 1.0 if s[1] % tuning.d2 > tuning.d2 / 2 else 0.0
-        wm = (wm * 3 + tmp) / 4
-    return wm
-
-
-def _embed_task(args: tuple[np.ndarray, np.ndarray, int, AlgorithmTuning]) -> np.ndarray:
-    block, shuffle_idx, wm_bit, tuning = args
-    return _embed_block(block, shuffle_idx, wm_bit, tuning)
-
-
-def _extract_task(args: tuple[np.ndarray, np.ndarray, AlgorithmTuning]) -> float:
-    block, shuffle_idx, tuning = args
-    return _extract_block(block, shuffle_idx, tuning)
-
-
-def _average_payload(values: np.ndarray, wm_size: int) -> np.ndarray:
-    wm_avg = np.zeros(shape=wm_size)
-    for idx in range(wm_size):
-        wm_avg[idx] = values[:, idx::wm_size].mean()
-    return wm_avg
-
-
-def one_dim_kmeans(values: np.ndarray, *, max_iter: int = 300) -> np.ndarray:
-    centers = [float(values.min()), float(values.max())]
-    if centers[0] == centers[1]:
-        return np.zeros_like(values, dtype=bool)
-    for _ in range(max_iter):
-        threshold = sum(centers) / 2
-        mask = values > threshold
-        new_centers = [values[~mask].mean(), values[mask].mean()]
-        if np.isnan(new_centers[0]) or np.isnan(new_centers[1]):
-            break
-        new_threshold = sum(new_centers) / 2
-        if abs(new_threshold - threshold) < 1e-6:
-            threshold = new_threshold
-            mask = values > threshold
-            return mask
-        centers = new_centers
-    threshold = sum(centers) / 2
-    return values > threshold
-
-
 class WatermarkAlgorithm:
     """封裝 DWT-DCT-SVD 核心演算法。"""
 
-    def __init__(self, tuning: AlgorithmTuning, keys: WatermarkKeys, mode: str, processes: int | None) -> None:
+    def __init__(
+        self,
+        tuning: AlgorithmTuning,
+        keys: WatermarkKeys,
+        mode: str,
+        processes: int | None,
+        pool: AutoPool | None = None,
+        cache_decomposition: bool = False,
+    ) -> None:
         self.tuning = tuning
         self.keys = keys
         self.mode = mode
         self.processes = processes
-
-    def _decompose(self, image: np.ndarray) -> WaveletComponents:
-        bgr, alpha = _split_alpha(image)
-        bgr = bgr.astype(np.float32)
-        original_shape = bgr.shape[:2]
-        yuv = pad_to_even(convert_bgr_to_yuv(bgr))
-        ca_channels = []
-        hvd_channels = []
-        for channel in range(3):
-            ca, hvd = dwt2(yuv[:, :, channel], "haar")
-            ca_channels.append(ca.astype(np.float32))
-            hvd_channels.append(hvd)
-        sequence = _init_sequence(self.keys, ca_channels[0].shape, self.tuning.block.size)
-        return WaveletComponents(
-            original_shape=original_shape,
-            alpha=alpha,
-            ca_channels=(ca_channels[0], ca_channels[1], ca_channels[2]),
-            hvd_channels=tuple(hvd_channels),
-            sequence=sequence,
-        )
+        self.pool = pool
+        self.cache_decomposition = cache_decomposition
+
+    @contextmanager
+    def _acquire_pool(self) -> Iterator[AutoPool]:
+        """使用注入的常駐 pool；未注入時建立僅供本次呼叫使用的 pool。"""
+        if self.pool is not None:
+            yield self.pool
+            return
+        with AutoPool(self.mode, self.processes) as pool:
+            yield pool
+
+    def _components(
+        self, image: np.ndarray, allocate: Callable[..., np.ndarray] | None = None
+    ) -> WaveletComponents:
+        return load_components(image, self.keys, self.tuning, cache=self.cache_decomposition, allocate=allocate)
+
+    @staticmethod
+    def _allocator(pool: AutoPool, buffers: ExitStack) -> Callable[..., np.ndarray]:
+        """以 pool.allocate 配置、於 buffers 結束時釋放的陣列；行程池工作者可直接讀寫。"""
+        return lambda *spec: buffers.enter_context(pool.allocate(*spec))
+
+    def _embed_channels(
+        self, pool: AutoPool, stacked: np.ndarray, permutation: BlockPermutation, block_bits: np.ndarray
+    ) -> np.ndarray:
+        shuffle, inverse = permutation.forward, permutation.inverse
+        if pool.vectorized:
+            return embed_blocks(stacked, shuffle, block_bits, self.tuning, inverse)
+        if pool.cached:
+            return embed_blocks_cached(stacked, shuffle, block_bits, self.tuning, inverse, pool.memo)
+        return np.stack([
+            np.stack(pool.map(embed_task, [
+                (blocks[i], shuffle[i], inverse[i], int(block_bits[i]), self.tuning) for i in range(blocks.shape[0])
+            ]))
+            for blocks in stacked
+        ])
 
     def embed(self, image: np.ndarray, wm_bits: np.ndarray) -> np.ndarray:
-        components = self._decompose(image)
-        geometry = components.sequence.geometry
-        if wm_bits.size >= geometry.block_num:
-            raise ValueError("watermark too large for host image")
-        embedded_channels = []
-        with AutoPool(self.mode, self.processes) as pool:
-            for idx, ca in enumerate(components.ca_channels):
-                blocks_view = components.sequence.view(ca)
-                flat_blocks = blocks_view.reshape(geometry.block_num, *self.tuning.block.size)
-                tasks = [
-                    (flat_blocks[i], components.sequence.shuffle[i], int(wm_bits[i % wm_bits.size]), self.tuning)
-                    for i in range(geometry.block_num)
-                ]
-                results = pool.map(_embed_task, tasks)
-                updated_blocks = np.stack(results, axis=0)
-                reshaped = updated_blocks.reshape(blocks_view.shape)
-                ca_updated = ca.copy()
-                ca_updated[: geometry.part_shape[0], : geometry.part_shape[1]] = components.sequence.combine(reshaped)
-                channel = idwt2((ca_updated, components.hvd_channels[idx]), "haar")
-                embedded_channels.append(channel)
-        stacked = np.stack(embedded_channels, axis=2)
-        restored = remove_even_padding(stacked, components.original_shape)
-        bgr = convert_yuv_to_bgr(restored)
-        return clamp_to_uint8(_merge_alpha(bgr, components.alpha))
+        with self._acquire_pool() as pool:
+            return self._embed_with(pool, image, wm_bits, {})
+
+    def embed_batch(self, images: Iterable[np.ndarray], wm_bits: np.ndarray) -> Iterator[np.ndarray]:
+        """以同一組已打亂的位元依序嵌入多張圖片。
+
+        整批共用同一個 pool；相同區塊數的圖片共用展開後的區塊位元，shuffle 索引表則由
+        ``block_permutation`` 的快取共用，每張圖只剩分解、嵌入與重建。
+        """
+        block_bits: dict[int, np.ndarray] = {}
+        with self._acquire_pool() as pool:
+            # 先啟動工作者，避免呼叫端的 I/O 執行緒已在執行時才 fork
+            pool.start()
+            for image in images:
+                yield self._embed_with(pool, image, wm_bits, block_bits)
+
+    def _embed_with(
+        self,
+        pool: AutoPool,
+        image: np.ndarray,
+        wm_bits: np.ndarray,
+        block_bits_cache: dict[int, np.ndarray],
+    ) -> np.ndarray:
+        with ExitStack() as buffers:
+            components = self._components(image, self._allocator(pool, buffers))
+            sequence = components.sequence
+            geometry = sequence.geometry
+            if wm_bits.size >= geometry.block_num:
+                raise ValueError("watermark too large for host image")
+            if pool.parallel:
+                # 工作者以區塊列為 slab 就地改寫共享的 cA，索引表與位元由工作者依 slab 自行取值
+                shuffle, inverse = sequence.tables()
+                shared = (components.ca_stack, shuffle, inverse, CyclicBits(wm_bits), self.tuning, geometry.cols)
+                pool.map_slabs(embed_rows_inplace, geometry.rows, shared)
+            else:
+                # 以區塊數為鍵快取展開後的位元，批次中相同幾何的圖片不必重算
+                block_bits = block_bits_cache.get(geometry.block_num)
+                if block_bits is None:
+                    block_bits = CyclicBits(wm_bits)[slice(0, geometry.block_num)]
+                    block_bits_cache[geometry.block_num] = block_bits
+                stacked = stack_blocks(components)
+                updated = self._embed_channels(pool, stacked, sequence.permutation, block_bits)
+                for idx, ca in enumerate(components.ca_channels):
+                    reshaped = updated[idx].reshape(geometry.rows, geometry.cols, *self.tuning.block.size)
+                    ca[: geometry.part_shape[0], : geometry.part_shape[1]] = sequence.combine(reshaped)
+            reconstructed = haar_synthesis(components.yuv, components.ca_stack)
+        restored = remove_even_padding(reconstructed, components.original_shape)
+        bgr = convert_yuv_to_bgr(restored.astype(np.float32, copy=False))
+        return clamp_to_uint8(merge_alpha(bgr, components.alpha))
+
+    def embed_region(self, image: np.ndarray, wm_bits: np.ndarray, rect: Tuple[int, int, int, int]) -> np.ndarray:
+        """只重新嵌入像素矩形 (x, y, width, height) 所涵蓋的區塊，見 ``tiled.embed_region``。"""
+        return tiled.embed_region(self.keys, self.tuning, image, wm_bits, rect)
+
+    def embed_tiled(self, source: Any, wm_bits: np.ndarray, strip_rows: int = 512) -> Iterator[Tuple[int, np.ndarray]]:
+        """以水平條帶逐段嵌入，依序產生 (起始列, 條帶)，見 ``tiled.embed_tiled``。"""
+        with self._acquire_pool() as pool:
+            yield from tiled.embed_tiled(pool, self.keys, self.tuning, source, wm_bits, strip_rows)
+
+    def _extract_channels(self, pool: AutoPool, components: WaveletComponents, buffers: ExitStack) -> np.ndarray:
+        sequence = components.sequence
+        if pool.vectorized:
+            return extract_coefficients(block_coefficients(components), sequence.shuffle, self.tuning)
+        if pool.cached:
+            coefficients = block_coefficients(components, dedupe=True)
+            return extract_coefficients_cached(coefficients, sequence.shuffle, self.tuning, pool.memo)
+        if pool.parallel:
+            # 工作者直接讀取共享的 cA 並把軟位元寫入共享輸出，不堆疊區塊也不回傳結果
+            geometry = sequence.geometry
+            out = self._allocator(pool, buffers)((3, geometry.block_num), np.float64)
+            shared = (components.ca_stack, sequence.tables()[0], self.tuning, geometry.cols, out)
+            pool.map_slabs(extract_rows, geometry.rows, shared)
+            return out
+        results = [
+            pool.map(extract_task, [(blocks[i], sequence.shuffle[i], self.tuning) for i in range(blocks.shape[0])])
+            for blocks in stack_blocks(components)
+        ]
+        return np.array(results, dtype=np.float64)
 
     def extract(self, image: np.ndarray, wm_size: int, *, use_kmeans: bool) -> np.ndarray:
-        components = self._decompose(image)
-        geometry = components.sequence.geometry
-        blocks_per_channel = np.zeros((3, geometry.block_num))
-
-        with AutoPool(self.mode, self.processes) as pool:
-            for idx, ca in enumerate(components.ca_channels):
-                blocks_view = components.sequence.view(ca)
-                flat_blocks = blocks_view.reshape(geometry.block_num, *self.tuning.block.size)
-                tasks = [
-                    (flat_blocks[i], components.sequence.shuffle[i], self.tuning)
-                    for i in range(geometry.block_num)
-                ]
-                results = pool.map(_extract_task, tasks)
-                blocks_per_channel[idx, :] = np.array(results)
-
-        wm_avg = _average_payload(blocks_per_channel, wm_size)
+        with self._acquire_pool() as pool, ExitStack() as buffers:
+            # 只有平行模式需要把 cA 放進共享記憶體
+            components = self._components(image, self._allocator(pool, buffers) if pool.parallel else None)
+            wm_avg = _average_payload(self._extract_channels(pool, components, buffers), wm_size)
         if use_kmeans:
             return one_dim_kmeans(wm_avg)
         return wm_avg
+
+    def extract_batch(
+        self, items: Iterable[Tuple[Any, np.ndarray]], wm_size: int, *, use_kmeans: bool, bucket_size: int = 8
+    ) -> Iterator[Tuple[Any, np.ndarray, float]]:
+        """依區塊幾何分組批次提取 (id, 圖片)，見 ``batch_extraction.extract_batch``。"""
+        with self._acquire_pool() as pool:
+            yield from batch_extraction.extract_batch(
+                pool, self.keys, self.tuning, items, wm_size,
+                use_kmeans=use_kmeans, bucket_size=bucket_size, cache=self.cache_decomposition,
+            )
+
+    def score_keys(
+        self, image: np.ndarray, wm_size: int, image_keys: Iterable[int], *, use_kmeans: bool, max_cycles: int | None = None
+    ) -> dict[int, Tuple[np.ndarray, float]]:
+        """以多組候選 password_img 提取同一張圖，見 ``batch_extraction.score_keys``。"""
+        return batch_extraction.score_keys(
+            self.keys, self.tuning, image, wm_size, image_keys,
+            use_kmeans=use_kmeans, max_cycles=max_cycles, cache=self.cache_decomposition,
+        )
+
+    def extract_progressive(
+        self, image: np.ndarray, wm_size: int, *, use_kmeans: bool, confidence: float = 3.0, min_cycles: int = 1
+    ) -> ProgressiveExtraction:
+        """逐段提取並於收斂後提前結束，見 ``progressive.extract_progressive``。"""
+        with self._acquire_pool() as pool:
+            return progressive.extract_progressive(
+                pool, self.keys, self.tuning, image, wm_size,
+                use_kmeans=use_kmeans, confidence=confidence, min_cycles=min_cycles, cache=self.cache_decomposition,
+            )
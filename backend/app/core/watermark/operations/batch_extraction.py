@@ -0,0 +1,124 @@
+"""多張圖片或多組金鑰的批次提取，並以標準誤估計每個結果的信心。"""
+
+from __future__ import annotations
+
+from contextlib import ExitStack
+from typing import Any, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from .components import block_coefficients, load_components, stack_blocks
+from .kernels import extract_channels, extract_coefficients
+from .payload import RunningPayload, kmeans_threshold
+from .permutation import PermutationTable, block_permutation
+from .progressive import cycle_blocks
+from .tasks import extract_slab_into
+from ..config import AlgorithmTuning, WatermarkKeys
+from ..runtime import AutoPool
+
+
+def summarize(
+    values: np.ndarray, wm_size: int, use_kmeans: bool, index: np.ndarray | None = None
+) -> Tuple[np.ndarray, float]:
+    """平均單張圖的 (3, n) 軟位元，回傳 (payload, 最不確定位元離判定門檻的標準誤倍數)。
+
+    `index` 為各欄對應的區塊編號，None 表示從區塊 0 起連續。
+    """
+    running = RunningPayload(wm_size)
+    running.add(values, 0, index)
+    wm_avg = running.mean
+    threshold = kmeans_threshold(wm_avg) if use_kmeans else 0.5
+    payload = wm_avg > threshold if use_kmeans else wm_avg
+    return payload, float(running.margins(threshold).min())
+
+
+def extract_batch(
+    pool: AutoPool,
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    items: Iterable[Tuple[Any, np.ndarray]],
+    wm_size: int,
+    *,
+    use_kmeans: bool,
+    bucket_size: int = 8,
+    cache: bool = False,
+) -> Iterator[Tuple[Any, np.ndarray, float]]:
+    """批次提取 (id, 圖片)，依區塊幾何 (rows, cols) 分組後整組一次送進批次核心。
+
+    同組圖片共用同一張 shuffle 索引表，區塊沿通道維度堆疊成 (3K, N, h, w)；
+    某組累積 `bucket_size` 張即處理並產生 (id, payload, confidence)，其餘在最後處理，
+    因此輸出順序依完成先後而非輸入順序。confidence 為所有位元中平均值離判定門檻
+    最少幾個標準誤（樣本完全一致時為 inf）。
+    """
+    if bucket_size <= 0:
+        raise ValueError("bucket_size must be positive")
+    buckets: dict[Tuple[int, int], list[Tuple[Any, np.ndarray]]] = {}
+    for key, image in items:
+        components = load_components(image, keys, tuning, cache=cache)
+        geometry = components.sequence.geometry
+        bucket = buckets.setdefault((geometry.rows, geometry.cols), [])
+        bucket.append((key, stack_blocks(components)))
+        if len(bucket) >= bucket_size:
+            yield from _extract_bucket(pool, keys, tuning, buckets.pop((geometry.rows, geometry.cols)), wm_size, use_kmeans)
+    for bucket in buckets.values():
+        yield from _extract_bucket(pool, keys, tuning, bucket, wm_size, use_kmeans)
+
+
+def _extract_bucket(
+    pool: AutoPool,
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    bucket: list[Tuple[Any, np.ndarray]],
+    wm_size: int,
+    use_kmeans: bool,
+) -> Iterator[Tuple[Any, np.ndarray, float]]:
+    parts = [blocks for _, blocks in bucket]
+    count, width = parts[0].shape[1], int(np.prod(tuning.block.size))
+    shape = (sum(part.shape[0] for part in parts), *parts[0].shape[1:])
+    with ExitStack() as buffers:
+        if pool.parallel:
+            # 區塊張量與輸出都在共享緩衝區，工作者依 slab 讀取索引表並就地寫入軟位元
+            stacked = np.concatenate(parts, out=buffers.enter_context(pool.allocate(shape, parts[0].dtype)))
+            values = buffers.enter_context(pool.allocate(shape[:2], np.float64))
+            pool.map_slabs(extract_slab_into, count, (stacked, PermutationTable(keys.image, count, width), tuning, values))
+        else:
+            values = extract_channels(np.concatenate(parts), block_permutation(keys.image, count, width).forward, tuning)
+        results = [summarize(values[3 * index : 3 * index + 3], wm_size, use_kmeans) for index in range(len(bucket))]
+    for (key, _), result in zip(bucket, results):
+        yield (key, *result)
+
+
+def score_keys(
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    image: np.ndarray,
+    wm_size: int,
+    image_keys: Iterable[int],
+    *,
+    use_kmeans: bool,
+    max_cycles: int | None = None,
+    cache: bool = False,
+) -> dict[int, Tuple[np.ndarray, float]]:
+    """以多組候選 password_img 提取同一張圖，回傳 {金鑰: (payload, confidence)}。
+
+    YUV、DWT 與區塊 DCT 只做一次；每組金鑰只重做係數 shuffle 與 SVD。
+    `max_cycles` 限制每組金鑰使用的循環數（依與漸進式提取相同的固定亂數順序挑選），
+    候選很多時可先以少量區塊篩選。confidence 與 extract_batch 相同，正確金鑰遠高於錯誤金鑰。
+    各金鑰以批次核心直接處理，不經過 pool。
+    """
+    if max_cycles is not None and max_cycles <= 0:
+        raise ValueError("max_cycles must be positive")
+    components = load_components(image, keys, tuning, cache=cache)
+    coeffs = block_coefficients(components)
+    block_num = components.sequence.geometry.block_num
+    width = components.sequence.shuffle.shape[1]
+    cycles = np.random.RandomState(0).permutation(-(-block_num // wm_size))[:max_cycles]
+    index = cycle_blocks(np.sort(cycles), wm_size, block_num)
+    if index.size < block_num:
+        coeffs = coeffs[:, index]
+    results: dict[int, Tuple[np.ndarray, float]] = {}
+    for seed in dict.fromkeys(image_keys):
+        shuffle = block_permutation(seed, block_num, width).forward
+        values = extract_coefficients(coeffs, shuffle[index] if index.size < block_num else shuffle, tuning)
+        results[seed] = summarize(values, wm_size, use_kmeans, index)
+    return results
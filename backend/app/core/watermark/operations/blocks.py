@@ -5,6 +5,8 @@ from typing import Iterator, Sequence, Tuple
 
 import numpy as np
 
+from .permutation import BlockPermutation, PermutationTable, block_permutation
+
 
 @dataclass(frozen=True)
 class BlockGeometry:
@@ -33,18 +35,49 @@ class BlockGeometry:
             raise ValueError("image is too small for the configured block size")
         return cls(rows=rows, cols=cols, block_shape=block_shape)
 
+    def covering(self, rect: Tuple[int, int, int, int]) -> Tuple[slice, slice]:
+        """回傳涵蓋像素矩形 (x, y, width, height) 的區塊列與區塊行範圍。
+
+        一個 LL 區塊對應 2*h x 2*w 的像素，超出可嵌入範圍的部分會被裁掉，可能回傳空範圍。
+        """
+        x, y, width, height = rect
+        if width <= 0 or height <= 0:
+            raise ValueError("rect width and height must be positive")
+        ph, pw = 2 * self.block_shape[0], 2 * self.block_shape[1]
+        rows = slice(max(y, 0) // ph, min(self.rows, max(-(-(y + height) // ph), 0)))
+        cols = slice(max(x, 0) // pw, min(self.cols, max(-(-(x + width) // pw), 0)))
+        return rows, cols
+
+    def indices(self, rows: slice, cols: slice) -> np.ndarray:
+        """回傳區塊列/行範圍內的區塊編號（列優先），與 embed 的位元分配順序一致。"""
+        return (np.arange(rows.start, rows.stop)[:, None] * self.cols + np.arange(cols.start, cols.stop)).ravel()
+
 
 class BlockSequence:
     """以高階介面管理區塊視圖與 shuffle 邏輯。"""
 
     def __init__(self, geometry: BlockGeometry, shuffle_seed: int, shuffle_width: int) -> None:
         self.geometry = geometry
-        rng = np.random.RandomState(shuffle_seed)
-        self._shuffle = rng.random(size=(geometry.block_num, shuffle_width)).argsort(axis=1)
+        self.shuffle_seed = shuffle_seed
+        self.shuffle_width = shuffle_width
+        self._permutation = block_permutation(shuffle_seed, geometry.block_num, shuffle_width)
+
+    @property
+    def permutation(self) -> BlockPermutation:
+        return self._permutation
 
     @property
     def shuffle(self) -> np.ndarray:
-        return self._shuffle
+        return self._permutation.forward
+
+    @property
+    def inverse(self) -> np.ndarray:
+        return self._permutation.inverse
+
+    def tables(self) -> Tuple[PermutationTable, PermutationTable]:
+        """回傳正向與反向索引表的描述，供行程池工作者自行取得同一組表。"""
+        key = (self.shuffle_seed, self.geometry.block_num, self.shuffle_width)
+        return PermutationTable(*key), PermutationTable(*key, inverse=True)
 
     def view(self, array: np.ndarray) -> np.ndarray:
         """將二維陣列轉換為 (rows, cols, h, w) 的分塊視圖。"""
@@ -67,7 +100,7 @@ class BlockSequence:
                 yield i, j
 
     def shuffle_row(self, idx: int) -> np.ndarray:
-        return self._shuffle[idx]
+        return self._permutation.forward[idx]
 
     def reshape_block(self, block: np.ndarray) -> np.ndarray:
         return block.reshape(self.geometry.block_shape)
@@ -0,0 +1,44 @@
+"""逐區塊以 cv2.dct 與 SVD 處理的參考實作，供 common 模式逐區塊 map 使用。"""
+
+from __future__ import annotations
+
+import cv2
+import numpy as np
+from numpy.linalg import svd
+
+from .kernels import singular_values
+from ..config import AlgorithmTuning
+
+
+def embed_block(
+    block: np.ndarray, shuffle_idx: np.ndarray, inverse_idx: np.ndarray, wm_bit: int, tuning: AlgorithmTuning
+) -> np.ndarray:
+    block_dct = cv2.dct(block)
+    shuffled = block_dct.reshape(-1)[shuffle_idx].reshape(block.shape)
+    u, s, v = svd(shuffled)
+    s0 = (s[0] // tuning.d1 + 0.25 + 0.5 * wm_bit) * tuning.d1
+    s[0] = s0
+    if tuning.d2 > 0:
+        s[1] = (s[1] // tuning.d2 + 0.25 + 0.5 * wm_bit) * tuning.d2
+    recomposed = np.dot(u, np.dot(np.diag(s), v))
+    return cv2.idct(recomposed.reshape(-1)[inverse_idx].reshape(block.shape))
+
+
+def extract_block(block: np.ndarray, shuffle_idx: np.ndarray, tuning: AlgorithmTuning) -> float:
+    block_dct = cv2.dct(block)
+    shuffled = block_dct.reshape(-1)[shuffle_idx].reshape(block.shape)
+    s = singular_values(shuffled, tuning.sv_method)
+    wm = 1.0 if s[0] % tuning.d1 > tuning.d1 / 2 else 0.0
+    if tuning.d2 > 0:
+        tmp = 1.0 if s[1] % tuning.d2 > tuning.d2 / 2 else 0.0
+        wm = (wm * 3 + tmp) / 4
+    return wm
+
+
+def embed_task(args: tuple[np.ndarray, np.ndarray, np.ndarray, int, AlgorithmTuning]) -> np.ndarray:
+    return embed_block(*args)
+
+
+def extract_task(args: tuple[np.ndarray, np.ndarray, AlgorithmTuning]) -> float:
+    block, shuffle_idx, tuning = args
+    return extract_block(block, shuffle_idx, tuning)
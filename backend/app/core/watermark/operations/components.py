@@ -0,0 +1,127 @@
+"""影像分解：色彩轉換、Haar 分解、區塊堆疊與分解快取的查詢。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Hashable, Tuple
+
+import numpy as np
+
+from .blocks import BlockGeometry, BlockSequence
+from .decomposition import CachedDecomposition, decomposition_cache, image_digest
+from .kernels import batch_dct, batch_dct_unique
+from .transforms import convert_bgr_to_yuv, pad_to_even
+from .wavelet import haar_analysis
+from ..config import AlgorithmTuning, WatermarkKeys
+
+
+@dataclass
+class WaveletComponents:
+    original_shape: Tuple[int, int]
+    alpha: np.ndarray | None
+    ca_channels: Tuple[np.ndarray, np.ndarray, np.ndarray]
+    sequence: BlockSequence
+    # ca_channels 皆為此 (3, H, W) 緩衝區的視圖
+    ca_stack: np.ndarray
+    # 補成偶數尺寸的 (H, W, 3) YUV 平面；細節頻帶不另外保存，重建時直接就地更新
+    yuv: np.ndarray
+    # 來自分解快取時指向快取項目（陣列唯讀），可重複使用其區塊 DCT 係數
+    cached: CachedDecomposition | None = None
+
+
+def split_alpha(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray | None]:
+    if image.shape[2] == 4 and np.any(image[:, :, 3] < 255):
+        return image[:, :, :3], image[:, :, 3]
+    return image, None
+
+
+def merge_alpha(image: np.ndarray, alpha: np.ndarray | None) -> np.ndarray:
+    if alpha is None:
+        return image
+    return np.dstack([image, alpha])
+
+
+def init_sequence(keys: WatermarkKeys, ca_shape: Tuple[int, int], block_shape: Tuple[int, int]) -> BlockSequence:
+    geometry = BlockGeometry.from_ca_shape(ca_shape, block_shape)
+    shuffle_width = block_shape[0] * block_shape[1]
+    return BlockSequence(geometry=geometry, shuffle_seed=keys.image, shuffle_width=shuffle_width)
+
+
+def decompose(
+    image: np.ndarray, keys: WatermarkKeys, tuning: AlgorithmTuning, allocate: Callable[..., np.ndarray] = np.empty
+) -> WaveletComponents:
+    bgr, alpha = split_alpha(image)
+    dtype = np.dtype(tuning.precision)
+    original_shape = bgr.shape[:2]
+    # OpenCV 的色彩轉換只支援 float32，之後的 DWT/DCT/SVD/IDWT 皆維持 tuning.precision
+    yuv = pad_to_even(convert_bgr_to_yuv(bgr.astype(np.float32))).astype(dtype, copy=False)
+    # 三個通道的 cA 放在同一塊 (3, H, W) 緩衝區，共享記憶體模式下可由工作者就地修改
+    ca_channels = haar_analysis(yuv, out=allocate((3, yuv.shape[0] // 2, yuv.shape[1] // 2), dtype))
+    sequence = init_sequence(keys, ca_channels[0].shape, tuning.block.size)
+    return WaveletComponents(
+        original_shape=original_shape,
+        alpha=alpha,
+        ca_channels=(ca_channels[0], ca_channels[1], ca_channels[2]),
+        sequence=sequence,
+        ca_stack=ca_channels,
+        yuv=yuv,
+    )
+
+
+def load_components(
+    image: np.ndarray,
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    *,
+    cache: bool,
+    allocate: Callable[..., np.ndarray] | None = None,
+) -> WaveletComponents:
+    """取得分解結果；`cache` 為真時以圖片內容雜湊查詢分解快取，未命中才分解。
+
+    提供 `allocate` 表示呼叫端會就地改寫 cA 與 YUV，此時快取的內容會先複製到新緩衝區。
+    """
+    if not cache:
+        return decompose(image, keys, tuning, allocate or np.empty)
+    key = (image_digest(image), tuning.block.size, tuning.precision)
+    entry = decomposition_cache().get(key, lambda: _cache_entry(key, image, keys, tuning))
+    ca_stack, yuv = entry.ca_stack, entry.yuv
+    if allocate is not None:
+        ca_stack = allocate(ca_stack.shape, ca_stack.dtype)
+        ca_stack[...] = entry.ca_stack
+        yuv = entry.yuv.copy()
+    return WaveletComponents(
+        original_shape=entry.original_shape,
+        alpha=entry.alpha,
+        ca_channels=(ca_stack[0], ca_stack[1], ca_stack[2]),
+        sequence=init_sequence(keys, ca_stack.shape[1:], tuning.block.size),
+        ca_stack=ca_stack,
+        yuv=yuv,
+        cached=entry,
+    )
+
+
+def _cache_entry(key: Hashable, image: np.ndarray, keys: WatermarkKeys, tuning: AlgorithmTuning) -> CachedDecomposition:
+    components = decompose(image, keys, tuning)
+    alpha = None if components.alpha is None else components.alpha.copy()
+    return CachedDecomposition(key, components.original_shape, alpha, components.yuv, components.ca_stack)
+
+
+def stack_blocks(components: WaveletComponents) -> np.ndarray:
+    """將三個通道的 cA 分塊堆疊成 (3, N, h, w) 張量。"""
+    geometry = components.sequence.geometry
+    return np.stack([
+        components.sequence.view(ca).reshape(geometry.block_num, *geometry.block_shape)
+        for ca in components.ca_channels
+    ])
+
+
+def block_coefficients(components: WaveletComponents, dedupe: bool = False) -> np.ndarray:
+    """回傳 (3, N, h, w) 區塊 DCT 係數；來自快取的分解只計算一次，dedupe 時重複區塊只轉換一次。"""
+    cached = components.cached
+    if cached is not None and cached.coefficients is not None:
+        return cached.coefficients
+    transform = batch_dct_unique if dedupe else batch_dct
+    coefficients = transform(stack_blocks(components))
+    if cached is not None:
+        decomposition_cache().store_coefficients(cached, coefficients)
+    return coefficients
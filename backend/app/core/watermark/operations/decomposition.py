@@ -0,0 +1,106 @@
+"""以圖片內容雜湊為鍵的分解結果（YUV、cA 與區塊 DCT）LRU 快取。"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def image_digest(image: np.ndarray) -> str:
+    """以像素內容、形狀與型別計算圖片的雜湊，內容相同的陣列得到相同的鍵。"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.shape}{image.dtype.str}".encode())
+    digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedDecomposition:
+    """與金鑰無關的分解結果；陣列皆為唯讀，嵌入前須自行複製。"""
+
+    key: Hashable
+    original_shape: Tuple[int, int]
+    alpha: np.ndarray | None
+    yuv: np.ndarray
+    ca_stack: np.ndarray
+    # 依區塊順序排列的 (3, N, h, w) DCT 係數，第一次需要時才計算
+    coefficients: np.ndarray | None = None
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.alpha, self.yuv, self.ca_stack, self.coefficients)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+class DecompositionCache:
+    """分解結果的 LRU 快取，總位元組數超過 ``max_bytes`` 時淘汰最久未使用的項目。
+
+    鍵由呼叫端組成（圖片雜湊、區塊設定與精度），同一張圖片反覆嵌入、攻擊測試與提取時
+    只需分解一次；單一項目超過上限時不快取。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, CachedDecomposition]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, build: Callable[[], CachedDecomposition]) -> CachedDecomposition:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = build()
+        for array in (entry.alpha, entry.yuv, entry.ca_stack):
+            if array is not None:
+                array.setflags(write=False)
+        with self._lock:
+            if entry.nbytes <= self.max_bytes:
+                self._entries[key] = entry
+                self._evict()
+        return entry
+
+    def store_coefficients(self, entry: CachedDecomposition, coefficients: np.ndarray) -> None:
+        """記錄項目的區塊 DCT 係數，並依新的大小重新檢查上限。"""
+        coefficients.setflags(write=False)
+        with self._lock:
+            entry.coefficients = coefficients
+            if entry.key in self._entries:
+                self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _evict(self) -> None:
+        total = self.nbytes
+        while total > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+
+
+_default_cache = DecompositionCache()
+
+
+def decomposition_cache() -> DecompositionCache:
+    """回傳模組共用的快取，可用來調整上限或查看命中統計。"""
+    return _default_cache
@@ -0,0 +1,179 @@
+"""以批次矩陣運算處理整個通道的區塊 DCT/SVD。"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+
+from ..config import AlgorithmTuning, SingularValueMethod
+from ..runtime.memo import BlockMemo
+from .permutation import inverse_rows, permute_rows
+
+
+@lru_cache(maxsize=8)
+def dct_matrix(size: int) -> np.ndarray:
+    """回傳與 cv2.dct 相同縮放的正交 DCT-II 矩陣。"""
+    k = np.arange(size)[:, None]
+    j = np.arange(size)[None, :]
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * j + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    matrix.setflags(write=False)
+    return matrix
+
+
+def batch_dct(blocks: np.ndarray) -> np.ndarray:
+    """對 (..., h, w) 區塊堆疊做 2D DCT：C_h @ B @ C_w^T。"""
+    h, w = blocks.shape[-2:]
+    left = dct_matrix(h).astype(blocks.dtype)
+    right = dct_matrix(w).astype(blocks.dtype)
+    return left @ blocks @ right.T
+
+
+def batch_idct(coeffs: np.ndarray) -> np.ndarray:
+    """對 (..., h, w) 係數堆疊做 2D 逆 DCT：C_h^T @ X @ C_w。"""
+    h, w = coeffs.shape[-2:]
+    left = dct_matrix(h).astype(coeffs.dtype)
+    right = dct_matrix(w).astype(coeffs.dtype)
+    return left.T @ coeffs @ right
+
+
+def quantize(values: np.ndarray, bits: np.ndarray, step: float) -> np.ndarray:
+    """將奇異值量化到對應位元的區間中點。
+
+    位元先轉成奇異值的 dtype，避免整數位元把 float32 運算提升為 float64。
+    """
+    offset = 0.25 + 0.5 * np.asarray(bits).astype(values.dtype, copy=False)
+    return (values // step + offset) * step
+
+
+def singular_values(matrices: np.ndarray, method: SingularValueMethod = "svd") -> np.ndarray:
+    """只計算 (..., h, w) 矩陣堆疊的奇異值（遞減排序），不產生 U 與 V。
+
+    "gram" 以 float64 計算 B^T B 的特徵值再開根號，對 4x4 區塊比 SVD 快數倍；
+    僅在奇異值落在量化邊界附近時可能與 "svd" 判斷不同。
+    """
+    if method == "gram":
+        h, w = matrices.shape[-2:]
+        gram = matrices.astype(np.float64)
+        gram = np.swapaxes(gram, -1, -2) @ gram if w <= h else gram @ np.swapaxes(gram, -1, -2)
+        eigen = np.linalg.eigvalsh(gram)[..., ::-1]
+        return np.sqrt(np.clip(eigen, 0.0, None))
+    return np.linalg.svd(matrices, compute_uv=False)
+
+
+def decide(values: np.ndarray, step: float) -> np.ndarray:
+    """依奇異值落在量化區間的上半或下半判斷位元。"""
+    return (values % step > step / 2).astype(np.float64)
+
+
+def embed_blocks(
+    blocks: np.ndarray,
+    shuffle: np.ndarray,
+    bits: np.ndarray,
+    tuning: AlgorithmTuning,
+    inverse: np.ndarray | None = None,
+) -> np.ndarray:
+    """一次嵌入 (..., N, h, w) 區塊堆疊，`bits` 為每個區塊對應的浮水印位元。
+
+    `inverse` 為預先算好的反置換表；未提供時由 `shuffle` 推得。
+    """
+    if inverse is None:
+        inverse = inverse_rows(shuffle)
+    recomposed = _quantize_shuffled(permute_rows(batch_dct(blocks), shuffle), bits, tuning)
+    return batch_idct(permute_rows(recomposed, inverse))
+
+
+def _quantize_shuffled(shuffled: np.ndarray, bits: np.ndarray, tuning: AlgorithmTuning) -> np.ndarray:
+    """對打亂後的 DCT 係數做 SVD、量化前兩個奇異值並重組。"""
+    u, s, v = np.linalg.svd(shuffled, full_matrices=False)
+    s[..., 0] = quantize(s[..., 0], bits, tuning.d1)
+    if tuning.d2 > 0:
+        s[..., 1] = quantize(s[..., 1], bits, tuning.d2)
+    return (u * s[..., None, :]) @ v
+
+
+def unique_rows(rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """回傳 (M, K) 陣列中不重複的列與還原索引，使 rows 與 unique[inverse] 逐位元組相同。"""
+    rows = np.ascontiguousarray(rows)
+    view = rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).reshape(-1)
+    _, index, inverse = np.unique(view, return_index=True, return_inverse=True)
+    return rows[index], inverse.reshape(-1)
+
+
+def batch_dct_unique(blocks: np.ndarray) -> np.ndarray:
+    """與 batch_dct 相同，但內容相同的區塊只轉換一次。"""
+    h, w = blocks.shape[-2:]
+    unique, inverse = unique_rows(blocks.reshape(-1, h * w))
+    return batch_dct(unique.reshape(-1, h, w))[inverse].reshape(blocks.shape)
+
+
+def snap_noise(coeffs: np.ndarray) -> np.ndarray:
+    """把相對於區塊最大係數只剩浮點誤差的係數歸零。
+
+    平坦區塊的 DCT 只有直流項非零，但矩陣運算會在交流項留下 1e-7 等級的雜訊；
+    雜訊隨 shuffle 排列後每個區塊都不同，歸零後打亂結果只剩 h*w 種，才能去重。
+    """
+    tolerance = np.abs(coeffs).max(axis=(-2, -1), keepdims=True) * (4 * np.finfo(coeffs.dtype).eps)
+    return np.where(np.abs(coeffs) <= tolerance, 0, coeffs)
+
+
+def embed_blocks_cached(
+    blocks: np.ndarray,
+    shuffle: np.ndarray,
+    bits: np.ndarray,
+    tuning: AlgorithmTuning,
+    inverse: np.ndarray,
+    memo: BlockMemo,
+) -> np.ndarray:
+    """embed_blocks 的去重版本：重複的區塊只做一次 DCT，SVD 量化結果依打亂後係數與位元記憶。
+
+    係數先經 snap_noise，因此大片純色背景幾乎全部命中。提取結果與 embed_blocks 相同；
+    像素只在秩不足（平坦）區塊可能不同，這類區塊的奇異向量本來就不唯一。
+    """
+    h, w = blocks.shape[-2:]
+    shuffled = permute_rows(snap_noise(batch_dct_unique(blocks)), shuffle)
+    flat = shuffled.reshape(-1, h * w)
+    block_bits = np.broadcast_to(bits, shuffled.shape[:-2]).reshape(-1, 1).astype(flat.dtype)
+    unique, index = unique_rows(np.concatenate([flat, block_bits], axis=1))
+    namespace = ("embed", tuning.d1, tuning.d2, flat.dtype.str)
+
+    def compute(rows: np.ndarray) -> np.ndarray:
+        return _quantize_shuffled(rows[:, :-1].reshape(-1, h, w), rows[:, -1], tuning)
+
+    recomposed = memo.resolve(namespace, unique, compute, total=flat.shape[0])[index]
+    return batch_idct(permute_rows(recomposed.reshape(shuffled.shape), inverse))
+
+
+def extract_channels(blocks: np.ndarray, shuffle: np.ndarray, tuning: AlgorithmTuning) -> np.ndarray:
+    """一次提取 (C, N, h, w) 區塊張量的軟位元，回傳形狀為 (C, N)。"""
+    return extract_coefficients(batch_dct(blocks), shuffle, tuning)
+
+
+def extract_coefficients(coeffs: np.ndarray, shuffle: np.ndarray, tuning: AlgorithmTuning) -> np.ndarray:
+    """由已做完 DCT 的 (C, N, h, w) 係數提取軟位元；只有 shuffle 取決於金鑰，可重複套用不同金鑰。"""
+    return _soft_bits(permute_rows(coeffs, shuffle), tuning)
+
+
+def extract_coefficients_cached(
+    coeffs: np.ndarray, shuffle: np.ndarray, tuning: AlgorithmTuning, memo: BlockMemo
+) -> np.ndarray:
+    """extract_coefficients 的去重版本：係數經 snap_noise 後，打亂後內容相同的區塊只計算一次並跨呼叫記憶。"""
+    h, w = coeffs.shape[-2:]
+    shuffled = permute_rows(snap_noise(coeffs), shuffle)
+    unique, index = unique_rows(shuffled.reshape(-1, h * w))
+    namespace = ("extract", tuning.d1, tuning.d2, tuning.sv_method, shuffled.dtype.str)
+
+    def compute(rows: np.ndarray) -> np.ndarray:
+        return _soft_bits(rows.reshape(-1, h, w), tuning)
+
+    values = memo.resolve(namespace, unique, compute, total=index.size)
+    return values[index].reshape(shuffled.shape[:-2])
+
+
+def _soft_bits(shuffled: np.ndarray, tuning: AlgorithmTuning) -> np.ndarray:
+    s = singular_values(shuffled, tuning.sv_method)
+    wm = decide(s[..., 0], tuning.d1)
+    if tuning.d2 > 0:
+        wm = (wm * 3 + decide(s[..., 1], tuning.d2)) / 4
+    return wm
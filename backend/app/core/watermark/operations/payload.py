@@ -0,0 +1,84 @@
+"""提取後水印位元的平均與二值化。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def _average_payload(values: np.ndarray, wm_size: int) -> np.ndarray:
+    wm_avg = np.zeros(shape=wm_size)
+    for idx in range(wm_size):
+        wm_avg[idx] = values[:, idx::wm_size].mean()
+    return wm_avg
+
+
+class RunningPayload:
+    """依區塊順序累加軟位元，維護每個浮水印位元的樣本數、平均與標準差。"""
+
+    def __init__(self, wm_size: int) -> None:
+        self.wm_size = wm_size
+        self.counts = np.zeros(wm_size)
+        self.sums = np.zeros(wm_size)
+        self.squares = np.zeros(wm_size)
+
+    def add(self, values: np.ndarray, offset: int, index: np.ndarray | None = None) -> None:
+        """加入 (C, n) 軟位元，第 j 欄對應區塊 offset + j（位元 (offset + j) % wm_size）。
+
+        提供 `index` 時第 j 欄改為對應區塊 index[j]，offset 不使用。
+        """
+        blocks = offset + np.arange(values.shape[-1]) if index is None else index
+        bits = np.tile(blocks % self.wm_size, values.shape[0])
+        flat = values.reshape(-1)
+        self.counts += np.bincount(bits, minlength=self.wm_size)
+        self.sums += np.bincount(bits, weights=flat, minlength=self.wm_size)
+        self.squares += np.bincount(bits, weights=flat * flat, minlength=self.wm_size)
+
+    @property
+    def mean(self) -> np.ndarray:
+        return np.divide(self.sums, self.counts, out=np.zeros(self.wm_size), where=self.counts > 0)
+
+    def margins(self, threshold: float = 0.5) -> np.ndarray:
+        """每個位元平均值離判定門檻的距離除以標準誤；樣本完全一致時為 inf。"""
+        mean = self.mean
+        variance = np.divide(self.squares, self.counts, out=np.zeros(self.wm_size), where=self.counts > 0) - mean**2
+        stderr = np.sqrt(np.clip(variance, 0.0, None) / np.maximum(self.counts, 1))
+        distance = np.abs(mean - threshold)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(stderr > 0, distance / stderr, np.where(distance > 0, np.inf, 0.0))
+
+    def converged(self, confidence: float, min_count: int, threshold: float = 0.5) -> bool:
+        return bool(np.all(self.counts >= min_count) and np.all(self.margins(threshold) >= confidence))
+
+
+@dataclass
+class ProgressiveExtraction:
+    """漸進式提取的結果與實際使用的區塊數。"""
+
+    payload: np.ndarray
+    blocks_used: int
+    block_num: int
+    converged: bool
+
+
+def kmeans_threshold(values: np.ndarray, *, max_iter: int = 300) -> float:
+    """以一維二群 k-means 求出分隔 0/1 的門檻。"""
+    centers = [float(values.min()), float(values.max())]
+    if centers[0] == centers[1]:
+        return centers[0]
+    for _ in range(max_iter):
+        threshold = sum(centers) / 2
+        mask = values > threshold
+        new_centers = [values[~mask].mean(), values[mask].mean()]
+        if np.isnan(new_centers[0]) or np.isnan(new_centers[1]):
+            break
+        new_threshold = sum(new_centers) / 2
+        if abs(new_threshold - threshold) < 1e-6:
+            return new_threshold
+        centers = new_centers
+    return sum(centers) / 2
+
+
+def one_dim_kmeans(values: np.ndarray, *, max_iter: int = 300) -> np.ndarray:
+    return values > kmeans_threshold(values, max_iter=max_iter)
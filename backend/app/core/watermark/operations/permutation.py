@@ -0,0 +1,176 @@
+"""區塊係數的 shuffle 置換：正向/反向索引表的產生、套用與快取。"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_BYTES = 64 << 20
+
+
+def _argsort_rows(rng: np.random.RandomState, count: int, width: int) -> np.ndarray:
+    table = rng.random(size=(count, width)).argsort(axis=1)
+    return table.astype(np.min_scalar_type(width - 1))
+
+
+def inverse_rows(forward: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """計算每一列置換的反置換：``permute_rows(permute_rows(x, f), inverse_rows(f)) == x``。"""
+    inverse = np.empty_like(forward) if out is None else out
+    positions = np.broadcast_to(np.arange(forward.shape[-1], dtype=forward.dtype), forward.shape)
+    np.put_along_axis(inverse, forward, positions, axis=-1)
+    return inverse
+
+
+def permute_rows(coeffs: np.ndarray, index: np.ndarray) -> np.ndarray:
+    """以 (N, h*w) 索引重排 (..., N, h, w) 係數，前置維度共用同一組索引。"""
+    h, w = coeffs.shape[-2:]
+    flat = coeffs.reshape(*coeffs.shape[:-2], h * w)
+    index = index.reshape((1,) * (flat.ndim - 2) + index.shape)
+    return np.take_along_axis(flat, index, axis=-1).reshape(coeffs.shape)
+
+
+class BlockPermutation:
+    """所有區塊的正向與反向 shuffle 索引表。
+
+    兩張表都只計算一次，之後整批 (N, h*w) 係數的打亂與還原都是一次
+    ``take_along_axis``，不需要逐區塊複製再 scatter。
+    """
+
+    def __init__(self, forward: np.ndarray, inverse: np.ndarray | None = None) -> None:
+        self.forward = forward
+        self.inverse = inverse_rows(forward) if inverse is None else inverse
+
+    def __len__(self) -> int:
+        return self.forward.shape[0]
+
+    def __getitem__(self, rows: slice) -> "BlockPermutation":
+        return BlockPermutation(self.forward[rows], self.inverse[rows])
+
+    def apply(self, coeffs: np.ndarray) -> np.ndarray:
+        return permute_rows(coeffs, self.forward)
+
+    def restore(self, coeffs: np.ndarray) -> np.ndarray:
+        return permute_rows(coeffs, self.inverse)
+
+
+class PermutationStream:
+    """依區塊順序逐段產生置換，不保留整張索引表。
+
+    各段依序接起來與 ``block_permutation(seed, N, width)`` 的表相同，
+    供無法一次放進記憶體的超大圖片分段嵌入。
+    """
+
+    def __init__(self, seed: int, width: int) -> None:
+        self.width = width
+        self._rng = np.random.RandomState(seed)
+
+    def take(self, count: int, allocate: Callable[..., np.ndarray] = np.empty) -> BlockPermutation:
+        """產生接下來 count 個區塊的置換；`allocate` 可讓索引表直接配置在共享記憶體中。"""
+        shape, dtype = (count, self.width), np.min_scalar_type(self.width - 1)
+        forward = allocate(shape, dtype)
+        forward[...] = self._rng.random(size=shape).argsort(axis=1)
+        return BlockPermutation(forward, inverse_rows(forward, out=allocate(shape, dtype)))
+
+
+@dataclass(frozen=True)
+class PermutationTable:
+    """可 pickle 的索引表描述，依列範圍取值時才向 ``block_permutation`` 取得整張表。
+
+    交給行程池時只傳遞 (seed, count, width)，工作者在自己的行程內產生並快取同一張表，
+    不必每次呼叫都把 (N, h*w) 索引表複製到共享記憶體。
+    """
+
+    seed: int
+    count: int
+    width: int
+    inverse: bool = False
+
+    def __getitem__(self, rows: slice) -> np.ndarray:
+        permutation = block_permutation(self.seed, self.count, self.width)
+        return (permutation.inverse if self.inverse else permutation.forward)[rows]
+
+
+class ShuffleTableCache:
+    """以 (seed, width) 為鍵的 shuffle 索引表 LRU 快取。
+
+    ``RandomState.random((N, w))`` 依列序產生亂數，因此較小圖片的索引表恰為
+    較大表的前 N 列：命中時直接回傳前綴切片，不足時從保存的亂數狀態接續產生新列。
+    表以能容納 ``width - 1`` 的最小整數型別儲存，總位元組數超過 ``max_bytes``
+    時淘汰最久未使用的表。反向表與正向表一起快取，回傳的陣列皆為唯讀。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._tables: "OrderedDict[Tuple[int, int], Tuple[BlockPermutation, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.forward.nbytes + table.inverse.nbytes for table, _ in self._tables.values())
+
+    def get(self, seed: int, count: int, width: int) -> BlockPermutation:
+        key = (seed, width)
+        with self._lock:
+            entry = self._tables.get(key)
+            if entry is not None:
+                self._tables.move_to_end(key)
+                if len(entry[0]) >= count:
+                    self.hits += 1
+                    return entry[0][:count]
+            self.misses += 1
+        table, state = self._extend(seed, count, width, entry)
+        with self._lock:
+            current = self._tables.get(key)
+            if 2 * table.forward.nbytes <= self.max_bytes and (current is None or len(current[0]) < count):
+                self._tables[key] = (table, state)
+                self._tables.move_to_end(key)
+                self._evict()
+        return table[:count]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self.hits = self.misses = 0
+
+    @staticmethod
+    def _extend(
+        seed: int, count: int, width: int, entry: Tuple[BlockPermutation, Dict] | None
+    ) -> Tuple[BlockPermutation, Dict]:
+        rng = np.random.RandomState(seed)
+        if entry is None:
+            forward = _argsort_rows(rng, count, width)
+            inverse = inverse_rows(forward)
+        else:
+            # 接續已快取列之後的亂數序列，只為新增的列做 argsort
+            rng.set_state(entry[1])
+            extra = _argsort_rows(rng, count - len(entry[0]), width)
+            forward = np.concatenate([entry[0].forward, extra])
+            inverse = np.concatenate([entry[0].inverse, inverse_rows(extra)])
+        forward.setflags(write=False)
+        inverse.setflags(write=False)
+        return BlockPermutation(forward, inverse), rng.get_state()
+
+    def _evict(self) -> None:
+        total = self.nbytes
+        while total > self.max_bytes and len(self._tables) > 1:
+            _, (table, _) = self._tables.popitem(last=False)
+            total -= table.forward.nbytes + table.inverse.nbytes
+
+
+_default_cache = ShuffleTableCache()
+
+
+def block_permutation(seed: int, count: int, width: int) -> BlockPermutation:
+    """回傳 count 個區塊的置換；正向表與 ``RandomState(seed).random(...).argsort(axis=1)`` 相同。"""
+    return _default_cache.get(seed, count, width)
+
+
+def shuffle_cache() -> ShuffleTableCache:
+    """回傳模組共用的快取，可用來調整上限或查看命中統計。"""
+    return _default_cache
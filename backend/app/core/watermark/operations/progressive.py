@@ -0,0 +1,93 @@
+"""依循環順序逐段提取，位元判定穩定且信心足夠時提前結束。"""
+
+from __future__ import annotations
+
+from contextlib import ExitStack
+
+import numpy as np
+
+from .components import WaveletComponents, load_components
+from .kernels import extract_channels
+from .payload import ProgressiveExtraction, RunningPayload, kmeans_threshold
+from .tasks import extract_slab_into
+from ..config import AlgorithmTuning, WatermarkKeys
+from ..runtime import AutoPool
+
+# 一段的區塊數達此值且 pool 為平行模式時，才值得把段落放進共享記憶體以 slab 分給工作者
+PARALLEL_SEGMENT_BLOCKS = 16384
+
+
+def cycle_blocks(cycles: np.ndarray, wm_size: int, block_num: int) -> np.ndarray:
+    """依 cycles 順序串接各循環涵蓋的區塊編號；最後一個循環可能不完整。"""
+    index = (np.asarray(cycles)[:, None] * wm_size + np.arange(wm_size)).reshape(-1)
+    return index[index < block_num]
+
+
+def _extract_segment(
+    pool: AutoPool, components: WaveletComponents, tuning: AlgorithmTuning, index: np.ndarray
+) -> np.ndarray:
+    """以一次核心呼叫（或一次 map_slabs）提取區塊編號 index 的 (3, n) 軟位元。"""
+    sequence = components.sequence
+    rows, cols = np.divmod(index, sequence.geometry.cols)
+    if not (pool.parallel and index.size >= PARALLEL_SEGMENT_BLOCKS):
+        blocks = np.stack([sequence.view(ca)[rows, cols] for ca in components.ca_channels])
+        return extract_channels(blocks, sequence.shuffle[index], tuning)
+    with ExitStack() as buffers:
+        def allocate(shape: tuple, dtype: np.dtype) -> np.ndarray:
+            return buffers.enter_context(pool.allocate(shape, dtype))
+
+        blocks = allocate((3, index.size, *sequence.geometry.block_shape), components.ca_stack.dtype)
+        for channel, ca in enumerate(components.ca_channels):
+            blocks[channel] = sequence.view(ca)[rows, cols]
+        table = sequence.shuffle
+        shuffle = np.take(table, index, axis=0, out=allocate((index.size, table.shape[1]), table.dtype))
+        out = allocate((3, index.size), np.float64)
+        pool.map_slabs(extract_slab_into, index.size, (blocks, shuffle, tuning, out))
+        return out.copy()
+
+
+def extract_progressive(
+    pool: AutoPool,
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    image: np.ndarray,
+    wm_size: int,
+    *,
+    use_kmeans: bool,
+    confidence: float = 3.0,
+    min_cycles: int = 1,
+    cache: bool = False,
+) -> ProgressiveExtraction:
+    """依循環順序逐段提取，所有位元的判定穩定且信心足夠時提前結束。
+
+    每段處理的循環數加倍（min_cycles、min_cycles、2x、4x...）；每段結束後若位元判定與上一段相同，
+    且每個位元的平均值離判定門檻（k-means 門檻或 0.5）至少 `confidence` 個標準誤、
+    樣本數至少 3 * min_cycles，即停止。
+    每段的區塊依循環順序收集成單一索引陣列，以一次批次核心呼叫處理；
+    段落夠大且 pool 為平行模式時改以 map_slabs 分攤。
+    """
+    if confidence <= 0 or min_cycles <= 0:
+        raise ValueError("confidence and min_cycles must be positive")
+    components = load_components(image, keys, tuning, cache=cache)
+    block_num = components.sequence.geometry.block_num
+    # 以固定亂數順序走訪循環，使前幾段樣本分散在整張圖，避免只看到頂端的平坦或飽和區域
+    cycles = np.random.RandomState(0).permutation(-(-block_num // wm_size))
+    running = RunningPayload(wm_size)
+    done, chunk, previous, converged = 0, min_cycles, None, False
+    while done < cycles.size and not converged:
+        stop = min(cycles.size, done + chunk)
+        index = cycle_blocks(cycles[done:stop], wm_size, block_num)
+        running.add(_extract_segment(pool, components, tuning, index), 0, index)
+        wm_avg = running.mean
+        # 判定門檻與最終二值化一致：k-means 門檻或 0.5
+        threshold = kmeans_threshold(wm_avg) if use_kmeans else 0.5
+        decisions = wm_avg > threshold
+        converged = (
+            previous is not None
+            and np.array_equal(decisions, previous)
+            and running.converged(confidence, 3 * min_cycles, threshold)
+        )
+        previous, chunk, done = decisions, max(chunk, stop), stop
+    payload = decisions if use_kmeans else wm_avg
+    blocks_used = int(running.counts.sum()) // 3
+    return ProgressiveExtraction(payload=payload, blocks_used=blocks_used, block_num=block_num, converged=converged)
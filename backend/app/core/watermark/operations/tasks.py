@@ -0,0 +1,77 @@
+"""交給 ``AutoPool.map_slabs`` 的頂層 slab 任務與其可 pickle 的參數。
+
+係數與輸出陣列由呼叫端以 ``pool.allocate`` 配置，行程工作者只收到共享記憶體名稱並直接讀寫；
+索引表與區塊位元以描述（``PermutationTable``、``CyclicBits``）傳遞，由工作者依 slab 範圍取值，
+因此每次呼叫都不必複製或 pickle 整個張量，也不必把結果傳回父行程再串接。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from .kernels import embed_blocks, extract_channels
+from .permutation import PermutationTable
+from ..config import AlgorithmTuning
+
+
+@dataclass(eq=False)
+class CyclicBits:
+    """區塊 offset + i 的位元為 ``wm_bits[(offset + i) % wm_size]``；只 pickle 浮水印本身。"""
+
+    wm_bits: np.ndarray
+    offset: int = 0
+
+    def __getitem__(self, index: slice) -> np.ndarray:
+        blocks = np.arange(self.offset + index.start, self.offset + index.stop)
+        return self.wm_bits[blocks % self.wm_bits.size].astype(np.int64)
+
+
+def _row_tiles(channels: np.ndarray, block: Tuple[int, int], cols: int, rows: slice) -> Tuple[np.ndarray, slice]:
+    """回傳 (C, H, W) 係數中第 rows 列區塊的 (C, n, cols, h, w) 視圖與對應的區塊編號範圍。"""
+    bh, bw = block
+    count = rows.stop - rows.start
+    region = channels[:, rows.start * bh : rows.stop * bh, : cols * bw]
+    tiles = region.reshape(channels.shape[0], count, bh, cols, bw).swapaxes(2, 3)
+    return tiles, slice(rows.start * cols, rows.stop * cols)
+
+
+def embed_rows_inplace(
+    channels: np.ndarray,
+    shuffle: np.ndarray | PermutationTable,
+    inverse: np.ndarray | PermutationTable,
+    bits: np.ndarray | CyclicBits,
+    tuning: AlgorithmTuning,
+    cols: int,
+    rows: slice,
+) -> None:
+    """就地嵌入 (C, H, W) 係數中第 rows 列的區塊（channels 可位於共享記憶體）。
+
+    一列區塊對應連續的區塊編號，因此 slab 只需寫回自己的係數列，父行程不必再組裝結果。
+    """
+    tiles, index = _row_tiles(channels, tuning.block.size, cols, rows)
+    blocks = tiles.reshape(channels.shape[0], -1, *tuning.block.size)
+    embedded = embed_blocks(blocks, shuffle[index], bits[index], tuning, inverse[index])
+    tiles[...] = embedded.reshape(tiles.shape)
+
+
+def extract_rows(
+    channels: np.ndarray,
+    shuffle: np.ndarray | PermutationTable,
+    tuning: AlgorithmTuning,
+    cols: int,
+    out: np.ndarray,
+    rows: slice,
+) -> None:
+    """提取 (C, H, W) 係數中第 rows 列區塊的軟位元，寫入 (C, N) 的 out 對應欄位。"""
+    tiles, index = _row_tiles(channels, tuning.block.size, cols, rows)
+    out[:, index] = extract_channels(tiles.reshape(channels.shape[0], -1, *tuning.block.size), shuffle[index], tuning)
+
+
+def extract_slab_into(
+    blocks: np.ndarray, shuffle: np.ndarray | PermutationTable, tuning: AlgorithmTuning, out: np.ndarray, slab: slice
+) -> None:
+    """提取 (C, N, h, w) 張量中 slab 範圍的軟位元，寫入 (C, N) 的 out 對應欄位。"""
+    out[:, slab] = extract_channels(blocks[:, slab], shuffle[slab], tuning)
@@ -0,0 +1,114 @@
+"""只處理部分區塊的嵌入：局部補嵌與以水平條帶逐段嵌入超大圖片。"""
+
+from __future__ import annotations
+
+from contextlib import ExitStack
+from typing import Any, Iterator, Tuple
+
+import numpy as np
+
+from .blocks import BlockGeometry
+from .components import init_sequence
+from .kernels import embed_blocks
+from .permutation import PermutationStream
+from .tasks import CyclicBits, embed_rows_inplace
+from .transforms import clamp_to_uint8, convert_bgr_to_yuv, convert_yuv_to_bgr, pad_to_even
+from .wavelet import haar_analysis, haar_synthesis
+from ..config import AlgorithmTuning, WatermarkKeys
+from ..runtime import AutoPool
+
+
+def embed_region(
+    keys: WatermarkKeys, tuning: AlgorithmTuning, image: np.ndarray, wm_bits: np.ndarray, rect: Tuple[int, int, int, int]
+) -> np.ndarray:
+    """只重新嵌入像素矩形 (x, y, width, height) 所涵蓋的 LL 區塊。
+
+    用於已嵌入的圖片經局部編輯（疊加 logo、裁切邊框）後補嵌：每個區塊的位元只取決於
+    區塊編號（i % wm_size），因此只需對涵蓋區塊對應的 2h x 2w 像素範圍做色彩轉換、
+    Haar 分解、DCT/SVD 與重建，其餘像素原樣保留。區域通常很小，直接以批次核心處理。
+    """
+    height, width = image.shape[:2]
+    sequence = init_sequence(keys, ((height + 1) // 2, (width + 1) // 2), tuning.block.size)
+    geometry = sequence.geometry
+    if wm_bits.size >= geometry.block_num:
+        raise ValueError("watermark too large for host image")
+    rows, cols = geometry.covering(rect)
+    result = image.copy()
+    if rows.start >= rows.stop or cols.start >= cols.stop:
+        return result
+
+    bh, bw = tuning.block.size
+    top, left = rows.start * 2 * bh, cols.start * 2 * bw
+    region = image[top : rows.stop * 2 * bh, left : cols.stop * 2 * bw, :3]
+    # 僅在影像高寬為奇數時，最後一列/行區塊會延伸到 pad_to_even 補上的像素
+    yuv = pad_to_even(convert_bgr_to_yuv(region.astype(np.float32)))
+    yuv = yuv.astype(np.dtype(tuning.precision), copy=False)
+    ca = haar_analysis(yuv)
+    count_rows, count_cols = rows.stop - rows.start, cols.stop - cols.start
+    tiles = ca.reshape(3, count_rows, bh, count_cols, bw).swapaxes(2, 3)
+    index = geometry.indices(rows, cols)
+    block_bits = wm_bits[index % wm_bits.size].astype(np.int64)
+    embedded = embed_blocks(
+        tiles.reshape(3, index.size, bh, bw), sequence.shuffle[index], block_bits, tuning, sequence.inverse[index]
+    )
+    tiles[...] = embedded.reshape(tiles.shape)
+    restored = haar_synthesis(yuv, ca)[: region.shape[0], : region.shape[1]]
+    result[top : top + region.shape[0], left : left + region.shape[1], :3] = clamp_to_uint8(
+        convert_yuv_to_bgr(restored.astype(np.float32, copy=False))
+    )
+    return result
+
+
+def embed_tiled(
+    pool: AutoPool,
+    keys: WatermarkKeys,
+    tuning: AlgorithmTuning,
+    source: Any,
+    wm_bits: np.ndarray,
+    strip_rows: int = 512,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """以水平條帶逐段嵌入，依序產生 (起始列, 嵌入後的 uint8 條帶)。
+
+    `source` 可為任何支援列切片與 `.shape` 的 (H, W, C) 陣列（例如 np.memmap），
+    每次只讀入 `strip_rows` 列；條帶高度必須是 2 * 區塊高度（預設 8 像素）的倍數，
+    使條帶邊界與 LL 區塊邊界對齊。區塊編號與 shuffle 和整張嵌入相同，輸出可由一般流程提取；
+    shuffle 索引表逐段產生，不保留整張表。第 4 個以後的通道（alpha）原樣輸出。
+    """
+    bh, bw = tuning.block.size
+    if strip_rows <= 0 or strip_rows % (2 * bh):
+        raise ValueError(f"strip_rows must be a positive multiple of {2 * bh}")
+    height, width = source.shape[:2]
+    geometry = BlockGeometry.from_ca_shape(((height + 1) // 2, (width + 1) // 2), (bh, bw))
+    rows, cols = geometry.rows, geometry.cols
+    if wm_bits.size >= geometry.block_num:
+        raise ValueError("watermark too large for host image")
+    stream = PermutationStream(keys.image, bh * bw)
+    dtype = np.dtype(tuning.precision)
+    block_rows = strip_rows // (2 * bh)
+    for first in range(0, rows, block_rows):
+        top = first * 2 * bh
+        # 最後一段延伸到圖片底部，包含不足一個區塊的剩餘列
+        bottom = height if first + block_rows >= rows else top + strip_rows
+        strip = np.asarray(source[top:bottom])
+        count = min(block_rows, rows - first)
+        yuv = pad_to_even(convert_bgr_to_yuv(strip[:, :, :3].astype(np.float32))).astype(dtype, copy=False)
+        with ExitStack() as buffers:
+            # cA 與本段索引表都配置在 pool 的共享緩衝區，行程工作者直接讀寫
+            def allocate(shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+                return buffers.enter_context(pool.allocate(shape, dtype))
+
+            ca = allocate((3, yuv.shape[0] // 2, yuv.shape[1] // 2), dtype)
+            haar_analysis(yuv, out=ca)
+            if count > 0:
+                permutation = stream.take(count * cols, allocate)
+                bits = CyclicBits(wm_bits, first * cols)
+                shared = (ca, permutation.forward, permutation.inverse, bits, tuning, cols)
+                if pool.parallel:
+                    pool.map_slabs(embed_rows_inplace, count, shared)
+                else:
+                    embed_rows_inplace(*shared, slice(0, count))
+            haar_synthesis(yuv, ca)
+        bgr = clamp_to_uint8(convert_yuv_to_bgr(yuv[: strip.shape[0], : strip.shape[1]].astype(np.float32)))
+        if strip.shape[2] > 3:
+            bgr = np.dstack([bgr, strip[:, :, 3:]])
+        yield top, bgr
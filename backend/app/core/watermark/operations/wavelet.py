@@ -0,0 +1,43 @@
+"""直接在 (H, W, C) 平面上運算的單層 Haar 小波。"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+def _quadrants(planes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """回傳每個 2x2 區塊左上、右上、左下、右下像素的跨步視圖，形狀皆為 (H/2, W/2, C)。"""
+    h, w = planes.shape[:2]
+    if h % 2 or w % 2:
+        raise ValueError("haar transform requires even height and width")
+    return planes[0::2, 0::2], planes[0::2, 1::2], planes[1::2, 0::2], planes[1::2, 1::2]
+
+
+def haar_analysis(planes: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """一次計算所有通道的 LL 頻帶，回傳 (C, H/2, W/2)，與 pywt.dwt2(..., "haar") 的 cA 相同。
+
+    只產生 cA，不配置 cH/cV/cD；`out` 可傳入預先配置（例如共享記憶體）的緩衝區。
+    """
+    top_left, top_right, bottom_left, bottom_right = _quadrants(planes)
+    if out is None:
+        out = np.empty((planes.shape[2], *top_left.shape[:2]), dtype=planes.dtype)
+    target = out.transpose(1, 2, 0)
+    np.add(top_left, top_right, out=target)
+    target += bottom_left
+    target += bottom_right
+    target *= 0.5
+    return out
+
+
+def haar_synthesis(planes: np.ndarray, ca: np.ndarray) -> np.ndarray:
+    """以修改後的 LL 頻帶就地重建 (H, W, C) 平面，等同 pywt.idwt2((ca, 原細節頻帶), "haar")。
+
+    細節頻帶未被修改，因此每個 2x2 區塊只需加上 (新 cA - 原 cA) / 2；
+    原 cA 由 planes 本身求得，不需保留細節頻帶或原始 cA。
+    """
+    delta = haar_analysis(planes).transpose(1, 2, 0)
+    np.subtract(ca.transpose(1, 2, 0), delta, out=delta)
+    delta *= 0.5
+    for quadrant in _quadrants(planes):
+        quadrant += delta
+    return planes
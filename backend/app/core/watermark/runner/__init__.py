@@ -1,14 +1,50 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional, Sequence, Tuple
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
-from ..config import AlgorithmTuning, BlockConfig, RuntimeConfig, WatermarkConfig, WatermarkKeys
+from ..config import (
+    AlgorithmTuning,
+    BlockConfig,
+    Precision,
+    RuntimeConfig,
+    SingularValueMethod,
+    WatermarkConfig,
+    WatermarkKeys,
+)
+from ..runtime import AutoPool
 from .encoder import WatermarkEmbedder, WatermarkPayload
-from .extractor import WatermarkExtractor, WatermarkMode
+from .extractor import KeyScore, WatermarkExtractor, WatermarkMode
+from .image_io import is_mapped_path, open_image_output, read_image, write_image
+
+
+def _decode(item: str | np.ndarray) -> np.ndarray:
+    return read_image(item) if isinstance(item, str) else item
+
+
+def _decode_keyed(item: str | Tuple[Any, str | np.ndarray]) -> Tuple[Any, np.ndarray]:
+    if isinstance(item, str):
+        return item, read_image(item)
+    key, image = item
+    return key, _decode(image)
+
+
+def _prefetched(
+    io: ThreadPoolExecutor, images: Iterable[Any], depth: int, decode: Callable[[Any], Any] = _decode
+) -> Iterator[Any]:
+    """在背景執行緒預先解碼最多 depth 張圖片，依輸入順序產生。"""
+    pending: deque[Future] = deque()
+    for item in images:
+        pending.append(io.submit(decode, item))
+        if len(pending) > depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 
 @dataclass
@@ -17,6 +53,14 @@ class EmbedResult:
     watermark_length: int
 
 
+@dataclass
+class ProgressiveResult:
+    content: Any
+    blocks_used: int
+    block_num: int
+    converged: bool
+
+
 class WatermarkPipeline:
     """高階浮水印操作流程，提供與舊版 WaterMark 類似的介面。"""
 
@@ -31,18 +75,26 @@ class WatermarkPipeline:
         processes: Optional[int] = None,
         d1: float = 36.0,
         d2: float = 20.0,
+        sv_method: SingularValueMethod = "svd",
+        precision: Precision = "float32",
+        pool: Optional[AutoPool] = None,
+        cache_decomposition: bool = False,
     ) -> None:
         if config is None:
             config = WatermarkConfig(
                 keys=WatermarkKeys(image=password_img, watermark=password_wm),
-                tuning=AlgorithmTuning(d1=d1, d2=d2, block=BlockConfig(size=block_shape)),
-                runtime=RuntimeConfig(mode=mode, processes=processes),
+                tuning=AlgorithmTuning(
+                    d1=d1, d2=d2, block=BlockConfig(size=block_shape), sv_method=sv_method, precision=precision
+                ),
+                runtime=RuntimeConfig(mode=mode, processes=processes, cache_decomposition=cache_decomposition),
             )
         config.validate()
         self.config = config
-        self._embedder = WatermarkEmbedder(config)
-        self._extractor = WatermarkExtractor(config)
+        # 注入常駐 pool（例如 shared_pool 的實例）時，多個流程共用同一組工作者
+        self._embedder = WatermarkEmbedder(config, pool)
+        self._extractor = WatermarkExtractor(config, pool)
         self._cover_image: np.ndarray | None = None
+        self._planar = False
         self._payload_meta: WatermarkPayload | None = None
 
     @staticmethod
@@ -51,9 +103,18 @@ class WatermarkPipeline:
             return (shape,)
         return tuple(shape)
 
-    def read_img(self, filename: str | None = None, img: np.ndarray | None = None) -> np.ndarray:
-        image = self._embedder.load_cover_image(path=filename, image=img)
+    def read_img(
+        self,
+        filename: str | None = None,
+        img: np.ndarray | None = None,
+        *,
+        shape: Sequence[int] | None = None,
+        planar: bool = False,
+    ) -> np.ndarray:
+        """讀取載體圖；`.npy` 與原始 BGR 檔（`.raw`/`.bgr`，需提供 shape）以唯讀記憶體映射開啟。"""
+        image = self._embedder.load_cover_image(path=filename, image=img, shape=shape, planar=planar)
         self._cover_image = image
+        self._planar = planar
         return image
 
     def read_wm(self, wm_content, mode: WatermarkMode = "img") -> WatermarkPayload:
@@ -62,29 +123,115 @@ class WatermarkPipeline:
         return payload
 
     def embed(self, filename: Optional[str] = None, compression_ratio: Optional[int] = None) -> np.ndarray:
+        """嵌入並可選擇寫檔。
+
+        載體為記憶體映射時改以條帶逐段嵌入，不在記憶體中保留整張圖的浮點副本；
+        filename 為 `.npy`/`.raw`/`.bgr` 時條帶直接寫入映射檔並回傳該映射。
+        """
         if self._cover_image is None:
             raise RuntimeError("cover image not loaded")
         if self._payload_meta is None:
             raise RuntimeError("watermark not loaded")
-        embedded = self._embedder.embed()
+        if isinstance(self._cover_image, np.memmap):
+            out = None
+            if filename is not None and is_mapped_path(filename):
+                out = open_image_output(filename, self._cover_image.shape, planar=self._planar)
+            embedded = self.embed_tiled(self._cover_image, out=out)
+            if out is not None:
+                out.flush()
+                return out
+        else:
+            embedded = self._embedder.embed()
+        if filename is not None:
+            self._write_image(filename, embedded, compression_ratio)
+        return embedded
+
+    def embed_batch(
+        self,
+        images: Iterable[str | np.ndarray],
+        payload: Any = None,
+        *,
+        mode: WatermarkMode = "str",
+        filenames: Optional[Iterable[str]] = None,
+        compression_ratio: Optional[int] = None,
+        prefetch: int = 2,
+    ) -> Iterator[np.ndarray]:
+        """以同一份浮水印依序嵌入多張圖片（路徑或陣列），依輸入順序產生嵌入結果。
+
+        payload 只編碼與打亂一次（未提供時沿用 read_wm 載入的浮水印）；整批共用同一個 pool
+        與 shuffle 索引表。讀檔解碼與 filenames 的寫檔編碼在背景執行緒進行，與嵌入重疊，
+        最多預先讀入 prefetch 張。
+        """
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        if payload is not None:
+            self.read_wm(payload, mode=mode)
+        if self._payload_meta is None:
+            raise RuntimeError("watermark not loaded")
+        return self._embed_batch(images, filenames, compression_ratio, prefetch)
+
+    def _embed_batch(
+        self,
+        images: Iterable[str | np.ndarray],
+        filenames: Optional[Iterable[str]],
+        compression_ratio: Optional[int],
+        prefetch: int,
+    ) -> Iterator[np.ndarray]:
+        targets = None if filenames is None else iter(filenames)
+        with ThreadPoolExecutor(max_workers=prefetch + 1) as io:
+            decoded = _prefetched(io, images, prefetch)
+            writes: deque[Future] = deque()
+            for image in self._embedder.embed_batch(decoded):
+                if targets is not None:
+                    target = next(targets, None)
+                    if target is None:
+                        raise ValueError("fewer filenames than images")
+                    writes.append(io.submit(write_image, target, image, compression_ratio))
+                    while len(writes) > prefetch or (writes and writes[0].done()):
+                        writes.popleft().result()
+                yield image
+            for write in writes:
+                write.result()
+
+    def embed_region(
+        self,
+        img: np.ndarray,
+        rect: Tuple[int, int, int, int],
+        filename: Optional[str] = None,
+        compression_ratio: Optional[int] = None,
+    ) -> np.ndarray:
+        """在已嵌入的圖片上只補嵌像素矩形 rect = (x, y, width, height) 涵蓋的區塊。"""
+        if self._payload_meta is None:
+            raise RuntimeError("watermark not loaded")
+        embedded = self._embedder.embed_region(img, rect)
         if filename is not None:
             self._write_image(filename, embedded, compression_ratio)
         return embedded
 
+    def iter_embed_tiled(self, source: Any, strip_rows: int = 512) -> Iterator[Tuple[int, np.ndarray]]:
+        """以 strip_rows 列為單位逐段嵌入 source（可為 np.memmap 等），依序產生 (起始列, 條帶)。"""
+        if self._payload_meta is None:
+            raise RuntimeError("watermark not loaded")
+        return self._embedder.embed_tiled(source, strip_rows)
+
+    def embed_tiled(self, source: Any, out: Any = None, strip_rows: int = 512) -> Any:
+        """逐段嵌入 source 並把條帶寫入 out（例如 np.lib.format.open_memmap 建立的檔案），回傳 out。
+
+        整張圖不會同時以浮點數形式存在記憶體中；未提供 out 時配置一般的 uint8 陣列。
+        """
+        if out is None:
+            out = np.empty(source.shape, dtype=np.uint8)
+        for top, strip in self.iter_embed_tiled(source, strip_rows):
+            out[top : top + strip.shape[0]] = strip
+        return out
+
     @property
     def payload_bits(self) -> np.ndarray | None:
         payload = self._embedder.payload
         return None if payload is None else payload.bits
 
     def _write_image(self, filename: str, image: np.ndarray, compression_ratio: Optional[int]) -> None:
-        if compression_ratio is None:
-            cv2.imwrite(filename, image)
-        elif filename.lower().endswith(".jpg"):
-            cv2.imwrite(filename, image, params=[cv2.IMWRITE_JPEG_QUALITY, int(compression_ratio)])
-        elif filename.lower().endswith(".png"):
-            cv2.imwrite(filename, image, params=[cv2.IMWRITE_PNG_COMPRESSION, int(compression_ratio)])
-        else:
-            cv2.imwrite(filename, image)
+        write_image(filename, image, compression_ratio, planar=self._planar)
 
     def extract(
         self,
@@ -96,12 +243,7 @@ class WatermarkPipeline:
     ):
         if wm_shape is None:
             raise ValueError("wm_shape is required for extraction")
-        if embed_img is None:
-            if filename is None:
-                raise ValueError("either filename or embed_img must be provided")
-            embed_img = cv2.imread(filename, cv2.IMREAD_UNCHANGED)
-            if embed_img is None:
-                raise FileNotFoundError(f"image file '{filename}' not found")
+        embed_img = self._load_embedded(filename, embed_img)
         shape = self._normalize_shape(wm_shape)
         result = self._extractor.extract(image=embed_img, watermark_length=shape, mode=mode)
         decoded = self._extractor.decode(result.payload, length=shape, mode=mode)
@@ -111,6 +253,95 @@ class WatermarkPipeline:
             return decoded
         return decoded
 
+    def extract_progressive(
+        self,
+        filename: Optional[str] = None,
+        embed_img: Optional[np.ndarray] = None,
+        wm_shape: Sequence[int] | int | None = None,
+        mode: WatermarkMode = "str",
+        confidence: float = 3.0,
+        min_cycles: int = 1,
+    ) -> ProgressiveResult:
+        """漸進式提取：所有位元的判定穩定超過 confidence 個標準誤即停止，並回報使用的區塊數。"""
+        if wm_shape is None:
+            raise ValueError("wm_shape is required for extraction")
+        embed_img = self._load_embedded(filename, embed_img)
+        shape = self._normalize_shape(wm_shape)
+        result = self._extractor.extract_progressive(
+            image=embed_img, watermark_length=shape, mode=mode, confidence=confidence, min_cycles=min_cycles
+        )
+        return ProgressiveResult(
+            content=self._extractor.decode(result.payload, length=shape, mode=mode),
+            blocks_used=int(result.blocks_used),
+            block_num=int(result.block_num),
+            converged=result.converged,
+        )
+
+    def extract_batch(
+        self,
+        items: Iterable[str | Tuple[Any, str | np.ndarray]],
+        wm_shape: Sequence[int] | int,
+        mode: WatermarkMode = "str",
+        *,
+        bucket_size: int = 8,
+        prefetch: int = 2,
+    ) -> Iterator[Tuple[Any, Any, float]]:
+        """批次提取多張圖片，依完成順序產生 (id, 解碼內容, confidence)。
+
+        items 為 (id, 路徑或陣列)，或直接以路徑作為 id。圖片依區塊幾何分組，
+        每組滿 bucket_size 張即以共用的 shuffle 索引表一次提取；讀檔解碼在背景執行緒預先進行。
+        confidence 為最不確定的位元離判定門檻的標準誤倍數，可用於篩選需要人工覆核的圖片。
+        """
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        shape = self._normalize_shape(wm_shape)
+        return self._extract_batch(items, shape, mode, bucket_size, prefetch)
+
+    def _extract_batch(
+        self,
+        items: Iterable[str | Tuple[Any, str | np.ndarray]],
+        shape: Tuple[int, ...],
+        mode: WatermarkMode,
+        bucket_size: int,
+        prefetch: int,
+    ) -> Iterator[Tuple[Any, Any, float]]:
+        with ThreadPoolExecutor(max_workers=prefetch) as io:
+            decoded = _prefetched(io, items, prefetch, _decode_keyed)
+            yield from self._extractor.extract_batch(
+                decoded, watermark_length=shape, mode=mode, bucket_size=bucket_size
+            )
+
+    def score_keys(
+        self,
+        candidates: Iterable[Tuple[int, int]],
+        filename: Optional[str] = None,
+        embed_img: Optional[np.ndarray] = None,
+        wm_shape: Sequence[int] | int | None = None,
+        mode: WatermarkMode = "str",
+        max_cycles: Optional[int] = None,
+    ) -> list[KeyScore]:
+        """以多組候選 (password_img, password_wm) 提取同一張圖，回傳每組的解碼內容與 confidence。
+
+        圖片的 YUV、DWT 與區塊 DCT 只計算一次；相同 password_img 的候選共用同一次提取，
+        只有 payload 的還原順序不同。正確的 password_img 的 confidence 明顯高於其他候選。
+        每組金鑰的主要成本是 SVD，候選很多時可以 max_cycles 只取部分循環先行篩選。
+        """
+        if wm_shape is None:
+            raise ValueError("wm_shape is required for extraction")
+        embed_img = self._load_embedded(filename, embed_img)
+        shape = self._normalize_shape(wm_shape)
+        return self._extractor.score_keys(
+            image=embed_img, candidates=candidates, watermark_length=shape, mode=mode, max_cycles=max_cycles
+        )
+
+    @staticmethod
+    def _load_embedded(filename: Optional[str], embed_img: Optional[np.ndarray]) -> np.ndarray:
+        if embed_img is None:
+            if filename is None:
+                raise ValueError("either filename or embed_img must be provided")
+            embed_img = read_image(filename)
+        return embed_img
+
     def extract_decrypt(self, wm_avg: np.ndarray) -> np.ndarray:
         length = wm_avg.size
         indices = np.arange(length)
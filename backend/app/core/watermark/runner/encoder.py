@@ -1,13 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal, Optional, Tuple
+from typing import Any, Iterable, Iterator, Literal, Optional, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 from ..config import WatermarkConfig
 from ..operations.algorithm import WatermarkAlgorithm
+from ..runtime import AutoPool
+from .image_io import read_image
 
 WatermarkMode = Literal["img", "str", "bit"]
 
@@ -25,7 +27,7 @@ class WatermarkPayload:
 class WatermarkEmbedder:
     """管理載體圖與浮水印資料的載入與嵌入流程。"""
 
-    def __init__(self, config: WatermarkConfig) -> None:
+    def __init__(self, config: WatermarkConfig, pool: AutoPool | None = None) -> None:
         config.validate()
         self.config = config
         self._algorithm = WatermarkAlgorithm(
@@ -33,22 +35,28 @@ class WatermarkEmbedder:
             keys=config.keys,
             mode=config.runtime.mode,
             processes=config.runtime.processes,
+            pool=pool,
+            cache_decomposition=config.runtime.cache_decomposition,
         )
         self._cover: Optional[np.ndarray] = None
         self._payload: Optional[WatermarkPayload] = None
 
     @staticmethod
-    def _read_image(path: str) -> np.ndarray:
-        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
-        if image is None:
-            raise FileNotFoundError(f"image file '{path}' not found")
-        return image
-
-    def load_cover_image(self, *, path: Optional[str] = None, image: Optional[np.ndarray] = None) -> np.ndarray:
+    def _read_image(path: str, shape: Optional[Sequence[int]] = None, planar: bool = False) -> np.ndarray:
+        return read_image(path, shape=shape, planar=planar)
+
+    def load_cover_image(
+        self,
+        *,
+        path: Optional[str] = None,
+        image: Optional[np.ndarray] = None,
+        shape: Optional[Sequence[int]] = None,
+        planar: bool = False,
+    ) -> np.ndarray:
         if image is None:
             if path is None:
                 raise ValueError("either path or image must be provided")
-            image = self._read_image(path)
+            image = self._read_image(path, shape, planar)
         self._cover = image
         return image
 
@@ -66,6 +74,24 @@ class WatermarkEmbedder:
             raise RuntimeError("watermark not loaded")
         return self._algorithm.embed(self._cover, self._payload.bits)
 
+    def embed_batch(self, images: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """以已載入的浮水印依序嵌入多張圖片，浮水印位元只打亂一次。"""
+        if self._payload is None:
+            raise RuntimeError("watermark not loaded")
+        return self._algorithm.embed_batch(images, self._payload.bits)
+
+    def embed_region(self, image: np.ndarray, rect: Tuple[int, int, int, int]) -> np.ndarray:
+        """對已嵌入且局部修改過的圖片，只補嵌 rect 涵蓋的區塊。"""
+        if self._payload is None:
+            raise RuntimeError("watermark not loaded")
+        return self._algorithm.embed_region(image, self._payload.bits, rect)
+
+    def embed_tiled(self, source: Any, strip_rows: int = 512) -> Iterator[Tuple[int, np.ndarray]]:
+        """逐條帶嵌入 source，依序產生 (起始列, uint8 條帶)。"""
+        if self._payload is None:
+            raise RuntimeError("watermark not loaded")
+        return self._algorithm.embed_tiled(source, self._payload.bits, strip_rows)
+
     @staticmethod
     def encode_text(content: str) -> WatermarkPayload:
         byte_string = content.encode("utf-8")
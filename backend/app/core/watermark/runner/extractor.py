@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal, Optional, Tuple
+from typing import Any, Iterable, Iterator, Literal, Optional, Sequence, Tuple
 
-import cv2
 import numpy as np
 
 from ..config import WatermarkConfig
 from ..operations.algorithm import WatermarkAlgorithm
+from ..runtime import AutoPool
+from .image_io import read_image
 
 WatermarkMode = Literal["img", "str", "bit"]
 
@@ -16,10 +17,23 @@ WatermarkMode = Literal["img", "str", "bit"]
 class ExtractionResult:
     payload: np.ndarray
     mode: WatermarkMode
+    # 漸進式提取時記錄實際使用的區塊數與是否提前收斂
+    blocks_used: int | None = None
+    block_num: int | None = None
+    converged: bool = True
+
+
+@dataclass
+class KeyScore:
+    password_img: int
+    password_wm: int
+    content: Any
+    # 最不確定位元離判定門檻的標準誤倍數；只取決於 password_img
+    confidence: float
 
 
 class WatermarkExtractor:
-    def __init__(self, config: WatermarkConfig) -> None:
+    def __init__(self, config: WatermarkConfig, pool: AutoPool | None = None) -> None:
         config.validate()
         self.config = config
         self._algorithm = WatermarkAlgorithm(
@@ -27,13 +41,19 @@ class WatermarkExtractor:
             keys=config.keys,
             mode=config.runtime.mode,
             processes=config.runtime.processes,
+            pool=pool,
+            cache_decomposition=config.runtime.cache_decomposition,
         )
 
     @staticmethod
-    def _read_image(path: str) -> np.ndarray:
-        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    def _read_image(path: str, shape: Optional[Sequence[int]] = None, planar: bool = False) -> np.ndarray:
+        return read_image(path, shape=shape, planar=planar)
+
+    def _load(self, path: Optional[str], image: Optional[np.ndarray]) -> np.ndarray:
         if image is None:
-            raise FileNotFoundError(f"image file '{path}' not found")
+            if path is None:
+                raise ValueError("either path or image must be provided")
+            image = self._read_image(path)
         return image
 
     def extract(
@@ -44,26 +64,88 @@ class WatermarkExtractor:
         watermark_length: Tuple[int, ...],
         mode: WatermarkMode,
     ) -> ExtractionResult:
-        if image is None:
-            if path is None:
-                raise ValueError("either path or image must be provided")
-            image = self._read_image(path)
-
+        image = self._load(path, image)
         wm_size = int(np.prod(watermark_length))
         use_kmeans = mode in {"str", "bit"}
         payload = self._algorithm.extract(image, wm_size, use_kmeans=use_kmeans)
         return ExtractionResult(payload=payload, mode=mode)
 
-    def decrypt(self, payload: np.ndarray, *, original_length: int) -> np.ndarray:
+    def extract_progressive(
+        self,
+        *,
+        path: Optional[str] = None,
+        image: Optional[np.ndarray] = None,
+        watermark_length: Tuple[int, ...],
+        mode: WatermarkMode,
+        confidence: float = 3.0,
+        min_cycles: int = 1,
+    ) -> ExtractionResult:
+        """逐段提取並在所有位元判定穩定後提前結束，結果附帶使用的區塊數。"""
+        image = self._load(path, image)
+        wm_size = int(np.prod(watermark_length))
+        result = self._algorithm.extract_progressive(
+            image, wm_size, use_kmeans=mode in {"str", "bit"}, confidence=confidence, min_cycles=min_cycles
+        )
+        return ExtractionResult(
+            payload=result.payload,
+            mode=mode,
+            blocks_used=result.blocks_used,
+            block_num=result.block_num,
+            converged=result.converged,
+        )
+
+    def extract_batch(
+        self,
+        items: Iterable[Tuple[Any, np.ndarray]],
+        *,
+        watermark_length: Tuple[int, ...],
+        mode: WatermarkMode,
+        bucket_size: int = 8,
+    ) -> Iterator[Tuple[Any, Any, float]]:
+        """批次提取並解碼 (id, 圖片)，依完成順序產生 (id, 解碼內容, confidence)。"""
+        wm_size = int(np.prod(watermark_length))
+        results = self._algorithm.extract_batch(
+            items, wm_size, use_kmeans=mode in {"str", "bit"}, bucket_size=bucket_size
+        )
+        for key, payload, confidence in results:
+            yield key, self.decode(payload, length=watermark_length, mode=mode), confidence
+
+    def score_keys(
+        self,
+        *,
+        path: Optional[str] = None,
+        image: Optional[np.ndarray] = None,
+        candidates: Iterable[Tuple[int, int]],
+        watermark_length: Tuple[int, ...],
+        mode: WatermarkMode,
+        max_cycles: Optional[int] = None,
+    ) -> list[KeyScore]:
+        """以多組 (password_img, password_wm) 提取同一張圖，依 candidates 順序回傳每組的內容與分數。"""
+        image = self._load(path, image)
+        candidates = [(int(image_key), int(wm_key)) for image_key, wm_key in candidates]
+        wm_size = int(np.prod(watermark_length))
+        payloads = self._algorithm.score_keys(
+            image, wm_size, (image_key for image_key, _ in candidates),
+            use_kmeans=mode in {"str", "bit"},
+            max_cycles=max_cycles,
+        )
+        scores = []
+        for image_key, wm_key in candidates:
+            payload, confidence = payloads[image_key]
+            content = self.decode(payload, length=watermark_length, mode=mode, key=wm_key)
+            scores.append(KeyScore(password_img=image_key, password_wm=wm_key, content=content, confidence=confidence))
+        return scores
+
+    def decrypt(self, payload: np.ndarray, *, original_length: int, key: Optional[int] = None) -> np.ndarray:
         indices = np.arange(original_length)
-        np.random.RandomState(self.config.keys.watermark).shuffle(indices)
+        np.random.RandomState(self.config.keys.watermark if key is None else key).shuffle(indices)
         restored = np.empty_like(payload)
         restored[indices] = payload.copy()
         return restored
 
-    def decode(self, payload: np.ndarray, *, length: Tuple[int, ...], mode: WatermarkMode):
+    def decode(self, payload: np.ndarray, *, length: Tuple[int, ...], mode: WatermarkMode, key: Optional[int] = None):
         total_length = int(np.prod(length))
-        data = self.decrypt(payload, original_length=total_length)
+        data = self.decrypt(payload, original_length=total_length, key=key)
         if mode == "img":
             image = (data.reshape(length) >= 0.5).astype(np.uint8) * 255
             return image
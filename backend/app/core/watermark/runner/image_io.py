@@ -0,0 +1,85 @@
+"""圖片讀寫：一般影像檔交給 OpenCV，`.npy` 與原始 BGR 檔以記憶體映射開啟。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+RAW_SUFFIXES = frozenset({".raw", ".bgr"})
+MAPPED_SUFFIXES = RAW_SUFFIXES | {".npy"}
+
+
+def is_mapped_path(path: str) -> bool:
+    """路徑是否為以記憶體映射讀寫的格式（`.npy`、`.raw`、`.bgr`）。"""
+    return Path(path).suffix.lower() in MAPPED_SUFFIXES
+
+
+def _raw_shape(shape: Optional[Sequence[int]], planar: bool) -> tuple[int, ...]:
+    if shape is None:
+        raise ValueError("shape is required for raw image files")
+    height, width, *rest = (int(v) for v in shape)
+    channels = rest[0] if rest else 3
+    if channels not in (3, 4):
+        raise ValueError("raw images must have 3 (BGR) or 4 (BGRA) channels")
+    return (channels, height, width) if planar else (height, width, channels)
+
+
+def _as_interleaved(array: np.ndarray, planar: bool) -> np.ndarray:
+    # planar 檔案依 (C, H, W) 存放，轉置成 (H, W, C) 視圖，不複製資料
+    return array.transpose(1, 2, 0) if planar else array
+
+
+def read_image(path: str, *, shape: Optional[Sequence[int]] = None, planar: bool = False) -> np.ndarray:
+    """讀取圖片；`.npy` 與原始檔回傳唯讀的 np.memmap（或其視圖），由作業系統按需分頁載入。
+
+    原始檔沒有檔頭，需提供 `shape = (H, W)` 或 `(H, W, C)`（C 為 3 或 4）；`planar=True` 表示檔案依通道分平面存放。
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix in MAPPED_SUFFIXES and not Path(path).is_file():
+        raise FileNotFoundError(f"image file '{path}' not found")
+    if suffix == ".npy":
+        image = np.load(path, mmap_mode="r")
+        # 浮水印流程以 BGR 三通道運算，灰階陣列需先轉成 (H, W, 3)
+        if image.dtype != np.uint8 or image.ndim != 3 or image.shape[2] not in (3, 4):
+            raise ValueError("npy images must be uint8 arrays of shape (H, W, 3) or (H, W, 4); convert grayscale to BGR first")
+        return image
+    if suffix in RAW_SUFFIXES:
+        return _as_interleaved(np.memmap(path, dtype=np.uint8, mode="r", shape=_raw_shape(shape, planar)), planar)
+    image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise FileNotFoundError(f"image file '{path}' not found")
+    return image
+
+
+def open_image_output(path: str, shape: Sequence[int], *, planar: bool = False) -> np.ndarray:
+    """建立可寫入的 (H, W, C) uint8 記憶體映射輸出，寫入的列會直接落到檔案。"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".npy":
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=tuple(shape))
+    if suffix in RAW_SUFFIXES:
+        # np.memmap 的 w+ 不會截斷較大的舊檔，先清空以免殘留尾端資料
+        Path(path).write_bytes(b"")
+        return _as_interleaved(np.memmap(path, dtype=np.uint8, mode="w+", shape=_raw_shape(shape, planar)), planar)
+    raise ValueError(f"'{path}' is not a memory-mapped image format")
+
+
+def write_image(path: str, image: np.ndarray, compression_ratio: Optional[int] = None, *, planar: bool = False) -> None:
+    """保存圖片；記憶體映射格式逐列寫入檔案，其餘交給 cv2.imwrite。"""
+    if is_mapped_path(path):
+        output = open_image_output(path, image.shape, planar=planar)
+        output[...] = image
+        output.flush()
+        return
+    lower = path.lower()
+    if compression_ratio is None:
+        cv2.imwrite(path, image)
+    elif lower.endswith(".jpg"):
+        cv2.imwrite(path, image, params=[cv2.IMWRITE_JPEG_QUALITY, int(compression_ratio)])
+    elif lower.endswith(".png"):
+        cv2.imwrite(path, image, params=[cv2.IMWRITE_PNG_COMPRESSION, int(compression_ratio)])
+    else:
+        cv2.imwrite(path, image)
+
@@ -1,5 +1,6 @@
 """執行環境相關的工具。"""
 
-from .pool import AutoPool
+from .memo import BlockMemo, block_memo
+from .pool import AutoPool, shared_pool, shutdown_pools
 
-__all__ = ["AutoPool"]
+__all__ = ["AutoPool", "BlockMemo", "block_memo", "shared_pool", "shutdown_pools"]
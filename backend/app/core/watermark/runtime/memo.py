@@ -0,0 +1,78 @@
+"""cached 模式的區塊轉換記憶表：同一行程內跨呼叫重複使用區塊的 SVD 結果。"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 65536
+
+
+class BlockMemo:
+    """以 (命名空間, 區塊位元組) 為鍵的記憶表，並統計區塊層級的命中率。
+
+    呼叫端先在單張圖內去除重複區塊，再把不重複的列交給 ``resolve``；
+    表中已有的列直接取用，其餘才交給 compute 計算。超過 ``max_entries`` 時依加入順序淘汰；
+    單次呼叫的不重複列多於 ``max_entries`` 時（紋理豐富的圖片）不查表，只保留圖內去重。
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Hashable, bytes], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        """未經計算即取得結果的區塊比例（圖內重複與跨呼叫命中皆計入）。"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def resolve(
+        self,
+        namespace: Hashable,
+        rows: np.ndarray,
+        compute: Callable[[np.ndarray], np.ndarray],
+        total: int,
+    ) -> np.ndarray:
+        """回傳 (U, ...) 結果，第 i 列對應不重複的 rows[i]；total 為去重前的區塊數。"""
+        if rows.shape[0] > self.max_entries:
+            self._count(total, rows.shape[0])
+            return compute(rows)
+        keys = [(namespace, row.tobytes()) for row in rows]
+        with self._lock:
+            found = [self._entries.get(key) for key in keys]
+        missing = [index for index, value in enumerate(found) if value is None]
+        if missing:
+            computed = compute(rows[missing])
+            with self._lock:
+                for index, value in zip(missing, computed):
+                    found[index] = self._entries[keys[index]] = value.copy()
+                while len(self._entries) > self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+        self._count(total, len(missing))
+        return np.array(found)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _count(self, total: int, computed: int) -> None:
+        with self._lock:
+            self.hits += total - computed
+            self.misses += computed
+
+
+_default_memo = BlockMemo()
+
+
+def block_memo() -> BlockMemo:
+    """回傳行程共用的記憶表，可用來調整上限或查看命中率。"""
+    return _default_memo
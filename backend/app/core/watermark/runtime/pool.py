@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from contextlib import AbstractContextManager
-from typing import Callable, Iterable, Optional, Sequence, TypeVar
-
+import atexit
 import multiprocessing
+import os
 import sys
+import threading
 import warnings
+from contextlib import AbstractContextManager, contextmanager
+from multiprocessing import resource_tracker
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+from .memo import BlockMemo, block_memo
+from .shared import SharedArray
+from .slabs import item_bytes, plan_slabs, run_slab
 
 T = TypeVar("T")
 R = TypeVar("R")
@@ -22,40 +31,178 @@ class _CommonPool:
         return None
 
 
+def _process_context() -> Any:
+    """行程池的啟動方式：forkserver，不支援時改用 spawn。
+
+    服務會在已有事件迴圈與工作執行緒的行程中延遲啟動 pool（或 close 後重啟），
+    此時 fork 可能複製其他執行緒持有中的鎖而使工作者死結。共享陣列本來就以名稱映射，
+    工作者不依賴 fork 繼承的記憶體，因此改由乾淨的 forkserver 行程分出。
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # forkserver 先匯入 slab 任務（連同 numpy/cv2），分出的工作者不必各自重新匯入
+    context.set_forkserver_preload([f"{__package__.rpartition('.')[0]}.operations.tasks"])
+    return context
+
+
+def _warm_up_task(_: int) -> None:
+    # 預先載入工作者會用到的模組，避免第一張圖片承擔匯入成本
+    from ..operations import tasks  # noqa: F401
+
+
 class AutoPool(AbstractContextManager["AutoPool"]):
-    """根據執行設定自動選擇平行化策略。"""
+    """根據執行設定自動選擇平行化策略。
+
+    工作者在第一次使用或呼叫 ``warm_up`` 時才啟動，之後可跨多次嵌入/提取重複使用；
+    以 ``with`` 區塊使用時離開即關閉，長期共用的實例請透過 ``shared_pool`` 取得。
+    """
 
     def __init__(self, mode: str, processes: Optional[int]) -> None:
         if mode == "multiprocessing" and sys.platform == "win32":
             warnings.warn("multiprocessing not supported on Windows; fallback to multithreading")
             mode = "multithreading"
 
-        if mode == "multithreading":
-            from multiprocessing.dummy import Pool as ThreadPool
-
-            self._pool = ThreadPool(processes=processes)
-            self._closer = self._pool.close
-            self._joiner = self._pool.join
-        elif mode == "multiprocessing":
-            ctx = multiprocessing.get_context("fork") if sys.platform != "win32" else multiprocessing.get_context()
-            self._pool = ctx.Pool(processes=processes)
-            self._closer = self._pool.close
-            self._joiner = self._pool.join
-        elif mode in {"vectorization", "cached"}:
-            warnings.warn(f"mode '{mode}' currently behaves the same as 'common'")
-            self._pool = _CommonPool()
-            self._closer = self._pool.close
-            self._joiner = self._pool.join
-        else:
-            self._pool = _CommonPool()
-            self._closer = self._pool.close
-            self._joiner = self._pool.join
+        self.mode = mode
+        self.processes = processes
+        self._pool: Any = None
+        self._lock = threading.Lock()
+        # allocate 配置且仍在使用中的共享緩衝區，以陣列 id 對應
+        self._buffers: Dict[int, SharedArray] = {}
+
+    @property
+    def vectorized(self) -> bool:
+        """是否改以批次核心一次處理整個通道，而非逐區塊 map。"""
+        return self.mode == "vectorization"
+
+    @property
+    def cached(self) -> bool:
+        """是否去除重複區塊並跨呼叫記憶區塊的 DCT/SVD 結果（單一行程內執行）。"""
+        return self.mode == "cached"
+
+    @property
+    def memo(self) -> BlockMemo:
+        """cached 模式使用的行程共用記憶表，``memo.hit_rate`` 為區塊層級命中率。"""
+        return block_memo()
+
+    @property
+    def parallel(self) -> bool:
+        """是否由多個工作者以 slab 為單位分攤區塊。"""
+        return self.mode in ("multithreading", "multiprocessing")
+
+    @property
+    def workers(self) -> int:
+        if not self.parallel:
+            return 1
+        return self.processes or os.cpu_count() or 1
+
+    @property
+    def started(self) -> bool:
+        return self._pool is not None
+
+    def start(self) -> "AutoPool":
+        """啟動工作者；已啟動時不做任何事。"""
+        with self._lock:
+            if self._pool is None:
+                if self.mode == "multithreading":
+                    from multiprocessing.dummy import Pool as ThreadPool
+
+                    self._pool = ThreadPool(processes=self.processes)
+                elif self.mode == "multiprocessing":
+                    # 先啟動 resource tracker 讓工作者與父行程共用，共享記憶體只由父行程 unlink 一次
+                    resource_tracker.ensure_running()
+                    self._pool = _process_context().Pool(processes=self.processes)
+                else:
+                    self._pool = _CommonPool()
+        return self
+
+    def warm_up(self) -> "AutoPool":
+        """啟動工作者並讓每個工作者執行一次空任務，把啟動成本移出請求路徑。"""
+        self.start()
+        if self.parallel:
+            self._pool.map(_warm_up_task, range(self.workers), chunksize=1)
+        return self
+
+    @contextmanager
+    def allocate(self, shape: Tuple[int, ...], dtype: Any) -> Iterator[np.ndarray]:
+        """配置單次呼叫使用的工作陣列，離開區塊時釋放。
+
+        multiprocessing 模式下陣列位於共享記憶體，交給 map_slabs 時只傳遞名稱，
+        工作者可直接就地寫回；其他模式回傳一般陣列。
+        """
+        if self.mode != "multiprocessing":
+            yield np.empty(shape, dtype=dtype)
+            return
+        buffer = SharedArray(shape, dtype)
+        key = id(buffer.array)
+        self._buffers[key] = buffer
+        try:
+            yield buffer.array
+        finally:
+            del self._buffers[key]
+            buffer.release()
+
+    def _share(self, shared: Tuple[Any, ...]) -> Tuple[Any, ...]:
+        refs = []
+        for item in shared:
+            if isinstance(item, np.ndarray):
+                buffer = self._buffers.get(id(item))
+                if buffer is None:
+                    raise ValueError("arrays passed to map_slabs must be allocated with AutoPool.allocate")
+                item = buffer.ref
+            refs.append(item)
+        return tuple(refs)
 
     def map(self, func: Callable[[T], R], args: Iterable[T]) -> Sequence[R]:
-        return self._pool.map(func, args)
+        return self.start()._pool.map(func, args)
+
+    def map_slabs(self, func: Callable[..., R], total: int, shared: Tuple[Any, ...]) -> List[R]:
+        """將 [0, total) 切成連續 slab，以 func(*shared, slab) 處理每一段。
+
+        只有 slab 範圍會被傳給工作者：執行緒直接共用 shared 的參照，行程則只收到共享記憶體的名稱。
+        shared 中的陣列（輸入與輸出）須以 ``allocate`` 配置，工作者直接讀寫，不會逐次複製或回傳；
+        其餘參數（設定、依 slab 取值的索引表描述）隨任務 pickle，應保持輕量。
+        """
+        slabs = plan_slabs(total, self.workers, item_bytes(shared, total))
+        pool = self.start()._pool
+        if self.mode != "multiprocessing":
+            return pool.map(lambda slab: func(*shared, slab), slabs)
+        refs = self._share(shared)
+        return pool.map(run_slab, [(func, refs, slab) for slab in slabs])
+
+    def close(self) -> None:
+        """關閉工作者；之後再次使用時會重新啟動。"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     def __exit__(self, exc_type, exc, tb):  # type: ignore[override]
-        self._closer()
-        self._joiner()
+        self.close()
         return False
 
+
+_registry: Dict[Tuple[str, Optional[int]], AutoPool] = {}
+_registry_lock = threading.Lock()
+
+
+def shared_pool(mode: str, processes: Optional[int] = None) -> AutoPool:
+    """取得跨 WatermarkPipeline 共用的常駐 pool，相同設定回傳同一個實例。"""
+    with _registry_lock:
+        pool = _registry.get((mode, processes))
+        if pool is None:
+            pool = _registry[(mode, processes)] = AutoPool(mode, processes)
+        return pool
+
+
+def shutdown_pools() -> None:
+    """關閉所有由 shared_pool 建立的常駐 pool。"""
+    with _registry_lock:
+        pools = list(_registry.values())
+        _registry.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown_pools)
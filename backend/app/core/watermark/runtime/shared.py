@@ -0,0 +1,60 @@
+"""以 multiprocessing.shared_memory 在父行程與常駐工作者之間共用陣列。"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, List, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SharedRef:
+    """可被 pickle 的共享陣列描述，工作者據此重新映射同一塊記憶體。"""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class SharedArray:
+    """持有一塊共享記憶體與其上的 ndarray 視圖。
+
+    工作者依 ``ref`` 映射同一塊記憶體並就地寫入，父行程立即可見，
+    不需要回傳或重新組裝結果。
+    """
+
+    def __init__(self, shape: Tuple[int, ...], dtype: np.dtype | type) -> None:
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self._memory: shared_memory.SharedMemory | None = shared_memory.SharedMemory(create=True, size=size)
+        self.array: np.ndarray | None = np.ndarray(shape, dtype=dtype, buffer=self._memory.buf)
+        self.ref = SharedRef(self._memory.name, tuple(shape), dtype.str)
+
+    @classmethod
+    def copy_of(cls, array: np.ndarray) -> "SharedArray":
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    def release(self) -> None:
+        """移除共享記憶體名稱；仍被視圖引用的映射會在視圖釋放後回收。"""
+        if self._memory is None:
+            return
+        self.array = None
+        try:
+            self._memory.close()
+        except BufferError:
+            pass
+        self._memory.unlink()
+        self._memory = None
+
+
+def attach(item: Any, memories: List[shared_memory.SharedMemory]) -> Any:
+    """工作者端：將 SharedRef 映射回 ndarray，其餘參數原樣回傳。"""
+    if not isinstance(item, SharedRef):
+        return item
+    memory = shared_memory.SharedMemory(name=item.name)
+    memories.append(memory)
+    return np.ndarray(item.shape, dtype=np.dtype(item.dtype), buffer=memory.buf)
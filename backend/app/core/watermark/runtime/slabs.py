@@ -0,0 +1,58 @@
+"""將區塊範圍切成連續 slab 的排程工具。"""
+
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, List, Sequence, Tuple
+
+from .shared import attach
+
+DEFAULT_CACHE_BYTES = 1 << 20
+
+
+@lru_cache(maxsize=1)
+def cache_bytes() -> int:
+    """回傳每核心 L2 快取大小，無法偵測時使用 1 MiB。"""
+    try:
+        size = os.sysconf("SC_LEVEL2_CACHE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        size = 0
+    return size if size > 0 else DEFAULT_CACHE_BYTES
+
+
+def item_bytes(shared: Sequence[Any], total: int) -> int:
+    """估算每個區塊在共享陣列中佔用的位元組數。"""
+    nbytes = sum(getattr(item, "nbytes", 0) for item in shared)
+    return max(1, nbytes // max(total, 1))
+
+
+def plan_slabs(total: int, workers: int, per_item: int, cache: int | None = None) -> List[slice]:
+    """將 [0, total) 切成連續 slab。
+
+    每個 slab 不超過一份 L2 快取能容納的區塊數，且至少切成 workers 份以平衡負載。
+    """
+    if total <= 0:
+        return []
+    per_cache = max(1, (cache or cache_bytes()) // max(per_item, 1))
+    per_worker = -(-total // max(workers, 1))
+    size = max(1, min(per_cache, per_worker))
+    return [slice(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def run_slab(task: Tuple[Callable[..., Any], Tuple[Any, ...], slice]) -> Any:
+    """工作者入口：映射共享陣列後以 slab 範圍呼叫任務函式，結束時解除映射。"""
+    func, refs, slab = task
+    memories: List[SharedMemory] = []
+    shared = tuple(attach(item, memories) for item in refs)
+    try:
+        return func(*shared, slab)
+    finally:
+        del shared
+        for memory in memories:
+            try:
+                memory.close()
+            except BufferError:
+                # 任務拋出例外時 traceback 仍持有視圖；保留原本的例外，映射於視圖釋放後回收
+                pass
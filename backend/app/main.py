@@ -1,15 +1,31 @@
 """
 Blind Watermark Backend API 主程式入口
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api import watermark
+from app.api import jobs, watermark
+from app.core.watermark import shutdown_pools
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """啟動時預熱常駐工作者 pool 並啟動工作佇列，關閉時等待執行中的運算並釋放"""
+    watermark.watermark_service.pool.warm_up()
+    jobs.job_queue.start()
+    yield
+    jobs.job_queue.shutdown()
+    watermark.executor.shutdown()
+    shutdown_pools()
+
 
 app = FastAPI(
     title="Blind Watermark API",
     description="圖片盲浮水印嵌入與提取 API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # CORS 設定
@@ -19,10 +35,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Watermark-Length",
+        "X-Watermark-Shape",
+        "X-Watermark-Verified",
+        "Server-Timing",
+        "Retry-After",
+    ],
 )
 
 # 註冊路由
 app.include_router(watermark.router, prefix="/api/watermark", tags=["watermark"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 
 @app.get("/")
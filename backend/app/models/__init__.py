@@ -2,20 +2,28 @@
 資料模型模組
 """
 from .schemas import (
+    BatchEmbedItemResponse,
     EmbedRequest,
     EmbedResponse,
     ErrorResponse,
     ExtractRequest,
     ExtractResponse,
+    JobItemResponse,
+    JobResponse,
+    OutputFormat,
     WatermarkMode,
 )
 
 __all__ = [
     "WatermarkMode",
+    "OutputFormat",
     "EmbedRequest",
     "EmbedResponse",
+    "BatchEmbedItemResponse",
     "ExtractRequest",
     "ExtractResponse",
     "ErrorResponse",
+    "JobItemResponse",
+    "JobResponse",
 ]
 
@@ -14,6 +14,13 @@ class WatermarkMode(str, Enum):
     BITS = "bit"
 
 
+class OutputFormat(str, Enum):
+    """嵌入後圖片的輸出格式"""
+    PNG = "png"
+    JPEG = "jpeg"
+    WEBP = "webp"
+
+
 class EmbedRequest(BaseModel):
     """嵌入浮水印請求"""
     mode: WatermarkMode = Field(..., description="浮水印模式：str/img/bit")
@@ -32,6 +39,18 @@ class EmbedResponse(BaseModel):
     image_data: Optional[str] = Field(None, description="Base64 編碼的嵌入後圖片")
 
 
+class BatchEmbedItemResponse(BaseModel):
+    """批次嵌入的單筆結果（NDJSON 的一行）"""
+    index: int = Field(..., description="圖片在上傳順序中的位置")
+    filename: Optional[str] = Field(None, description="上傳時的檔名")
+    success: bool
+    error: Optional[str] = Field(None, description="失敗原因")
+    watermark_length: Optional[int] = Field(None, description="實際嵌入的浮水印位元長度")
+    watermark_shape: Optional[List[int]] = Field(None, description="浮水印原始形狀（圖片模式）")
+    output_format: Optional[str] = Field(None, description="實際輸出格式")
+    image_data: Optional[str] = Field(None, description="Base64 編碼的嵌入後圖片")
+
+
 class ExtractRequest(BaseModel):
     """提取浮水印請求"""
     mode: WatermarkMode = Field(..., description="浮水印模式：str/img/bit")
@@ -54,3 +73,27 @@ class ErrorResponse(BaseModel):
     success: bool = False
     error: str
     detail: Optional[str] = None
+
+
+class JobItemResponse(BaseModel):
+    """工作中單張圖片的結果"""
+    index: int
+    filename: Optional[str] = None
+    success: Optional[bool] = Field(None, description="尚未處理時為 null")
+    error: Optional[str] = None
+    watermark_length: Optional[int] = None
+    watermark_shape: Optional[List[int]] = None
+    output_format: Optional[str] = None
+    result_url: Optional[str] = Field(None, description="嵌入後圖片的下載路徑")
+
+
+class JobResponse(BaseModel):
+    """工作狀態"""
+    job_id: str
+    status: str = Field(..., description="queued、running、succeeded 或 failed")
+    total: int
+    completed: int
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+    items: List[JobItemResponse] = Field(default_factory=list)
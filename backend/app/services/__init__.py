@@ -1,7 +1,21 @@
 """
 服務層模組
 """
-from .watermark_service import WatermarkService
+from .encoding import EncoderSettings
+from .executor import BoundedExecutor, ServiceBusyError
+from .jobs import JobQueue, JobRecord, JobStatus, JobStore
+from .watermark_service import BatchEmbedItem, EmbedResult, WatermarkService
 
-__all__ = ["WatermarkService"]
+__all__ = [
+    "BatchEmbedItem",
+    "BoundedExecutor",
+    "EmbedResult",
+    "EncoderSettings",
+    "JobQueue",
+    "JobRecord",
+    "JobStatus",
+    "JobStore",
+    "ServiceBusyError",
+    "WatermarkService",
+]
 
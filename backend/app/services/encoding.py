@@ -0,0 +1,75 @@
+"""
+嵌入結果的輸出編碼：格式選擇、編碼參數與計時。
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, replace
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+# 輸出格式對應的副檔名與 MIME 類型
+OUTPUT_FORMATS = {
+    "png": (".png", "image/png"),
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+}
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    """輸出編碼設定
+
+    - png_compression: PNG 壓縮等級 0-9，等級越高越慢；大圖建議 1
+    - quality: JPEG / 有損 WebP 品質 1-100
+    - lossless: WebP 是否無損（忽略 quality）
+    - verify: 有損輸出是否先解碼並確認浮水印仍可正確提取，失敗時改用 PNG
+    - max_bit_error: 圖片浮水印驗證時容許的位元錯誤率；文字與位元浮水印必須完全一致
+    """
+
+    output_format: str = "png"
+    png_compression: int = 1
+    quality: int = 95
+    lossless: bool = False
+    verify: bool = True
+    max_bit_error: float = 0.02
+
+    def __post_init__(self) -> None:
+        if self.output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支援的輸出格式: {self.output_format}")
+        if not 0 <= self.png_compression <= 9:
+            raise ValueError("png_compression 需介於 0 到 9")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("quality 需介於 1 到 100")
+
+    def updated(self, **options) -> "EncoderSettings":
+        """以值不為 None 的欄位覆寫目前設定，回傳新的設定"""
+        return replace(self, **{key: value for key, value in options.items() if value is not None})
+
+    @property
+    def lossy(self) -> bool:
+        return self.output_format == "jpeg" or (self.output_format == "webp" and not self.lossless)
+
+    @property
+    def media_type(self) -> str:
+        return OUTPUT_FORMATS[self.output_format][1]
+
+    def params(self) -> List[int]:
+        if self.output_format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if self.output_format == "jpeg":
+            return [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        # OpenCV 的 WebP 品質大於 100 時使用無損編碼
+        return [cv2.IMWRITE_WEBP_QUALITY, 101 if self.lossless else self.quality]
+
+
+def encode_image(image: np.ndarray, settings: EncoderSettings) -> Tuple[bytes, float]:
+    """依設定編碼圖片，回傳 (位元組, 編碼秒數)"""
+    start = time.perf_counter()
+    success, buffer = cv2.imencode(OUTPUT_FORMATS[settings.output_format][0], image, settings.params())
+    if not success:
+        raise ValueError("圖片編碼失敗")
+    data = buffer.tobytes()
+    return data, time.perf_counter() - start
@@ -0,0 +1,96 @@
+"""
+運算執行層：把 CPU 密集的浮水印運算移出事件迴圈，並限制同時執行與排隊的請求數。
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class ServiceBusyError(RuntimeError):
+    """執行層已滿載，呼叫端應於 retry_after 秒後重試"""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("服務忙碌中，請稍後再試")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """有上限的執行緒池：最多 max_workers 個運算同時執行、max_queue 個排隊，超出時立即拒絕。
+
+    使用執行緒而非行程，請求資料不需序列化，也能共用服務層的常駐 AutoPool；
+    NumPy 與 OpenCV 運算期間會釋放 GIL，事件迴圈（含健康檢查）得以持續回應。
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, retry_after: int = 5) -> None:
+        if max_workers < 1 or max_queue < 0:
+            raise ValueError("max_workers 需至少為 1，max_queue 不可為負數")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="watermark")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """執行中與排隊中的工作數"""
+        return self._in_flight
+
+    @property
+    def saturated(self) -> bool:
+        return self._in_flight >= self.max_workers + self.max_queue
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在執行緒池中執行 func 並等待結果；滿載時拋出 ServiceBusyError。
+
+        呼叫端取消等待（例如客戶端斷線）時運算仍會完成，名額於運算結束後才釋放。
+        """
+        future = self._submit_first(functools.partial(func, *args, **kwargs))
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    async def stream(self, func: Callable[..., Iterable[T]], *args: Any, **kwargs: Any) -> AsyncIterator[T]:
+        """在執行緒池中執行回傳迭代器的 func，逐項取回結果；整個迭代只佔用一個名額。
+
+        每次由消費端拉取下一項才在執行緒中推進迭代器，結果不會預先堆積；
+        迭代中途停止時，名額於正在執行的那一步結束後釋放。
+        """
+        future = self._submit_first(functools.partial(func, *args, **kwargs))
+        try:
+            iterator = iter(await asyncio.wrap_future(future))
+            while True:
+                future = self._executor.submit(next, iterator, _DONE)
+                item = await asyncio.wrap_future(future)
+                if item is _DONE:
+                    return
+                yield item
+        finally:
+            future.add_done_callback(lambda _: self._release())
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _submit_first(self, func: Callable[[], Any]) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusyError(self.retry_after)
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return self._executor.submit(func)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
@@ -0,0 +1,272 @@
+"""
+非同步工作佇列：大型嵌入工作交由行程內的工作者執行緒處理，狀態與結果存放在本機目錄。
+"""
+from __future__ import annotations
+
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .executor import ServiceBusyError
+from .watermark_service import WatermarkService
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class JobStatus(str, Enum):
+    """工作狀態"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class JobItem:
+    """工作中單張圖片的結果資訊"""
+
+    index: int
+    filename: Optional[str] = None
+    success: Optional[bool] = None
+    error: Optional[str] = None
+    watermark_length: Optional[int] = None
+    watermark_shape: Optional[List[int]] = None
+    output_format: Optional[str] = None
+    media_type: Optional[str] = None
+
+
+@dataclass
+class JobRecord:
+    """存放於 job.json 的工作狀態；不含密碼與浮水印內容"""
+
+    id: str
+    status: JobStatus
+    created_at: float
+    updated_at: float
+    items: List[JobItem] = field(default_factory=list)
+    completed: int = 0
+    error: Optional[str] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+
+class JobStore:
+    """以目錄保存工作：<root>/<job_id>/job.json、inputs/<index>、results/<index>"""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def create(self, filenames: List[Optional[str]]) -> JobRecord:
+        now = time.time()
+        record = JobRecord(
+            id=uuid.uuid4().hex,
+            status=JobStatus.QUEUED,
+            created_at=now,
+            updated_at=now,
+            items=[JobItem(index=index, filename=name) for index, name in enumerate(filenames)],
+        )
+        (self._dir(record.id) / "inputs").mkdir(parents=True)
+        (self._dir(record.id) / "results").mkdir()
+        return record
+
+    def load(self, job_id: str) -> Optional[JobRecord]:
+        if not _JOB_ID.match(job_id):
+            return None
+        path = self._dir(job_id) / "job.json"
+        if not path.is_file():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data["status"] = JobStatus(data["status"])
+        data["items"] = [JobItem(**item) for item in data["items"]]
+        return JobRecord(**data)
+
+    def save(self, record: JobRecord) -> None:
+        """以暫存檔加 os.replace 寫入，輪詢端不會讀到寫到一半的狀態"""
+        record.updated_at = time.time()
+        path = self._dir(record.id) / "job.json"
+        temporary = path.with_suffix(".tmp")
+        temporary.write_text(json.dumps(asdict(record), ensure_ascii=False), encoding="utf-8")
+        os.replace(temporary, path)
+
+    def input_path(self, job_id: str, index: int) -> Path:
+        return self._dir(job_id) / "inputs" / str(index)
+
+    def result_path(self, job_id: str, index: int) -> Path:
+        return self._dir(job_id) / "results" / str(index)
+
+    def records(self) -> Iterable[JobRecord]:
+        for path in self.root.iterdir():
+            record = self.load(path.name)
+            if record is not None:
+                yield record
+
+    def delete(self, job_id: str) -> None:
+        if _JOB_ID.match(job_id):
+            shutil.rmtree(self._dir(job_id), ignore_errors=True)
+
+    def purge(self, retention: float) -> None:
+        """刪除結束超過 retention 秒的工作"""
+        deadline = time.time() - retention
+        for record in list(self.records()):
+            if record.finished and record.updated_at < deadline:
+                self.delete(record.id)
+
+    def _dir(self, job_id: str) -> Path:
+        return self.root / job_id
+
+
+class JobQueue:
+    """行程內的工作佇列，由 workers 個執行緒依序處理。
+
+    密碼與浮水印內容只保存在記憶體中的佇列項目，不寫入磁碟；
+    服務重新啟動時尚未完成的工作會標記為失敗，已完成的結果仍可取回。
+    過期工作由工作者每 purge_interval 秒清除一次，不佔用提交的時間。
+    """
+
+    def __init__(
+        self,
+        service: WatermarkService,
+        store: JobStore,
+        workers: int = 1,
+        max_pending: int = 100,
+        retention: float = 24 * 3600,
+        retry_after: int = 5,
+        purge_interval: float = 600,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers 需至少為 1")
+        self.service = service
+        self.store = store
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.retry_after = retry_after
+        self.purge_interval = purge_interval
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._purged_at = float("-inf")
+
+    @property
+    def pending(self) -> int:
+        """排隊中（尚未開始）與已預留名額的工作數"""
+        return self._queue.qsize() + self._reserved
+
+    def start(self) -> "JobQueue":
+        """標記上次未完成的工作為失敗並啟動工作者；重複呼叫不會多開執行緒"""
+        with self._lock:
+            if self._threads:
+                return self
+            for record in self.store.records():
+                if not record.finished:
+                    record.status = JobStatus.FAILED
+                    record.error = "服務重新啟動，工作已中斷"
+                    self.store.save(record)
+            self._threads = [
+                threading.Thread(target=self._work, name=f"watermark-job-{index}", daemon=True)
+                for index in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def reserve(self) -> None:
+        """寫入輸入檔前預留一個排隊名額；佇列已滿時拋出 ServiceBusyError"""
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise ServiceBusyError(self.retry_after)
+            self._reserved += 1
+
+    def release(self) -> None:
+        """放棄以 reserve() 預留但未提交的名額"""
+        with self._lock:
+            self._reserved -= 1
+
+    def submit(self, record: JobRecord, **options: Any) -> JobRecord:
+        """以 reserve() 預留的名額排入已寫好輸入檔的工作；options 為 WatermarkService.embed_batch 的參數"""
+        self.store.save(record)
+        with self._lock:
+            self._queue.put((record.id, options))
+            self._reserved -= 1
+        return record
+
+    def shutdown(self) -> None:
+        """等待執行中的工作完成後停止工作者；仍在排隊的工作於下次啟動時標記為失敗"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _work(self) -> None:
+        while True:
+            self._purge()
+            try:
+                job = self._queue.get(timeout=self.purge_interval)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            job_id, options = job
+            try:
+                self._run(job_id, options)
+            except Exception as exc:
+                record = self.store.load(job_id)
+                if record is not None:
+                    record.status = JobStatus.FAILED
+                    record.error = str(exc)
+                    self.store.save(record)
+
+    def _purge(self) -> None:
+        # 多個工作者中只由一個清除，其餘直接回去處理工作
+        with self._lock:
+            if time.monotonic() - self._purged_at < self.purge_interval:
+                return
+            self._purged_at = time.monotonic()
+        try:
+            self.store.purge(self.retention)
+        except Exception:
+            # 清除失敗（例如損毀的 job.json）不可中止工作者，下個週期再試
+            pass
+
+    def _run(self, job_id: str, options: Dict[str, Any]) -> None:
+        record = self.store.load(job_id)
+        if record is None:
+            return
+        record.status = JobStatus.RUNNING
+        self.store.save(record)
+        images = (self.store.input_path(job_id, index).read_bytes() for index in range(record.total))
+        for item in self.service.embed_batch(images, **options):
+            entry = record.items[item.index]
+            entry.success = item.result is not None
+            if item.result is None:
+                entry.error = item.error
+            else:
+                self.store.result_path(job_id, item.index).write_bytes(item.result.data)
+                entry.watermark_length = item.result.watermark_length
+                entry.watermark_shape = list(item.result.watermark_shape) if item.result.watermark_shape else None
+                entry.output_format = item.result.output_format
+                entry.media_type = item.result.media_type
+            record.completed += 1
+            self.store.save(record)
+        record.status = JobStatus.SUCCEEDED
+        self.store.save(record)
+        shutil.rmtree(self.store.input_path(job_id, 0).parent, ignore_errors=True)
@@ -5,18 +5,73 @@ from __future__ import annotations
 
 import base64
 import io
-from typing import Optional, Tuple
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
 
 import cv2
 import numpy as np
 from PIL import Image
 
-from app.core.watermark import WaterMark
+from app.core.watermark import AutoPool, WaterMark
+
+from .encoding import EncoderSettings, encode_image
+
+
+@dataclass
+class EmbedResult:
+    """嵌入並編碼後的結果"""
+
+    data: bytes
+    media_type: str
+    output_format: str
+    watermark_length: int
+    watermark_shape: Optional[Tuple[int, ...]]
+    # 有損輸出的提取驗證結果；None 表示未驗證，False 表示驗證失敗並已改用 PNG
+    verified: Optional[bool]
+    # 各階段耗時（秒）：embed、encode，以及視情況的 verify、fallback
+    timings: Dict[str, float]
+
+
+@dataclass
+class BatchEmbedItem:
+    """批次嵌入中單張圖片的結果；失敗時 result 為 None 並記錄 error"""
+
+    index: int
+    result: Optional[EmbedResult] = None
+    error: Optional[str] = None
 
 
 class WatermarkService:
     """浮水印服務類別"""
 
+    def __init__(
+        self,
+        pool: Optional[AutoPool] = None,
+        encoder: Optional[EncoderSettings] = None,
+        batch_workers: Optional[int] = None,
+    ) -> None:
+        # 所有請求共用同一個常駐 pool，避免每張圖片都重新啟動工作者
+        self.pool = pool
+        self.encoder = encoder or EncoderSettings()
+        # 批次嵌入時同時處理的圖片數，預設為 CPU 核心數
+        self.batch_workers = max(1, batch_workers or os.cpu_count() or 1)
+
+    def _create_watermark(self, password_img: int, password_wm: int) -> WaterMark:
+        if self.pool is None:
+            return WaterMark(password_img=password_img, password_wm=password_wm)
+        return WaterMark(
+            password_img=password_img,
+            password_wm=password_wm,
+            mode=self.pool.mode,
+            processes=self.pool.processes,
+            pool=self.pool,
+        )
+
     @staticmethod
     def image_to_bytes(image: Image.Image, format: str = "PNG") -> bytes:
         buffer = io.BytesIO()
@@ -39,40 +94,48 @@ class WatermarkService:
             raise ValueError("無法解析圖片檔案")
         return image
 
-    @staticmethod
-    def _encode_image(image: np.ndarray) -> bytes:
-        success, buffer = cv2.imencode(".png", image)
-        if not success:
-            raise ValueError("圖片編碼失敗")
-        return buffer.tobytes()
+    def _encode_image(self, image: np.ndarray) -> bytes:
+        return encode_image(image, replace(self.encoder, output_format="png"))[0]
 
-    def _prepare_watermark(
+    def _watermark_content(
         self,
-        bwm: WaterMark,
         mode: str,
         *,
         text: Optional[str],
         image_bytes: Optional[bytes],
         length: Optional[int],
-    ) -> None:
+    ) -> Any:
+        """解析浮水印內容，回傳可交給 WaterMark.read_wm 的值"""
         if mode == "str":
             if not text:
                 raise ValueError("文字模式需要提供 watermark_text")
-            bwm.read_wm(text, mode="str")
-        elif mode == "img":
+            return text
+        if mode == "img":
             if not image_bytes:
                 raise ValueError("圖片模式需要提供 watermark_image")
-            wm_image = self._decode_image(image_bytes)
-            bwm.read_wm(wm_image, mode="img")
-        elif mode == "bit":
+            return self._decode_image(image_bytes)
+        if mode == "bit":
             if length is None:
                 raise ValueError("位元模式需要提供 watermark_length")
-            wm_bits = np.random.randint(0, 2, length)
-            bwm.read_wm(wm_bits, mode="bit")
-        else:
-            raise ValueError(f"不支援的模式: {mode}")
+            return np.random.randint(0, 2, length)
+        raise ValueError(f"不支援的模式: {mode}")
 
-    def embed_watermark(
+    def check_payload(
+        self,
+        mode: str,
+        watermark_text: Optional[str] = None,
+        watermark_image_bytes: Optional[bytes] = None,
+        watermark_length: Optional[int] = None,
+    ) -> None:
+        """只解析浮水印內容以提早檢查參數，不合法時拋出 ValueError"""
+        WaterMark().read_wm(
+            self._watermark_content(
+                mode, text=watermark_text, image_bytes=watermark_image_bytes, length=watermark_length
+            ),
+            mode=mode,
+        )
+
+    def embed(
         self,
         image_bytes: bytes,
         mode: str,
@@ -81,24 +144,147 @@ class WatermarkService:
         watermark_text: Optional[str] = None,
         watermark_image_bytes: Optional[bytes] = None,
         watermark_length: Optional[int] = None,
-    ) -> Tuple[bytes, int, Optional[Tuple[int, ...]]]:
+        encoder: Optional[EncoderSettings] = None,
+    ) -> EmbedResult:
+        """嵌入浮水印並依 encoder（預設為服務設定）編碼，記錄各階段耗時"""
+        start = time.perf_counter()
         cover_img = self._decode_image(image_bytes)
 
-        bwm = WaterMark(password_img=password_img, password_wm=password_wm)
+        bwm = self._create_watermark(password_img, password_wm)
         bwm.read_img(img=cover_img)
+        bwm.read_wm(
+            self._watermark_content(
+                mode, text=watermark_text, image_bytes=watermark_image_bytes, length=watermark_length
+            ),
+            mode=mode,
+        )
+
+        embedded = bwm.embed()
+        return self._finish(bwm, embedded, mode, encoder or self.encoder, time.perf_counter() - start)
+
+    def embed_batch(
+        self,
+        images: Iterable[bytes],
+        mode: str,
+        password_img: int,
+        password_wm: int,
+        watermark_text: Optional[str] = None,
+        watermark_image_bytes: Optional[bytes] = None,
+        watermark_length: Optional[int] = None,
+        encoder: Optional[EncoderSettings] = None,
+    ) -> Iterator[BatchEmbedItem]:
+        """以同一份浮水印與密碼平行嵌入多張圖片，依完成順序產生結果（以 index 對應輸入）
+
+        浮水印內容只解析一次，每張圖片使用各自的 WaterMark，最多 batch_workers 張同時處理；
+        images 可為惰性迭代器，只在有空位時才讀入下一張。浮水印參數錯誤時立即拋出
+        ValueError；單張圖片無法解析或嵌入失敗只記錄在該筆結果中，不中斷整批。
+        """
+        content = self._watermark_content(
+            mode, text=watermark_text, image_bytes=watermark_image_bytes, length=watermark_length
+        )
+        WaterMark().read_wm(content, mode=mode)
+        task = partial(
+            self._embed_item,
+            mode=mode,
+            content=content,
+            password_img=password_img,
+            password_wm=password_wm,
+            settings=encoder or self.encoder,
+        )
+        return self._embed_each(task, images)
+
+    def _embed_each(
+        self, task: Callable[[int, bytes], BatchEmbedItem], images: Iterable[bytes]
+    ) -> Iterator[BatchEmbedItem]:
+        inputs = enumerate(images)
+        with ThreadPoolExecutor(self.batch_workers, thread_name_prefix="watermark-batch") as pool:
+            running: Set[Future] = set()
+            while True:
+                # 補滿空位後等待任一張完成，執行中的圖片數不超過 batch_workers
+                for index, image_bytes in islice(inputs, self.batch_workers - len(running)):
+                    running.add(pool.submit(task, index, image_bytes))
+                if not running:
+                    return
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def _embed_item(
+        self,
+        index: int,
+        image_bytes: bytes,
+        *,
+        mode: str,
+        content: Any,
+        password_img: int,
+        password_wm: int,
+        settings: EncoderSettings,
+    ) -> BatchEmbedItem:
+        start = time.perf_counter()
+        try:
+            bwm = self._create_watermark(password_img, password_wm)
+            bwm.read_img(img=self._decode_image(image_bytes))
+            bwm.read_wm(content, mode=mode)
+            embedded = bwm.embed()
+            result = self._finish(bwm, embedded, mode, settings, time.perf_counter() - start)
+        except Exception as exc:
+            return BatchEmbedItem(index=index, error=str(exc))
+        return BatchEmbedItem(index=index, result=result)
+
+    def _finish(
+        self, bwm: WaterMark, embedded: np.ndarray, mode: str, settings: EncoderSettings, embed_seconds: float
+    ) -> EmbedResult:
+        timings: Dict[str, float] = {"embed": embed_seconds}
+        data, timings["encode"] = encode_image(embedded, settings)
+
+        verified = None
+        if settings.lossy and settings.verify:
+            start = time.perf_counter()
+            verified = self._verify(bwm, data, settings.max_bit_error if mode == "img" else 0.0)
+            timings["verify"] = time.perf_counter() - start
+            if not verified:
+                # 有損壓縮破壞了浮水印，改以無損 PNG 輸出
+                settings = replace(settings, output_format="png")
+                data, timings["fallback"] = encode_image(embedded, settings)
+
+        return EmbedResult(
+            data=data,
+            media_type=settings.media_type,
+            output_format=settings.output_format,
+            watermark_length=len(bwm.wm_bit) if bwm.wm_bit is not None else 0,
+            watermark_shape=bwm.wm_shape if mode == "img" and bwm.wm_shape else None,
+            verified=verified,
+            timings=timings,
+        )
 
-        self._prepare_watermark(
-            bwm,
+    def embed_watermark(
+        self,
+        image_bytes: bytes,
+        mode: str,
+        password_img: int,
+        password_wm: int,
+        watermark_text: Optional[str] = None,
+        watermark_image_bytes: Optional[bytes] = None,
+        watermark_length: Optional[int] = None,
+        output_format: str = "png",
+    ) -> Tuple[bytes, int, Optional[Tuple[int, ...]]]:
+        result = self.embed(
+            image_bytes,
             mode,
-            text=watermark_text,
-            image_bytes=watermark_image_bytes,
-            length=watermark_length,
+            password_img,
+            password_wm,
+            watermark_text=watermark_text,
+            watermark_image_bytes=watermark_image_bytes,
+            watermark_length=watermark_length,
+            encoder=replace(self.encoder, output_format=output_format),
         )
+        return result.data, result.watermark_length, result.watermark_shape
 
-        embedded = bwm.embed()
-        wm_length = len(bwm.wm_bit) if bwm.wm_bit is not None else 0
-        wm_shape = bwm.wm_shape if mode == "img" and bwm.wm_shape else None
-        return self._encode_image(embedded), wm_length, wm_shape
+    def _verify(self, bwm: WaterMark, data: bytes, max_bit_error: float) -> bool:
+        """解碼編碼後的圖片並提取，位元錯誤率不超過 max_bit_error 才算通過"""
+        expected = bwm.extract_decrypt(bwm.wm_bit.astype(np.float64)) >= 0.5
+        extracted = bwm.extract(embed_img=self._decode_image(data), wm_shape=bwm.wm_size, mode="bit")
+        return float(np.mean(extracted != expected)) <= max_bit_error
 
     def extract_watermark(
         self,
@@ -111,7 +297,7 @@ class WatermarkService:
     ) -> Tuple[Optional[str], Optional[bytes]]:
         embedded_img = self._decode_image(image_bytes)
 
-        bwm = WaterMark(password_img=password_img, password_wm=password_wm)
+        bwm = self._create_watermark(password_img, password_wm)
         shape = watermark_shape or watermark_length
         result = bwm.extract(embed_img=embedded_img, wm_shape=shape, mode=mode)
 
@@ -135,6 +135,10 @@ def test_image_processor():
     assert processor.img_shape == (100, 100)
     assert processor.ca_shape is not None
     assert len(processor.ca) == 3  # YUV 3 個通道
+    assert processor.ca.shape == (3, 50, 50)
+    # Haar cA 為每個 2x2 區塊總和的一半
+    expected = processor.img_YUV[:2, :2, 0].sum() / 2
+    assert np.isclose(processor.ca[0, 0, 0], expected, rtol=1e-5)
 
 
 def test_block_shape():
@@ -148,6 +152,214 @@ def test_block_shape():
     assert block.to_array().tolist() == [4, 4]
 
 
+def test_slab_tasks_share_data():
+    """測試 slab 排程涵蓋全部分塊，且逐 slab 結果與整批一致"""
+    import pickle
+    from app.core.blind_watermark.kernels import embed_watermark_batch, embed_slab
+    from app.core.blind_watermark.utils import AutoPool
+    from app.core.blind_watermark.utils.encryption import inverse_indices
+    from app.core.blind_watermark.utils.slabs import plan_slabs
+
+    slabs = plan_slabs(10, 4, per_item=64, cache=192)
+    assert [s.stop - s.start for s in slabs] == [3, 3, 3, 1]
+    assert plan_slabs(10, 2, per_item=1, cache=1 << 20) == [slice(0, 5), slice(5, 10)]
+
+    rng = np.random.RandomState(0)
+    blocks = (rng.rand(3, 8, 4, 4) * 255).astype(np.float32)
+    shuffler = rng.rand(8, 16).argsort(axis=1)
+    unshuffler = inverse_indices(shuffler)
+    wm_bits = rng.randint(0, 2, 8)
+    expected = embed_watermark_batch(blocks, shuffler, wm_bits, 36, 20)
+    part = embed_slab(blocks, shuffler, unshuffler, wm_bits, 36, 20, slice(2, 6))
+    np.testing.assert_allclose(part, expected[:, 2:6], atol=1e-4)
+    assert pickle.loads(pickle.dumps(embed_slab)) is embed_slab
+
+    with AutoPool('multithreading', processes=2) as pool:
+        parts = pool.map_slabs(embed_slab, 8, (blocks, shuffler, unshuffler, wm_bits, 36, 20))
+    np.testing.assert_allclose(np.concatenate(parts, axis=1), expected, atol=1e-4)
+
+
+def _fail_slab(array, slab):
+    view = array[slab]
+    raise RuntimeError(f"slab failed with {view.shape}")
+
+
+def test_run_slab_keeps_task_exception(monkeypatch):
+    """測試任務失敗時關閉共享記憶體的 BufferError 不會取代原本的例外"""
+    from multiprocessing.shared_memory import SharedMemory
+    from app.core.blind_watermark.utils.shared import SharedArray
+    from app.core.blind_watermark.utils.slabs import run_slab
+
+    close = SharedMemory.close
+    raised = []
+
+    def close_with_exports(self):
+        close(self)
+        if not raised:
+            raised.append(self)
+            raise BufferError("cannot close exported pointers exist")
+
+    shared = SharedArray(np.zeros((8, 4)))
+    monkeypatch.setattr(SharedMemory, 'close', close_with_exports)
+    try:
+        with pytest.raises(RuntimeError, match='slab failed'):
+            run_slab((_fail_slab, (shared.ref,), slice(2, 6)))
+    finally:
+        monkeypatch.undo()
+        shared.release()
+
+
+def test_shared_pool_lifecycle():
+    """測試常駐處理池延遲啟動、跨實例共用並可關閉後重啟"""
+    from app.core.blind_watermark import WaterMark, shared_pool, shutdown_pools
+
+    pool = shared_pool('multithreading', 2)
+    assert shared_pool('multithreading', 2) is pool
+    assert not pool.started
+
+    img = np.random.RandomState(0).randint(0, 256, (128, 128, 3)).astype(np.uint8)
+    wm_bits = np.random.RandomState(1).randint(0, 2, 16).astype(bool)
+    first = WaterMark(mode='multithreading', pool=pool)
+    first.read_img(img=img)
+    first.read_wm(wm_bits, mode='bit')
+    embedded = first.embed()
+    workers = pool.pool
+    first.close()
+    assert pool.pool is workers
+
+    second = WaterMark(mode='multithreading', pool=pool)
+    assert np.array_equal(second.extract(embed_img=embedded, wm_shape=16, mode='bit'), wm_bits)
+    assert pool.pool is workers
+
+    shutdown_pools()
+    assert not pool.started
+    assert pool.map(abs, [-1, 2]) == [1, 2]
+    pool.close()
+
+
+def test_shuffle_index_cache():
+    """測試打亂索引快取與原始產生方式一致，且可由較大的表切出前綴"""
+    from app.core.blind_watermark.utils.encryption import ShuffleIndexCache
+
+    cache = ShuffleIndexCache()
+    reference = np.random.RandomState(3).random(size=(60, 16)).argsort(axis=1)
+    assert np.array_equal(cache.get(3, 20, 16)[0], reference[:20])
+    shuffler, unshuffler = cache.get(3, 60, 16)
+    assert np.array_equal(shuffler, reference)
+    assert np.array_equal(unshuffler, np.argsort(reference, axis=1))
+    assert np.array_equal(cache.get(3, 30, 16)[0], reference[:30])
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.nbytes == 2 * 60 * 16
+
+
+def test_precision_option():
+    """測試 float64 分塊與係數一致，且 float32 與 float64 提取的位元錯誤率為 0"""
+    from app.core.blind_watermark import WaterMark
+    from app.core.blind_watermark.core.image_processor import ImageProcessor
+    from app.core.blind_watermark.types import BlockShape
+
+    img = np.random.RandomState(0).randint(0, 256, (128, 128, 3)).astype(np.uint8)
+    processor = ImageProcessor(BlockShape(), 'float64')
+    processor.process_image(img)
+    assert processor.ca[0].dtype == np.float64
+    expected = processor.ca[0][:4, 4:8]
+    assert np.array_equal(processor.ca_block[0][0, 1], expected)
+
+    wm_bits = np.random.RandomState(1).randint(0, 2, 32).astype(bool)
+    extracted = {}
+    for precision in ('float32', 'float64'):
+        bwm = WaterMark(mode='vectorization', precision=precision)
+        bwm.read_img(img=img)
+        bwm.read_wm(wm_bits, mode='bit')
+        embedded = bwm.embed()
+        extracted[precision] = WaterMark(mode='vectorization', precision='float64').extract(
+            embed_img=embedded, wm_shape=32, mode='bit'
+        )
+    assert np.mean(extracted['float32'] != extracted['float64']) == 0
+    assert np.array_equal(extracted['float64'], wm_bits)
+
+
+def test_embed_region():
+    """測試局部補嵌只改寫涵蓋的分塊，且與整張重新嵌入的結果一致"""
+    from app.core.blind_watermark import WaterMark
+
+    img = np.random.RandomState(0).randint(0, 256, (130, 97, 3)).astype(np.uint8)
+    wm_bits = np.random.RandomState(1).randint(0, 2, 32).astype(bool)
+    bwm = WaterMark(mode='vectorization')
+    bwm.read_img(img=img)
+    bwm.read_wm(wm_bits, mode='bit')
+    edited = bwm.embed().astype(np.uint8)
+    edited[10:30, 20:40] = 255
+
+    patched = bwm.embed_region(edited, (20, 10, 20, 20))
+    bwm.read_img(img=edited)
+    full = bwm.embed()
+    assert np.array_equal(patched[8:32, 16:40], full[8:32, 16:40])
+    outside = np.ones(img.shape[:2], dtype=bool)
+    outside[8:32, 16:40] = False
+    assert np.array_equal(patched[outside], edited[outside])
+    extracted = WaterMark(mode='vectorization').extract(embed_img=patched.astype(np.uint8), wm_shape=32, mode='bit')
+    assert np.array_equal(extracted, wm_bits)
+
+
+def test_extract_progressive():
+    """測試漸進提取在乾淨圖片上提前收斂，且結果與完整提取一致"""
+    from app.core.blind_watermark import WaterMark
+
+    img = np.random.RandomState(0).randint(0, 256, (256, 256, 3)).astype(np.uint8)
+    wm_bits = np.random.RandomState(1).randint(0, 2, 64).astype(bool)
+    bwm = WaterMark(mode='vectorization')
+    bwm.read_img(img=img)
+    bwm.read_wm(wm_bits, mode='bit')
+    embedded = bwm.embed().astype(np.uint8)
+
+    core = bwm.bwm_core
+    bits, blocks_used, converged = core.extract_progressive(embedded, (64,))
+    assert converged
+    assert blocks_used < core.block_num
+    assert np.array_equal(bits, core.extract_with_kmeans(embedded, (64,)))
+
+
+def test_npy_image_io(tmp_path):
+    """測試 .npy 圖片以記憶體映射讀取並可嵌入、保存與提取"""
+    from app.core.blind_watermark import WaterMark
+    from app.core.blind_watermark.utils import load_image
+
+    img = np.random.RandomState(0).randint(0, 256, (130, 97, 3)).astype(np.uint8)
+    np.save(tmp_path / 'cover.npy', img)
+    assert isinstance(load_image(str(tmp_path / 'cover.npy')), np.memmap)
+    wm_bits = np.random.RandomState(1).randint(0, 2, 32).astype(bool)
+    bwm = WaterMark(mode='vectorization')
+    bwm.read_img(str(tmp_path / 'cover.npy'))
+    bwm.read_wm(wm_bits, mode='bit')
+    bwm.embed(str(tmp_path / 'out.npy'))
+    assert np.load(tmp_path / 'out.npy').dtype == np.uint8
+    extracted = WaterMark(mode='vectorization').extract(str(tmp_path / 'out.npy'), wm_shape=32, mode='bit')
+    assert np.array_equal(extracted, wm_bits)
+
+
+def test_cached_mode():
+    """測試 cached 模式重複使用平坦分塊且提取結果與向量化模式相同"""
+    from app.core.blind_watermark import WaterMark
+    from app.core.blind_watermark.utils import block_memo
+
+    img = np.full((256, 320, 3), 200, np.uint8)
+    img[64:192, 96:224] = np.random.RandomState(0).randint(0, 256, (128, 128, 3))
+    wm_bits = np.random.RandomState(1).randint(0, 2, 32).astype(bool)
+    memo = block_memo()
+    memo.clear()
+    bwm = WaterMark(mode='cached')
+    bwm.read_img(img=img)
+    bwm.read_wm(wm_bits, mode='bit')
+    embedded = bwm.embed()
+    assert memo.hit_rate > 0.5
+    extracted = WaterMark(mode='cached').extract(embed_img=embedded, wm_shape=32, mode='bit')
+    assert np.array_equal(extracted, wm_bits)
+    reference = WaterMark(mode='vectorization').extract(embed_img=embedded, wm_shape=32, mode='bit')
+    assert np.array_equal(reference, wm_bits)
+    memo.clear()
+
+
 def test_file_size_limits():
     """測試所有檔案都在 200 行以內"""
     import os
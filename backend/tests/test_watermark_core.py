@@ -0,0 +1,490 @@
+from __future__ import annotations
+
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+import pywt
+
+from app.core.watermark import WatermarkPipeline, shared_pool, shutdown_pools
+from app.core.watermark.config import AlgorithmTuning
+from app.core.watermark.operations import decomposition_cache, kernels, progressive, tasks
+from app.core.watermark.operations.blocks import BlockGeometry, BlockSequence
+from app.core.watermark.operations.blockwise import embed_block, extract_block
+from app.core.watermark.operations.decomposition import DEFAULT_CACHE_BYTES
+from app.core.watermark.operations.payload import RunningPayload
+from app.core.watermark.operations.permutation import (
+    BlockPermutation,
+    PermutationStream,
+    PermutationTable,
+    ShuffleTableCache,
+    block_permutation,
+    inverse_rows,
+)
+from app.core.watermark.operations.wavelet import haar_analysis, haar_synthesis
+from app.core.watermark.runtime import BlockMemo, block_memo
+from app.core.watermark.runtime.shared import SharedArray
+from app.core.watermark.runtime.slabs import run_slab
+
+
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / "examples" / "pic"
+
+
+@pytest.fixture(scope="module")
+def cover() -> np.ndarray:
+    image = cv2.imread(str(FIXTURE_DIR / "Lena_512x512.jpg"))
+    assert image is not None
+    return image
+
+
+@pytest.fixture()
+def random_blocks():
+    rng = np.random.RandomState(0)
+    blocks = (rng.rand(500, 4, 4) * 255).astype(np.float32)
+    shuffle = rng.rand(500, 16).argsort(axis=1)
+    bits = rng.randint(0, 2, 500)
+    return blocks, shuffle, bits
+
+
+def test_batch_dct_matches_cv2(random_blocks) -> None:
+    blocks, _, _ = random_blocks
+    expected = np.stack([cv2.dct(block) for block in blocks])
+    np.testing.assert_allclose(kernels.batch_dct(blocks), expected, atol=1e-3)
+    np.testing.assert_allclose(kernels.batch_idct(expected), blocks, atol=1e-3)
+
+
+def test_embed_blocks_matches_per_block(random_blocks) -> None:
+    blocks, shuffle, bits = random_blocks
+    tuning = AlgorithmTuning()
+    inverse = inverse_rows(shuffle)
+    expected = np.stack([embed_block(blocks[i], shuffle[i], inverse[i], bits[i], tuning) for i in range(len(blocks))])
+    np.testing.assert_allclose(kernels.embed_blocks(blocks, shuffle, bits, tuning), expected, atol=1e-2)
+
+
+def test_cached_kernels_match_batched(random_blocks) -> None:
+    blocks, shuffle, bits = random_blocks
+    tuning = AlgorithmTuning()
+    memo = BlockMemo()
+    blocks = np.concatenate([blocks, blocks[:100]])
+    shuffle = np.concatenate([shuffle, shuffle[:100]])
+    bits = np.concatenate([bits, bits[:100]])
+    expected = kernels.embed_blocks(blocks, shuffle, bits, tuning)
+    embedded = kernels.embed_blocks_cached(blocks, shuffle, bits, tuning, inverse_rows(shuffle), memo)
+    np.testing.assert_allclose(embedded, expected, atol=1e-2)
+    assert (memo.hits, memo.misses) == (100, 500)
+    stacked = np.stack([embedded] * 3)
+    soft = kernels.extract_coefficients_cached(kernels.batch_dct(stacked), shuffle, tuning, memo)
+    np.testing.assert_array_equal(soft, kernels.extract_channels(stacked, shuffle, tuning))
+
+
+def test_extract_channels_matches_per_block(random_blocks) -> None:
+    blocks, shuffle, bits = random_blocks
+    tuning = AlgorithmTuning()
+    embedded = kernels.embed_blocks(blocks, shuffle, bits, tuning)
+    stacked = np.stack([embedded] * 3)
+    expected = np.array([
+        [extract_block(channel[i], shuffle[i], tuning) for i in range(len(channel))]
+        for channel in stacked
+    ])
+    result = kernels.extract_channels(stacked, shuffle, tuning)
+    assert result.shape == (3, len(blocks))
+    np.testing.assert_array_equal(result, expected)
+    np.testing.assert_array_equal(result[0] >= 0.5, bits.astype(bool))
+
+
+
+def test_gram_singular_values_match_svd(random_blocks) -> None:
+    blocks, shuffle, bits = random_blocks
+    embedded = kernels.embed_blocks(blocks, shuffle, bits, AlgorithmTuning())
+    stacked = np.stack([embedded] * 3)
+    svd_tuning = AlgorithmTuning(sv_method="svd")
+    gram_tuning = AlgorithmTuning(sv_method="gram")
+    np.testing.assert_allclose(
+        kernels.singular_values(blocks, "gram"), kernels.singular_values(blocks, "svd"), rtol=1e-4, atol=1e-3
+    )
+    np.testing.assert_array_equal(
+        kernels.extract_channels(stacked, shuffle, gram_tuning),
+        kernels.extract_channels(stacked, shuffle, svd_tuning),
+    )
+
+
+def test_invalid_sv_method_rejected() -> None:
+    with pytest.raises(ValueError):
+        AlgorithmTuning(sv_method="qr").validate()  # type: ignore[arg-type]
+
+
+def test_embed_rows_inplace_matches_embed_blocks(random_blocks) -> None:
+    _, shuffle, bits = random_blocks
+    tuning = AlgorithmTuning()
+    rows, cols = 20, 25
+    rng = np.random.RandomState(1)
+    channels = (rng.rand(3, rows * 4 + 2, cols * 4 + 3) * 255).astype(np.float32)
+    tiles = channels[:, : rows * 4, : cols * 4].reshape(3, rows, 4, cols, 4).swapaxes(2, 3)
+    expected = kernels.embed_blocks(tiles.reshape(3, rows * cols, 4, 4), shuffle, bits, tuning)
+    original = channels.copy()
+    inverse = inverse_rows(shuffle)
+    for start in range(0, rows, 6):
+        tasks.embed_rows_inplace(channels, shuffle, inverse, bits, tuning, cols, slice(start, min(start + 6, rows)))
+    np.testing.assert_allclose(tiles.reshape(3, rows * cols, 4, 4), expected, atol=1e-3)
+    np.testing.assert_array_equal(channels[:, rows * 4 :], original[:, rows * 4 :])
+    np.testing.assert_array_equal(channels[:, :, cols * 4 :], original[:, :, cols * 4 :])
+
+
+@pytest.mark.parametrize("mode", ["vectorization", "multithreading", "multiprocessing"])
+def test_batched_mode_roundtrip(cover: np.ndarray, mode: str) -> None:
+    pipeline = WatermarkPipeline(password_img=3, password_wm=5, mode=mode, processes=2)
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("vectorized", mode="str")
+    embedded = pipeline.embed()
+    assert embedded.shape == cover.shape
+    assert pipeline.extract(embed_img=embedded, wm_shape=pipeline.wm_size, mode="str") == "vectorized"
+
+
+def test_shared_pool_reused_across_pipelines(cover: np.ndarray) -> None:
+    pool = shared_pool("multiprocessing", 2)
+    assert shared_pool("multiprocessing", 2) is pool
+    pool.warm_up()
+    workers = pool._pool
+    # 服務行程已有執行緒，工作者不可由 fork 分出
+    assert workers._ctx.get_start_method() in ("forkserver", "spawn")
+    try:
+        for text in ("first", "second"):
+            pipeline = WatermarkPipeline(password_img=2, mode="multiprocessing", processes=2, pool=pool)
+            pipeline.read_img(img=cover)
+            pipeline.read_wm(text, mode="str")
+            embedded = pipeline.embed()
+            assert pipeline.extract(embed_img=embedded, wm_shape=pipeline.wm_size, mode="str") == text
+        assert pool._pool is workers
+    finally:
+        shutdown_pools()
+    assert not pool.started
+
+
+def test_shuffle_table_cache_prefix_and_eviction() -> None:
+    cache = ShuffleTableCache(max_bytes=6000)
+    reference = np.random.RandomState(7).random(size=(150, 16)).argsort(axis=1)
+    np.testing.assert_array_equal(cache.get(7, 100, 16).forward, reference[:100])
+    np.testing.assert_array_equal(cache.get(7, 40, 16).forward, reference[:40])
+    np.testing.assert_array_equal(cache.get(7, 150, 16).inverse, np.argsort(reference, axis=1))
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert not cache.get(7, 10, 16).forward.flags.writeable
+
+    cache.get(8, 150, 16)
+    assert cache.nbytes <= cache.max_bytes
+    cache.get(7, 150, 16)
+    assert cache.misses == 4
+
+
+def test_block_permutation_roundtrip(random_blocks) -> None:
+    blocks, shuffle, _ = random_blocks
+    permutation = BlockPermutation(shuffle)
+    shuffled = permutation.apply(np.stack([blocks, blocks * 2]))
+    expected = np.stack([block.reshape(-1)[idx].reshape(4, 4) for block, idx in zip(blocks, shuffle)])
+    np.testing.assert_array_equal(shuffled[0], expected)
+    np.testing.assert_array_equal(permutation.restore(shuffled), np.stack([blocks, blocks * 2]))
+    np.testing.assert_array_equal(permutation[10:20].restore(shuffled[:, 10:20]), np.stack([blocks, blocks * 2])[:, 10:20])
+
+    sequence = BlockSequence(BlockGeometry.from_ca_shape((40, 40), (4, 4)), shuffle_seed=3, shuffle_width=16)
+    # undo_shuffle 接受正向索引並自行還原
+    restored = sequence.undo_shuffle(sequence.apply_shuffle(blocks[0], sequence.shuffle_row(5)), sequence.shuffle_row(5))
+    np.testing.assert_array_equal(restored, blocks[0])
+
+
+def test_float32_precision_bit_error_rate(cover: np.ndarray) -> None:
+    bits = np.random.RandomState(4).randint(0, 2, 256).astype(bool)
+    soft = {}
+    for precision in ("float32", "float64"):
+        pipeline = WatermarkPipeline(password_img=6, mode="vectorization", precision=precision)
+        pipeline.read_img(img=cover)
+        pipeline.read_wm(bits, mode="bit")
+        algorithm = pipeline._embedder._algorithm
+        assert algorithm._components(cover).ca_stack.dtype == np.dtype(precision)
+        embedded = pipeline.embed()
+        soft[precision] = algorithm.extract(embedded, bits.size, use_kmeans=False)
+    ber = np.mean((soft["float32"] >= 0.5) != (soft["float64"] >= 0.5))
+    assert ber <= 0.01
+    assert np.array_equal(soft["float32"] >= 0.5, pipeline.payload_bits)
+
+
+def test_invalid_precision_rejected() -> None:
+    with pytest.raises(ValueError):
+        AlgorithmTuning(precision="float16").validate()  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_haar_engine_matches_pywt(dtype) -> None:
+    rng = np.random.RandomState(5)
+    planes = (rng.rand(24, 18, 3) * 255).astype(dtype)
+    expected = [pywt.dwt2(planes[:, :, channel], "haar") for channel in range(3)]
+    ca = haar_analysis(planes)
+    assert ca.shape == (3, 12, 9) and ca.dtype == dtype
+    np.testing.assert_allclose(ca, np.stack([band for band, _ in expected]), rtol=1e-5)
+
+    modified = ca + rng.randn(*ca.shape).astype(dtype)
+    reference = np.stack(
+        [pywt.idwt2((modified[channel], expected[channel][1]), "haar") for channel in range(3)], axis=2
+    )
+    result = haar_synthesis(planes, modified)
+    assert result is planes and result.dtype == dtype
+    np.testing.assert_allclose(result, reference, rtol=1e-5, atol=1e-3)
+    with pytest.raises(ValueError):
+        haar_analysis(planes[:-1])
+
+
+def test_embed_region_matches_full_embed(cover: np.ndarray) -> None:
+    pipeline = WatermarkPipeline(password_img=4, password_wm=2, mode="vectorization")
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("region", mode="str")
+    edited = pipeline.embed()
+    edited[37:91, 50:133] = (20, 200, 90)
+
+    patched = pipeline.embed_region(edited, (50, 37, 83, 54))
+    pipeline.read_img(img=edited)
+    full = pipeline.embed()
+    # 涵蓋的區塊為第 4~11 列、第 6~16 行，對應 8x8 像素對齊的範圍
+    np.testing.assert_array_equal(patched[32:96, 48:136], full[32:96, 48:136])
+    outside = np.ones(cover.shape[:2], dtype=bool)
+    outside[32:96, 48:136] = False
+    np.testing.assert_array_equal(patched[outside], edited[outside])
+    assert pipeline.extract(embed_img=patched, wm_shape=pipeline.wm_size, mode="str") == "region"
+    with pytest.raises(ValueError):
+        pipeline.embed_region(edited, (0, 0, 0, 10))
+
+
+def test_embed_tiled_matches_full_embed(cover: np.ndarray) -> None:
+    stream = PermutationStream(3, 16)
+    chunks = np.concatenate([stream.take(n).forward for n in (5, 1, 10)])
+    np.testing.assert_array_equal(chunks, block_permutation(3, 16, 16).forward)
+
+    image = cover[:-3, :-1]
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    pipeline.read_img(img=image)
+    pipeline.read_wm("tiled", mode="str")
+    full = pipeline.embed()
+    for strip_rows in (8, 64):
+        tiled = pipeline.embed_tiled(image, strip_rows=strip_rows)
+        np.testing.assert_array_equal(tiled, full)
+    assert pipeline.extract(embed_img=tiled, wm_shape=pipeline.wm_size, mode="str") == "tiled"
+    with pytest.raises(ValueError):
+        pipeline.embed_tiled(image, strip_rows=12)
+
+
+def test_memory_mapped_image_io(cover: np.ndarray, tmp_path: Path) -> None:
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("mapped", mode="str")
+    expected = pipeline.embed()
+
+    np.save(tmp_path / "cover.npy", cover)
+    assert isinstance(pipeline.read_img(str(tmp_path / "cover.npy")), np.memmap)
+    embedded = pipeline.embed(str(tmp_path / "out.npy"))
+    assert isinstance(embedded, np.memmap)
+    np.testing.assert_array_equal(np.load(tmp_path / "out.npy"), expected)
+    assert pipeline.extract(str(tmp_path / "out.npy"), wm_shape=pipeline.wm_size, mode="str") == "mapped"
+
+    # 原始檔依通道分平面存放，沒有檔頭
+    np.ascontiguousarray(cover.transpose(2, 0, 1)).tofile(tmp_path / "cover.raw")
+    pipeline.read_img(str(tmp_path / "cover.raw"), shape=cover.shape[:2], planar=True)
+    pipeline.embed(str(tmp_path / "out.raw"))
+    raw = np.fromfile(tmp_path / "out.raw", dtype=np.uint8).reshape(3, *cover.shape[:2])
+    np.testing.assert_array_equal(raw.transpose(1, 2, 0), expected)
+    with pytest.raises(ValueError):
+        pipeline.read_img(str(tmp_path / "cover.raw"))
+
+    # 灰階陣列在讀取時即拒絕，不會到了逐段嵌入才失敗
+    np.save(tmp_path / "gray.npy", cover[:, :, 0])
+    with pytest.raises(ValueError, match="grayscale"):
+        pipeline.read_img(str(tmp_path / "gray.npy"))
+    with pytest.raises(ValueError, match="channels"):
+        pipeline.read_img(str(tmp_path / "cover.raw"), shape=(*cover.shape[:2], 1))
+
+
+def test_embed_batch_matches_single_embeds(cover: np.ndarray, tmp_path: Path) -> None:
+    images = [cover, np.roll(cover, 40, axis=1), cover[:300, :400]]
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    expected = []
+    for image in images:
+        pipeline.read_img(img=image)
+        pipeline.read_wm("tenant", mode="str")
+        expected.append(pipeline.embed())
+
+    paths = []
+    for index, image in enumerate(images):
+        paths.append(str(tmp_path / f"in{index}.png"))
+        cv2.imwrite(paths[-1], image)
+    outputs = [str(tmp_path / f"out{index}.png") for index in range(len(images))]
+    batch = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    results = list(batch.embed_batch(paths, "tenant", filenames=outputs, prefetch=1))
+    for result, reference, output in zip(results, expected, outputs):
+        np.testing.assert_array_equal(result, reference)
+        assert batch.extract(output, wm_shape=batch.wm_size, mode="str") == "tenant"
+    with pytest.raises(ValueError):
+        list(batch.embed_batch(images, filenames=outputs[:1]))
+
+
+def test_extract_batch_groups_by_geometry(cover: np.ndarray) -> None:
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    hosts = [cover, cover[:300, :400], np.roll(cover, 40, axis=1)]
+    marked = list(pipeline.embed_batch(hosts, "audit"))
+    items = [("a", marked[0]), ("b", marked[1]), ("c", marked[2]), ("plain", cover)]
+
+    results = {key: (content, confidence) for key, content, confidence in pipeline.extract_batch(
+        items, pipeline.wm_size, bucket_size=2
+    )}
+    assert set(results) == {"a", "b", "c", "plain"}
+    for key in ("a", "b", "c"):
+        assert results[key][0] == "audit"
+        assert results[key][1] > 3.0
+    assert results["plain"][1] < results["a"][1]
+
+
+def test_score_keys_ranks_correct_key(cover: np.ndarray) -> None:
+    pipeline = WatermarkPipeline(password_img=7, password_wm=9, mode="vectorization")
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("tenant-7", mode="str")
+    embedded = pipeline.embed()
+
+    candidates = [(3, 5), (7, 9), (7, 4), (11, 9)]
+    scores = pipeline.score_keys(candidates, embed_img=embedded, wm_shape=pipeline.wm_size)
+    assert [(score.password_img, score.password_wm) for score in scores] == candidates
+    assert scores[1].content == "tenant-7"
+    assert scores[2].content != "tenant-7"
+    assert scores[1].confidence == scores[2].confidence
+    assert scores[1].confidence > max(scores[0].confidence, scores[3].confidence)
+    for score in scores:
+        single = WatermarkPipeline(password_img=score.password_img, password_wm=score.password_wm, mode="vectorization")
+        assert single.extract(embed_img=embedded, wm_shape=pipeline.wm_size, mode="str") == score.content
+
+    sampled = pipeline.score_keys(candidates, embed_img=embedded, wm_shape=pipeline.wm_size, max_cycles=4)
+    assert sampled[1].content == "tenant-7"
+    assert sampled[1].confidence > max(sampled[0].confidence, sampled[3].confidence)
+
+
+def test_decomposition_cache_reuses_components(cover: np.ndarray) -> None:
+    cache = decomposition_cache()
+    cache.clear()
+    reference = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    reference.read_img(img=cover)
+    reference.read_wm("cached", mode="str")
+    expected = reference.embed()
+    assert len(cache) == 0
+
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization", cache_decomposition=True)
+    pipeline.read_img(img=cover.copy())
+    pipeline.read_wm("cached", mode="str")
+    for _ in range(2):
+        np.testing.assert_array_equal(pipeline.embed(), expected)
+    assert (cache.hits, cache.misses) == (1, 1)
+    for _ in range(2):
+        assert pipeline.extract(embed_img=expected, wm_shape=pipeline.wm_size, mode="str") == "cached"
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert len(cache) == 2
+
+    cache.max_bytes = cache.nbytes - 1
+    pipeline.extract(embed_img=cover, wm_shape=pipeline.wm_size, mode="str")
+    assert cache.nbytes <= cache.max_bytes
+    cache.max_bytes = DEFAULT_CACHE_BYTES
+    cache.clear()
+
+
+def test_cached_mode_reuses_flat_blocks(cover: np.ndarray) -> None:
+    canvas = np.full((600, 800, 3), 255, np.uint8)
+    canvas[100:400, 200:500] = cover[:300, :300]
+    memo = block_memo()
+    memo.clear()
+    reference = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    reference.read_img(img=canvas)
+    reference.read_wm("memo", mode="str")
+    expected = reference.extract(embed_img=reference.embed(), wm_shape=reference.wm_size, mode="str")
+
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="cached")
+    pipeline.read_img(img=canvas)
+    pipeline.read_wm("memo", mode="str")
+    embedded = pipeline.embed()
+    assert memo.hit_rate > 0.5
+    first_misses = memo.misses
+    pipeline.embed()
+    assert memo.misses == first_misses
+    assert pipeline.extract(embed_img=embedded, wm_shape=pipeline.wm_size, mode="str") == expected == "memo"
+    memo.clear()
+
+
+def _fail_with_view(array: np.ndarray, slab: slice) -> None:
+    view = array[slab]
+    raise RuntimeError(f"slab {slab.start} failed with {view.shape}")
+
+
+def test_run_slab_keeps_task_exception(monkeypatch: pytest.MonkeyPatch) -> None:
+    close = SharedMemory.close
+    raised = []
+
+    def close_with_exports(self) -> None:
+        close(self)
+        if not raised:
+            raised.append(self)
+            raise BufferError("cannot close exported pointers exist")
+
+    shared = SharedArray.copy_of(np.zeros((8, 4)))
+    # 部分 NumPy 版本的視圖會持有匯出緩衝區，traceback 仍引用視圖時 close 會拋出 BufferError
+    monkeypatch.setattr(SharedMemory, "close", close_with_exports)
+    try:
+        with pytest.raises(RuntimeError, match="slab 2 failed"):
+            run_slab((_fail_with_view, (shared.ref,), slice(2, 6)))
+    finally:
+        monkeypatch.undo()
+        shared.release()
+
+
+def test_map_slabs_writes_into_allocated_output() -> None:
+    pool = shared_pool("multiprocessing", 2)
+    tuning = AlgorithmTuning()
+    blocks = (np.random.RandomState(2).rand(3, 40, 4, 4) * 255).astype(np.float32)
+    shuffle = PermutationTable(7, 40, 16)
+    expected = kernels.extract_channels(blocks, shuffle[0:40], tuning)
+    with pytest.raises(ValueError, match="AutoPool.allocate"):
+        pool.map_slabs(tasks.extract_slab_into, 40, (blocks, shuffle, tuning, np.empty((3, 40))))
+    with pool.allocate(blocks.shape, blocks.dtype) as shared, pool.allocate((3, 40), np.float64) as out:
+        shared[...] = blocks
+        pool.map_slabs(tasks.extract_slab_into, 40, (shared, shuffle, tuning, out))
+        np.testing.assert_allclose(out, expected)
+
+
+def test_running_payload_margins() -> None:
+    running = RunningPayload(3)
+    running.add(np.array([[1.0, 0.0, 0.75, 1.0, 0.0, 0.25]]), 0)
+    np.testing.assert_array_equal(running.counts, [2, 2, 2])
+    np.testing.assert_allclose(running.mean, [1.0, 0.0, 0.5])
+    margins = running.margins()
+    assert np.isinf(margins[0]) and np.isinf(margins[1]) and margins[2] == 0
+    assert not running.converged(3.0, 2)
+    running.add(np.array([[1.0, 0.0, 0.75]]), 6)
+    assert not running.converged(3.0, 3)
+    assert running.converged(0.5, 3, threshold=0.4)
+
+
+def test_progressive_extraction_stops_early(cover: np.ndarray) -> None:
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("early", mode="str")
+    embedded = pipeline.embed()
+    result = pipeline.extract_progressive(embed_img=embedded, wm_shape=pipeline.wm_size, mode="str")
+    assert result.content == "early"
+    assert result.converged
+    assert result.blocks_used < result.block_num // 2
+    assert result.blocks_used % pipeline.wm_size == 0
+
+
+def test_progressive_segments_on_process_pool(cover: np.ndarray, monkeypatch: pytest.MonkeyPatch) -> None:
+    pipeline = WatermarkPipeline(password_img=3, password_wm=2, mode="vectorization")
+    pipeline.read_img(img=cover)
+    pipeline.read_wm("slabs", mode="str")
+    embedded = pipeline.embed()
+    expected = pipeline.extract_progressive(embed_img=embedded, wm_shape=pipeline.wm_size, mode="bit")
+    # 每段都改以 map_slabs 交給行程工作者
+    monkeypatch.setattr(progressive, "PARALLEL_SEGMENT_BLOCKS", 1)
+    parallel = WatermarkPipeline(password_img=3, password_wm=2, mode="multiprocessing", processes=2)
+    result = parallel.extract_progressive(embed_img=embedded, wm_shape=pipeline.wm_size, mode="bit")
+    np.testing.assert_array_equal(result.content, expected.content)
+    assert (result.blocks_used, result.converged) == (expected.blocks_used, expected.converged)
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
 import ast
+import asyncio
+import json
+import threading
+import time
 from pathlib import Path
 
 import cv2
 import numpy as np
 import pytest
 
-from app.services import WatermarkService
+from app.services import (
+    BoundedExecutor,
+    EncoderSettings,
+    JobQueue,
+    JobStatus,
+    JobStore,
+    ServiceBusyError,
+    WatermarkService,
+)
 
 
 FIXTURE_DIR = Path(__file__).resolve().parents[2] / "examples" / "pic"
@@ -113,3 +125,282 @@ def test_invalid_mode_raises(service: WatermarkService) -> None:
             password_img=1,
             password_wm=1,
         )
+
+
+def test_lossy_output_is_verified(service: WatermarkService) -> None:
+    cover_bytes = load_bytes("ori_img.jpeg")
+    result = service.embed(
+        cover_bytes,
+        "str",
+        1,
+        1,
+        watermark_text="codec",
+        encoder=EncoderSettings(output_format="webp", quality=90),
+    )
+    assert (result.output_format, result.media_type, result.verified) == ("webp", "image/webp", True)
+    assert set(result.timings) == {"embed", "encode", "verify"}
+    extracted_text, _ = service.extract_watermark(
+        image_bytes=result.data,
+        mode="str",
+        password_img=1,
+        password_wm=1,
+        watermark_length=result.watermark_length,
+    )
+    assert extracted_text == "codec"
+
+    result = service.embed(
+        cover_bytes,
+        "str",
+        1,
+        1,
+        watermark_text="codec",
+        encoder=EncoderSettings(output_format="jpeg", quality=5),
+    )
+    assert (result.output_format, result.verified) == ("png", False)
+    assert "fallback" in result.timings
+    assert result.data[:8] == b"\x89PNG\r\n\x1a\n"
+
+
+def test_embed_batch_shares_payload(service: WatermarkService) -> None:
+    cover_bytes = load_bytes("ori_img.jpeg")
+    parallel = WatermarkService(batch_workers=3)
+    items = list(
+        parallel.embed_batch([cover_bytes, b"broken", cover_bytes], "str", 4, 6, watermark_text="batch")
+    )
+    # 依完成順序回傳：無法解碼的圖片最先結束
+    assert items[0].index == 1
+    items.sort(key=lambda item: item.index)
+    assert [item.index for item in items] == [0, 1, 2]
+    assert items[1].result is None and items[1].error
+    assert items[0].result.data == items[2].result.data
+    extracted_text, _ = service.extract_watermark(
+        image_bytes=items[2].result.data,
+        mode="str",
+        password_img=4,
+        password_wm=6,
+        watermark_length=items[2].result.watermark_length,
+    )
+    assert extracted_text == "batch"
+    with pytest.raises(ValueError):
+        service.embed_batch([cover_bytes], "str", 4, 6)
+
+
+def test_encoder_settings_validation() -> None:
+    with pytest.raises(ValueError):
+        EncoderSettings(output_format="gif")
+    with pytest.raises(ValueError):
+        EncoderSettings(png_compression=10)
+    assert not EncoderSettings(output_format="webp", lossless=True).lossy
+    assert EncoderSettings(output_format="jpeg").lossy
+
+
+def test_bounded_executor_rejects_when_saturated() -> None:
+    executor = BoundedExecutor(max_workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def scenario() -> None:
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert executor.saturated
+        with pytest.raises(ServiceBusyError) as excinfo:
+            await executor.run(sum, [1, 2])
+        assert excinfo.value.retry_after == 7
+        release.set()
+        assert await asyncio.gather(*running) == [True, True]
+        assert await executor.run(sum, [1, 2]) == 3
+
+    asyncio.run(scenario())
+    assert executor.in_flight == 0
+    executor.shutdown()
+
+
+def test_embed_returns_503_when_saturated(monkeypatch: pytest.MonkeyPatch) -> None:
+    from fastapi.testclient import TestClient
+
+    from app.api import watermark
+    from app.main import app
+
+    executor = BoundedExecutor(max_workers=1, max_queue=0, retry_after=3)
+    release = threading.Event()
+    blocker = threading.Thread(target=asyncio.run, args=(executor.run(release.wait),))
+    blocker.start()
+    while not executor.saturated:
+        release.wait(0.01)
+    monkeypatch.setattr(watermark, "executor", executor)
+    client = TestClient(app)
+    response = client.post(
+        "/api/watermark/embed",
+        files={"image": ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg")},
+        data={"mode": "str", "watermark_text": "busy"},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    assert client.get("/api/watermark/health").status_code == 200
+    release.set()
+    blocker.join()
+    executor.shutdown()
+
+
+def test_embed_binary_streams_image(service: WatermarkService) -> None:
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/watermark/embed/binary",
+        files={
+            "image": ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg"),
+            "watermark_image": ("wm.png", load_bytes("watermark.png"), "image/png"),
+        },
+        data={"mode": "img", "password_img": "9", "password_wm": "7"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert int(response.headers["content-length"]) == len(response.content)
+    wm_length = int(response.headers["X-Watermark-Length"])
+    wm_shape = tuple(json.loads(response.headers["X-Watermark-Shape"]))
+    _, extracted_bytes = service.extract_watermark(
+        image_bytes=response.content,
+        mode="img",
+        password_img=9,
+        password_wm=7,
+        watermark_length=wm_length,
+        watermark_shape=wm_shape,
+    )
+    assert cv2.imdecode(np.frombuffer(extracted_bytes, np.uint8), cv2.IMREAD_GRAYSCALE).shape == wm_shape
+
+    response = client.post(
+        "/api/watermark/embed/binary",
+        files={"image": ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg")},
+        data={"mode": "str", "watermark_text": "binary", "output_format": "jpeg"},
+    )
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["X-Watermark-Verified"] == "true"
+    assert "encode;dur=" in response.headers["Server-Timing"]
+    assert "X-Watermark-Shape" not in response.headers
+    assert response.content[:2] == b"\xff\xd8"
+
+    response = client.post(
+        "/api/watermark/embed/binary",
+        files={"image": ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg")},
+        data={"mode": "str", "watermark_text": "binary", "output_format": "png", "png_compression": "12"},
+    )
+    assert response.status_code == 400
+
+
+def test_embed_batch_streams_ndjson() -> None:
+    from fastapi.testclient import TestClient
+
+    from app.api import watermark
+    from app.main import app
+
+    client = TestClient(app)
+    cover_bytes = load_bytes("ori_img.jpeg")
+    response = client.post(
+        "/api/watermark/embed/batch",
+        files=[
+            ("images", ("a.jpeg", cover_bytes, "image/jpeg")),
+            ("images", ("b.txt", b"not an image", "text/plain")),
+        ],
+        data={"mode": "bit", "watermark_length": "32", "output_format": "jpeg"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert [(line["index"], line["filename"], line["success"]) for line in lines] == [
+        (0, "a.jpeg", True),
+        (1, "b.txt", False),
+    ]
+    assert lines[0]["watermark_length"] == 32 and lines[0]["output_format"] == "jpeg"
+    assert "error" in lines[1]
+    assert watermark.executor.in_flight == 0
+
+    response = client.post(
+        "/api/watermark/embed/batch",
+        files=[("images", ("a.jpeg", cover_bytes, "image/jpeg"))],
+        data={"mode": "str"},
+    )
+    assert response.status_code == 400
+
+
+def wait_for_job(store: JobStore, job_id: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    record = store.load(job_id)
+    while not record.finished and time.monotonic() < deadline:
+        time.sleep(0.05)
+        record = store.load(job_id)
+    return record
+
+
+def test_job_queue_stores_results(service: WatermarkService, tmp_path: Path) -> None:
+    store = JobStore(tmp_path)
+    job_queue = JobQueue(service, store, workers=2).start()
+    record = store.create(["cover.jpeg", "broken.bin"])
+    store.input_path(record.id, 0).write_bytes(load_bytes("ori_img.jpeg"))
+    store.input_path(record.id, 1).write_bytes(b"broken")
+    job_queue.reserve()
+    job_queue.submit(record, mode="str", password_img=2, password_wm=3, watermark_text="job")
+    record = wait_for_job(store, record.id)
+    job_queue.shutdown()
+
+    assert record.status == JobStatus.SUCCEEDED
+    assert (record.completed, record.items[0].success, record.items[1].success) == (2, True, False)
+    assert not store.input_path(record.id, 0).exists()
+    extracted_text, _ = service.extract_watermark(
+        image_bytes=store.result_path(record.id, 0).read_bytes(),
+        mode="str",
+        password_img=2,
+        password_wm=3,
+        watermark_length=record.items[0].watermark_length,
+    )
+    assert extracted_text == "job"
+
+    interrupted = store.create(["cover.jpeg"])
+    store.save(interrupted)
+    JobQueue(service, store).start().shutdown()
+    assert store.load(interrupted.id).status == JobStatus.FAILED
+    assert store.load("../" + record.id) is None
+
+    # 名額在複製輸入前預留，放棄後歸還；過期工作由工作者清除
+    limited = JobQueue(service, store, max_pending=1, retention=0)
+    limited.reserve()
+    with pytest.raises(ServiceBusyError):
+        limited.reserve()
+    limited.release()
+    limited.reserve()
+    limited.start().shutdown()
+    assert store.load(record.id) is None
+
+
+def test_job_api_submit_poll_and_fetch(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    from fastapi.testclient import TestClient
+
+    from app.api import jobs
+    from app.main import app
+
+    job_queue = JobQueue(jobs.watermark_service, JobStore(tmp_path)).start()
+    monkeypatch.setattr(jobs, "job_queue", job_queue)
+    client = TestClient(app)
+    response = client.post(
+        "/api/jobs/embed",
+        files=[("images", ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg"))],
+        data={"mode": "str", "watermark_text": "later", "output_format": "webp", "lossless": "true"},
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    wait_for_job(job_queue.store, job_id)
+    status = client.get(f"/api/jobs/{job_id}").json()
+    assert (status["status"], status["completed"], status["total"]) == ("succeeded", 1, 1)
+    result = client.get(status["items"][0]["result_url"])
+    assert result.headers["content-type"] == "image/webp"
+    assert client.delete(f"/api/jobs/{job_id}").status_code == 204
+    assert client.get(f"/api/jobs/{job_id}").status_code == 404
+
+    response = client.post(
+        "/api/jobs/embed",
+        files=[("images", ("cover.jpeg", load_bytes("ori_img.jpeg"), "image/jpeg"))],
+        data={"mode": "img"},
+    )
+    assert response.status_code == 400
+    job_queue.shutdown()
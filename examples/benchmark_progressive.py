@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+比較舊版引擎 WaterMarkCore 的完整提取與漸進提取耗時。
+
+用法：python benchmark_progressive.py [--image pic/ori_img.jpeg] [--scale 2] [--repeat 3]
+漸進提取仍需對整張圖做色彩轉換與 Haar 分解，提前結束只省下其餘分塊的收集與 DCT/SVD；
+輸出中的「分解」即兩者共同、無法省下的成本，實際加速倍數受其比例限制。
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BACKEND_SRC = PROJECT_ROOT / "backend"
+if str(BACKEND_SRC) not in sys.path:
+    sys.path.insert(0, str(BACKEND_SRC))
+
+from app.core.blind_watermark import WaterMark, bw_notes
+
+
+def best_of(repeat, func):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--image', default='pic/ori_img.jpeg')
+    parser.add_argument('--scale', type=float, default=2.0, help='放大圖片以模擬大圖')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    bw_notes.close()
+    img = cv2.imread(args.image)
+    img = cv2.resize(img, None, fx=args.scale, fy=args.scale, interpolation=cv2.INTER_LINEAR)
+    wm_bits = np.random.RandomState(0).randint(0, 2, 128).astype(bool)
+    bwm = WaterMark(password_img=1, password_wm=1, mode='vectorization')
+    bwm.read_img(img=img)
+    bwm.read_wm(wm_bits, mode='bit')
+    embedded = np.clip(bwm.embed(), 0, 255).astype(np.uint8)
+    core, wm_shape = bwm.bwm_core, (wm_bits.size,)
+
+    decompose_time, _ = best_of(args.repeat, lambda: core.read_img_arr(embedded))
+    full_time, full = best_of(args.repeat, lambda: core.extract_with_kmeans(embedded, wm_shape))
+    progressive_time, (bits, blocks_used, converged) = best_of(
+        args.repeat, lambda: core.extract_progressive(embedded, wm_shape)
+    )
+    status = 'ok' if np.array_equal(bits, full) else 'MISMATCH'
+    print(f'image={args.image} shape={img.shape} blocks={core.block_num}')
+    print(f'{"分解":<12}{decompose_time:>10.3f}s')
+    print(f'{"完整提取":<10}{full_time:>10.3f}s')
+    print(f'{"漸進提取":<10}{progressive_time:>10.3f}s  '
+          f'blocks={blocks_used}/{core.block_num} converged={converged} {status}')
+    print(f'加速 {full_time / progressive_time:.1f}x，'
+          f'上限（只省下分解以外的成本）{full_time / decompose_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()